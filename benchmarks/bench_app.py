@@ -0,0 +1,277 @@
+"""端到端性能测试：在无界面模式（offscreen）下运行 TaskListApp
+
+对 1k / 10k / 100k 个任务的数据库分别测量窗口构建、加载、勾选、编辑、
+批量添加、批量删除的耗时以及进程的峰值内存，结果写入 JSON 文件，
+便于比较不同提交之间的性能变化。
+
+用法:
+    python benchmarks/bench_app.py [--sizes 1000,10000,100000] [--output results.json]
+    python benchmarks/bench_app.py --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+REPEAT = 10            # 加载/勾选/编辑的重复次数，取中位数
+BATCH_ADD_COUNT = 1000  # 批量添加的任务数
+DELETE_RATIO = 10      # 批量删除时每 DELETE_RATIO 个任务删除一个
+REGRESSION = 1.10      # 比较结果时超过该倍数视为变慢
+
+
+def peak_rss_kb():
+    """进程的峰值常驻内存（KB），平台不支持时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # macOS 以字节为单位
+        peak //= 1024
+    return peak
+
+
+def generate_db(path, count):
+    from task import DEFAULT_TAGS, encode_tags
+    from task_repository import TaskRepository
+
+    rng = random.Random(count)
+    tag_choices = [encode_tags(()), encode_tags(DEFAULT_TAGS[:2])] + [encode_tags((tag,)) for tag in DEFAULT_TAGS]
+    repository = TaskRepository(path)
+    try:
+        rows = []
+        for i in range(count):
+            description = f'任务 {i} 的描述' if rng.random() < 0.5 else ''
+            rows.append((f'任务 {i}', description, rng.choice(tag_choices),
+                         rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 3), 0))
+            if len(rows) >= 5000:
+                repository.insert_rows(rows)
+                rows = []
+        if rows:
+            repository.insert_rows(rows)
+    finally:
+        repository.close()
+
+
+def copy_db(source, target):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    shutil.copyfile(source, target)
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_size(db_path):
+    """在当前进程中对一个数据库执行所有测量，返回 {操作: 毫秒}"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtWidgets import QApplication, QDialog, QMessageBox
+
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    # 对话框与提示框直接返回，不等待用户操作
+    QMessageBox.information = staticmethod(lambda *args: QMessageBox.Ok)
+    QMessageBox.warning = staticmethod(lambda *args: QMessageBox.Ok)
+    QMessageBox.question = staticmethod(lambda *args: QMessageBox.Yes)
+
+    edits = iter(range(10 ** 9))
+
+    def accept_edit(dialog):
+        dialog.title_edit.setText(f'已编辑 {next(edits)}')
+        dialog.urgency_combo.setCurrentIndex(next(edits) % 3)
+        return QDialog.Accepted
+
+    def accept_batch_add(dialog):
+        dialog.text_edit.setPlainText('\n'.join(f'批量任务 {i}|描述 {i}' for i in range(BATCH_ADD_COUNT)))
+        return QDialog.Accepted
+
+    main.TaskDialog.exec_ = accept_edit
+    main.BatchAddDialog.exec_ = accept_batch_add
+
+    class BenchApp(main.TaskListApp):
+        import_done = False
+
+        def create_tray_icon(self):
+            pass
+
+        def on_import_finished(self, count, cancelled):
+            super().on_import_finished(count, cancelled)
+            self.import_done = True
+
+        def on_import_failed(self, message):
+            super().on_import_failed(message)
+            self.import_done = True
+
+    results = {}
+    window = None
+
+    def construct():
+        nonlocal window
+        window = BenchApp(db_path)
+        window.show()
+        app.processEvents()
+
+    results['construct'] = timed(construct)
+    model = window.task_model
+
+    def load():
+        window.load_tasks()
+        app.processEvents()
+
+    results['load_tasks'] = statistics.median(timed(load) for _ in range(REPEAT))
+
+    # 勾选：界面响应时间，以及包含后台写入提交的时间
+    toggle_ui, toggle_commit = [], []
+    for i in range(REPEAT):
+        index = model.index(i % model.rowCount())
+        state = Qt.Unchecked if model.data(index, Qt.CheckStateRole) == Qt.Checked else Qt.Checked
+        start = time.perf_counter()
+        model.setData(index, state, Qt.CheckStateRole)
+        app.processEvents()
+        toggle_ui.append((time.perf_counter() - start) * 1000)
+        window.write_queue.flush()
+        toggle_commit.append((time.perf_counter() - start) * 1000)
+    results['toggle_completed'] = statistics.median(toggle_ui)
+    results['toggle_completed_commit'] = statistics.median(toggle_commit)
+
+    edit_times = []
+    for i in range(REPEAT):
+        window.task_list.setCurrentIndex(model.index(i % model.rowCount()))
+        start = time.perf_counter()
+        window.edit_task()
+        app.processEvents()
+        window.write_queue.flush()
+        edit_times.append((time.perf_counter() - start) * 1000)
+    results['edit_task'] = statistics.median(edit_times)
+
+    def batch_add():
+        window.batch_add_tasks()
+        while not window.import_done:
+            app.processEvents()
+            time.sleep(0.001)
+
+    results['batch_add_tasks'] = timed(batch_add)
+
+    # 批量删除作用于已完成的任务，先在数据库中按比例标记
+    window.write_queue.flush()
+    with window.repository.transaction():
+        window.repository.conn.execute('UPDATE tasks SET completed = (id % ?) = 0', (DELETE_RATIO,))
+    window.load_tasks()
+    app.processEvents()
+
+    def batch_delete():
+        window.batch_delete_tasks()
+        app.processEvents()
+
+    results['batch_delete_tasks'] = timed(batch_delete)
+
+    window.quit_application()
+    results['peak_rss_kb'] = peak_rss_kb()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(sizes, workdir):
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': {},
+    }
+    for size in sizes:
+        source = os.path.join(workdir, f'tasks_{size}.db')
+        if not os.path.exists(source):
+            print(f'生成 {size} 个任务的数据库...', file=sys.stderr)
+            generate_db(source, size)
+        target = os.path.join(workdir, f'run_{size}.db')
+        copy_db(source, target)
+        # 每个规模在独立进程中运行，峰值内存互不影响
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', target],
+                                capture_output=True, text=True, check=True).stdout
+        report['results'][str(size)] = json.loads(output.strip().splitlines()[-1])
+        print(f'{size}: {report["results"][str(size)]}', file=sys.stderr)
+    return report
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f'{old.get("commit")} -> {new.get("commit")}')
+    regressed = False
+    for size, values in new['results'].items():
+        before = old['results'].get(size, {})
+        for name, value in values.items():
+            previous = before.get(name)
+            if value is None or not previous:
+                continue
+            ratio = value / previous
+            mark = ''
+            if ratio > REGRESSION:
+                mark = '  <-- 变慢' if name != 'peak_rss_kb' else '  <-- 内存增加'
+                regressed = True
+            print(f'{size:>8} {name:<26}{previous:>12.1f}{value:>12.1f}{ratio:>8.2f}x{mark}')
+    return 1 if regressed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务清单端到端性能测试')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='数据库任务数，逗号分隔')
+    parser.add_argument('--output', default='bench_results.json', help='结果JSON文件')
+    parser.add_argument('--workdir', help='存放生成数据库的目录（默认使用临时目录）')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='比较两次结果')
+    parser.add_argument('--run', metavar='DB', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_size(args.run)))
+        return 0
+    if args.compare:
+        return compare(*args.compare)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        report = run_all(sizes, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            report = run_all(sizes, workdir)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'结果已写入 {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""绘制耗时：用 TaskItemDelegate 把任务行绘制到离屏图片上，统计每行的 sizeHint 与 paint 耗时
+
+用法: python benchmarks/bench_paint.py [--rows 2000] [--runs 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TAG_CHOICES = [(), ('工作',), ('个人',), ('学习',), ('家庭',), ('健康',), ('娱乐',), ('工作', '学习')]
+
+
+def make_tasks(count):
+    from task import Task
+
+    rng = random.Random(count)
+    return [Task(i + 1, f'任务 {i}', f'任务 {i} 的描述' if rng.random() < 0.5 else '',
+                 rng.choice(TAG_CHOICES), rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 3),
+                 int(rng.random() < 0.3), 1700000000 + i * 37)
+            for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务行绘制耗时')
+    parser.add_argument('--rows', type=int, default=2000, help='绘制的行数')
+    parser.add_argument('--runs', type=int, default=5, help='运行次数，取最小值')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QRect
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtWidgets import QApplication, QListView, QStyleOptionViewItem
+
+    from task_model import TaskListModel, TaskItemDelegate
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    model = TaskListModel()
+    model.set_tasks(make_tasks(args.rows))
+    view = QListView()
+    view.setModel(model)
+    indexes = [model.index(row) for row in range(model.rowCount())]
+
+    def run():
+        # 每次新建代理，包含首次绘制时建立缓存的开销
+        delegate = TaskItemDelegate(view)
+        option = QStyleOptionViewItem()
+        option.initFrom(view)
+        option.widget = view
+        image = QImage(800, 100, QImage.Format_ARGB32_Premultiplied)
+        painter = QPainter(image)
+        start = time.perf_counter()
+        for index in indexes:
+            option.rect = QRect(0, 0, 800, delegate.sizeHint(option, index).height())
+            delegate.paint(painter, option, index)
+        elapsed = time.perf_counter() - start
+        painter.end()
+        return elapsed
+
+    best = min(run() for _ in range(args.runs))
+    print(f'{args.rows} 行，每行 sizeHint + paint 平均 {best / args.rows * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
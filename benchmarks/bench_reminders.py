@@ -0,0 +1,65 @@
+"""提醒队列：读取并建立 N 个待提醒任务的队列、单个任务修改后更新队列的耗时
+
+用法: python benchmarks/bench_reminders.py [--tasks 100000] [--updates 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提醒队列性能')
+    parser.add_argument('--tasks', type=int, default=100000, help='设置了提醒的任务数')
+    parser.add_argument('--updates', type=int, default=10000, help='随机修改的次数')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QCoreApplication
+
+    from reminders import ReminderScheduler
+    from task_repository import TaskRepository
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])  # 定时器需要事件循环对象
+    rng = random.Random(args.tasks)
+    now = int(time.time())
+
+    with tempfile.TemporaryDirectory() as workdir:
+        repository = TaskRepository(os.path.join(workdir, 'tasks.db'))
+        repository.insert_rows([(f'任务 {i}', '', None, 1, 1, 1, 0) for i in range(args.tasks)])
+        with repository.transaction():
+            repository.conn.execute('UPDATE tasks SET due_time = ? + abs(random() % 2592000), '
+                                    'remind_time = NULL', (now + 3600,))
+            repository.conn.execute('UPDATE tasks SET remind_time = due_time - 900 WHERE id % 2 = 0')
+
+        start = time.perf_counter()
+        rows = repository.fetch_reminders(now)
+        fetch_ms = (time.perf_counter() - start) * 1000
+
+        scheduler = ReminderScheduler()
+        start = time.perf_counter()
+        scheduler.set_reminders(rows, now)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        ids = [row[0] for row in rows]
+        start = time.perf_counter()
+        for _ in range(args.updates):
+            due = now + rng.randrange(60, 2592000)
+            scheduler.update(rng.choice(ids), due - 300, due, now)
+        update_us = (time.perf_counter() - start) / args.updates * 1e6
+        repository.close()
+
+    print(f'{len(rows)} 个任务，{len(scheduler)} 个提醒时间点')
+    print(f'读取: {fetch_ms:.1f} ms  建立队列: {build_ms:.1f} ms  单次修改: {update_us:.1f} us')
+    print(f'定时器: {"已启动" if scheduler._timer.isActive() else "未启动"}，'
+          f'{scheduler._timer.remainingTime() / 1000:.0f} 秒后唤醒（期间没有其他定时唤醒）')
+    del app
+
+
+if __name__ == '__main__':
+    main()
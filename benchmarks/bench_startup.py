@@ -0,0 +1,61 @@
+"""启动计时：从启动进程到窗口首次绘制、到数据库就绪（首屏任务已加载）的耗时
+
+运行若干次取中位数。
+
+用法: python benchmarks/bench_startup.py [--tasks 100000] [--runs 5] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_app import generate_db, git_commit
+
+
+def launch(workdir):
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['TASKLIST_LAUNCH_PROBE'] = repr(time.time())
+    output = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py')], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True, timeout=60).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务清单启动计时')
+    parser.add_argument('--tasks', type=int, default=100000, help='数据库任务数')
+    parser.add_argument('--runs', type=int, default=5, help='运行次数')
+    parser.add_argument('--output', help='结果JSON文件')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        data_dir = os.path.join(workdir, 'data')
+        os.makedirs(data_dir)
+        generate_db(os.path.join(data_dir, 'tasks.db'), args.tasks)
+        launch(workdir)  # 预热文件系统缓存
+        samples = [launch(workdir) for _ in range(args.runs)]
+
+    report = {
+        'commit': git_commit(),
+        'tasks': args.tasks,
+        **summarize(samples),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""比较旧版 Task（__dict__ + 逐行解析文本时间）与新版 Task（__slots__ + 整数秒）
+
+用法: python benchmarks/bench_task_record.py [任务数]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task import Task, format_timestamp
+
+
+class LegacyTask:
+    """旧版实现：每个实例带 __dict__，构造时就解析两个时间字符串"""
+
+    def __init__(self, id, title, description, category, priority, urgency, duration, completed,
+                 created_time, updated_time):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.category = category
+        self.priority = priority
+        self.urgency = urgency
+        self.duration = duration
+        self.completed = completed
+        self.created_time = datetime.fromisoformat(created_time)
+        self.updated_time = datetime.fromisoformat(updated_time)
+
+
+def legacy_rows(count):
+    base = 1700000000
+    for i in range(count):
+        text = datetime.utcfromtimestamp(base + i * 37).strftime('%Y-%m-%d %H:%M:%S')
+        yield (i + 1, f'任务 {i}', '', '未分类', 1, 2, 2, 0, text, text)
+
+
+def epoch_rows(count):
+    base = 1700000000
+    for i in range(count):
+        ts = base + i * 37
+        yield (i + 1, f'任务 {i}', '', None, 1, 2, 2, 0, ts, ts, None, None, None, ts << 16, None)
+
+
+def measure(build, rows):
+    # 计时与内存分开测量，tracemalloc 本身会显著拖慢构造；耗时取多次运行的最小值
+    elapsed = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        build(rows)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    tracemalloc.start()
+    tasks = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tasks, elapsed, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    old_rows = list(legacy_rows(count))
+    new_rows = list(epoch_rows(count))
+
+    old_tasks, old_time, old_mem = measure(lambda rows: [LegacyTask(*row) for row in rows], old_rows)
+    new_tasks, new_time, new_mem = measure(lambda rows: [Task.from_row(row) for row in rows], new_rows)
+
+    # 一屏大约显示 30 行，只有这些行才需要格式化时间
+    start = time.perf_counter()
+    for task in old_tasks[:30]:
+        task.created_time.strftime('%Y-%m-%d %H:%M')
+    old_paint = time.perf_counter() - start
+    start = time.perf_counter()
+    for task in new_tasks[:30]:
+        format_timestamp(task.created_ts)
+    new_paint = time.perf_counter() - start
+
+    print(f'{count} 个任务')
+    print(f'{"":8}{"构造耗时(ms)":>14}{"内存/任务(B)":>14}{"一屏时间格式化(us)":>20}')
+    print(f'{"旧版":8}{old_time * 1000:>14.1f}{old_mem / count:>14.0f}{old_paint * 1e6:>20.1f}')
+    print(f'{"新版":8}{new_time * 1000:>14.1f}{new_mem / count:>14.0f}{new_paint * 1e6:>20.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import io
+import json
+import os
+import platform
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# 设置该环境变量（非空且不为0）时启动即开启性能诊断
+ENV_VAR = 'TASKLIST_DIAGNOSTICS'
+# 每项操作保留的最近样本数
+WINDOW = 1000
+
+# 各对象需要计时的方法
+REPOSITORY_METHODS = ('load_tasks', 'fetch_page', 'get_task', 'add_task', 'insert_rows', 'update_task',
+                      'set_completed', 'delete_task', 'delete_tasks', 'count_tasks',
+                      'bulk_delete', 'bulk_update', 'fetch_changes', 'facet_counts',
+                      'archive_completed', 'restore_tasks', 'fetch_reminders',
+                      'materialize_rules', 'set_rank', 'rebalance_ranks', 'fetch_children', 'subtree_counts',
+                      'tag_names', 'bulk_tag', 'statistics', 'summary', 'undo', 'redo')
+MODEL_METHODS = ('_reset', 'set_source', 'fetchMore', 'insert_task', 'insert_tasks',
+                 'update_task', 'remove_row', 'apply_bulk', 'apply_changes', 'remove_tasks',
+                 'set_ranks', 'refresh_rollups')
+DELEGATE_METHODS = ('paint', 'sizeHint')
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Instrumentation:
+    """可选的性能计时
+
+    关闭时不安装任何包装，被测对象的方法保持原样，没有额外开销；
+    开启后把已登记对象的方法替换为计时包装，每项操作保留最近 WINDOW 个耗时样本。
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = False
+        self.last_profile = ''
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._targets = []
+        if enabled:
+            self.set_enabled(True)
+
+    def record(self, name, elapsed_ms):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=WINDOW)
+            samples.append(elapsed_ms)
+
+    @contextmanager
+    def timed(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def attach(self, obj, prefix, methods):
+        """登记需要计时的对象，开启时为其方法安装计时包装"""
+        with self._lock:
+            self._targets.append((obj, prefix, methods))
+            if self.enabled:
+                self._install(obj, prefix, methods)
+
+    def detach(self, obj):
+        with self._lock:
+            for target, _, methods in self._targets:
+                if target is obj:
+                    self._uninstall(obj, methods)
+            self._targets = [target for target in self._targets if target[0] is not obj]
+
+    def _install(self, obj, prefix, methods):
+        for method in methods:
+            if method in vars(obj):
+                continue
+            original = getattr(obj, method)
+            setattr(obj, method, self._wrap(f'{prefix}.{method}', original))
+
+    def _uninstall(self, obj, methods):
+        for method in methods:
+            vars(obj).pop(method, None)
+
+    def _wrap(self, name, func):
+        record = self.record
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+
+    def set_enabled(self, enabled):
+        if enabled == self.enabled:
+            return
+        with self._lock:
+            self.enabled = enabled
+            for obj, prefix, methods in self._targets:
+                if enabled:
+                    self._install(obj, prefix, methods)
+                else:
+                    self._uninstall(obj, methods)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+        self.last_profile = ''
+
+    def stats(self):
+        """{操作: {count, p50, p95, max, total}}，时间单位为毫秒"""
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+        result = {}
+        for name, ordered in sorted(snapshot.items()):
+            if not ordered:
+                continue
+            result[name] = {
+                'count': len(ordered),
+                'p50': _percentile(ordered, 0.5),
+                'p95': _percentile(ordered, 0.95),
+                'max': ordered[-1],
+                'total': sum(ordered),
+            }
+        return result
+
+    def profile(self, func, limit=40):
+        """用 cProfile 运行一次 func，返回按累计耗时排序的统计文本"""
+        # 只在需要时导入，避免拖慢启动
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.runcall(func)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        self.last_profile = out.getvalue()
+        return self.last_profile
+
+    def export(self, path, extra=None):
+        """导出统计结果、最近样本与最近一次分析结果，附在问题报告中"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        report = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'stats': self.stats(),
+            'samples': samples,
+            'profile': self.last_profile,
+        }
+        if extra:
+            report.update(extra)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+# 全局实例，界面与后台线程共用
+instrumentation = Instrumentation(os.environ.get(ENV_VAR, '') not in ('', '0'))
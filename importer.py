@@ -0,0 +1,175 @@
+import csv
+import json
+import os
+
+from task import PRIORITY_TEXTS, URGENCY_TEXTS, DURATION_TEXTS, encode_tags, normalize_tags, parse_level
+
+# 每个事务插入的任务数
+CHUNK_SIZE = 5000
+
+# CSV/JSONL 中可识别的字段名（同时支持中文表头）
+FIELD_ALIASES = {
+    'title': 'title', '标题': 'title', '任务标题': 'title',
+    'description': 'description', '描述': 'description', '任务描述': 'description',
+    'tags': 'tags', '标签': 'tags',
+    # 旧版本导出的分类作为一个标签
+    'category': 'tags', '分类': 'tags', '任务分类': 'tags',
+    'priority': 'priority', '优先级': 'priority',
+    'urgency': 'urgency', '紧急程度': 'urgency',
+    'duration': 'duration', '周期': 'duration', '任务周期': 'duration',
+    'completed': 'completed', '完成状态': 'completed',
+}
+# 无表头CSV按此顺序解释各列
+CSV_COLUMNS = ['title', 'description', 'tags', 'priority', 'urgency', 'duration']
+# 表示已完成的文字（导出的 CSV 中为 0/1），其余均视为未完成
+COMPLETED_TEXTS = ('1', 'true', 'yes', 'x', '是', '已完成')
+
+
+class LineSource:
+    """逐行读取文件或文本，记录已读取的位置用于显示进度"""
+
+    def __init__(self, path=None, text=None):
+        self.path = path
+        self.text = text
+        self.position = 0
+        if path is not None:
+            self.total = os.path.getsize(path)
+        else:
+            self.total = len(text)
+
+    def __iter__(self):
+        if self.path is None:
+            start = 0
+            text = self.text
+            while start < len(text):
+                end = text.find('\n', start)
+                end = len(text) if end < 0 else end + 1
+                self.position = end
+                yield text[start:end]
+                start = end
+            return
+        with open(self.path, 'rb') as f:
+            first = True
+            for raw in f:
+                self.position += len(raw)
+                if first:
+                    first = False
+                    yield raw.decode('utf-8-sig')
+                else:
+                    yield raw.decode('utf-8')
+
+    def progress(self):
+        """已读取的百分比"""
+        if not self.total:
+            return 100
+        return min(100, self.position * 100 // self.total)
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return 'text'
+
+
+def parse_text_lines(lines):
+    """每行一个任务标题，可选添加描述(用|分隔)"""
+    for line in lines:
+        if line.strip():
+            parts = line.split('|', 1)
+            title = parts[0].strip()
+            desc = parts[1].strip() if len(parts) > 1 else ""
+            if title:
+                yield {'title': title, 'description': desc}
+
+
+def parse_csv(lines):
+    reader = csv.reader(lines)
+    columns = None
+    for row in reader:
+        if not row:
+            continue
+        if columns is None:
+            header = [FIELD_ALIASES.get(cell.strip().lower()) for cell in row]
+            if 'title' in header:
+                columns = header
+                continue
+            columns = CSV_COLUMNS
+        record = {name: value for name, value in zip(columns, row) if name}
+        if record.get('title', '').strip():
+            yield record
+
+
+def parse_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        obj = json.loads(line)
+        record = {FIELD_ALIASES[key]: value for key, value in obj.items() if key in FIELD_ALIASES}
+        if str(record.get('title', '')).strip():
+            yield record
+
+
+PARSERS = {
+    'text': parse_text_lines,
+    'csv': parse_csv,
+    'jsonl': parse_jsonl,
+}
+
+
+def parse_completed(value):
+    """完成状态：JSONL 中为数字或布尔值，CSV 中为文字；没有该字段时为未完成"""
+    if isinstance(value, str):
+        return int(value.strip().lower() in COMPLETED_TEXTS)
+    return int(bool(value))
+
+
+def to_row(record, default_attrs):
+    """把解析出的记录与默认属性合并为插入用的元组
+
+    标签可以是列表（JSONL）或逗号分隔的文字（CSV），没有标签时使用默认标签。
+    """
+    return (
+        str(record['title']).strip(),
+        str(record.get('description') or '').strip(),
+        encode_tags(normalize_tags(record.get('tags')) or default_attrs['tags']),
+        parse_level(record.get('priority'), PRIORITY_TEXTS, default_attrs['priority']),
+        parse_level(record.get('urgency'), URGENCY_TEXTS, default_attrs['urgency']),
+        parse_level(record.get('duration'), DURATION_TEXTS, default_attrs['duration']),
+        parse_completed(record.get('completed')),
+    )
+
+
+def import_tasks(repository, records, default_attrs, chunk_size=CHUNK_SIZE,
+                 progress=None, cancelled=None):
+    """流式导入：每 chunk_size 条用 executemany 在一个事务内插入
+
+    内存中最多只保留一个批次；取消后已提交的批次保留。返回导入的任务数。
+    已提交的各批次合起来作为一次批量添加记入撤销日志（只记录 id 范围）。
+    """
+    count = 0
+    chunk = []
+    ranges = []
+    try:
+        for record in records:
+            chunk.append(to_row(record, default_attrs))
+            if len(chunk) >= chunk_size:
+                ranges.append(repository.insert_rows(chunk))
+                count += len(chunk)
+                chunk = []
+                if progress:
+                    progress(count)
+                if cancelled and cancelled():
+                    return count
+        if chunk:
+            ranges.append(repository.insert_rows(chunk))
+            count += len(chunk)
+            if progress:
+                progress(count)
+        return count
+    finally:
+        if count:
+            repository.journal_insert(ranges, count)
@@ -1,754 +1,1819 @@
-import sys
-import os
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QListWidget, QListWidgetItem, QLineEdit, 
-                             QTextEdit, QDialog, QLabel, QCheckBox, QSystemTrayIcon, 
-                             QMenu, QAction, QMessageBox, QStyle, QComboBox, QGroupBox, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QIcon
-import sqlite3
-from datetime import datetime
-
-# 确保data目录存在
-os.makedirs('data', exist_ok=True)
-
-class Task:
-    def __init__(self, id, title, description, category='未分类', priority=1, urgency=1, duration=2, completed=0, created_time=None, updated_time=None):
-        self.id = id
-        self.title = title
-        self.description = description
-        self.category = category
-        self.priority = priority  # 1=低, 2=中, 3=高
-        self.urgency = urgency    # 1=不急, 2=一般, 3=紧急
-        self.duration = duration  # 1=短期, 2=中期, 3=长期
-        self.completed = completed
-        self.created_time = created_time or datetime.now()
-        self.updated_time = updated_time or datetime.now()
-
-class TaskDialog(QDialog):
-    def __init__(self, parent=None, task=None):
-        super().__init__(parent)
-        self.task = task
-        self.initUI()
-        
-    def initUI(self):
-        self.setWindowTitle("添加任务" if not self.task else "编辑任务")
-        self.setModal(True)
-        self.resize(450, 400)
-        
-        layout = QVBoxLayout()
-        layout.setSpacing(10)  # 设置整体间距
-        
-        # 标题输入
-        title_layout = QHBoxLayout()
-        title_layout.addWidget(QLabel("任务标题:"))
-        self.title_edit = QLineEdit()
-        if self.task:
-            self.title_edit.setText(self.task.title)
-        title_layout.addWidget(self.title_edit)
-        layout.addLayout(title_layout)
-        
-        # 分类选择
-        category_layout = QHBoxLayout()
-        category_layout.addWidget(QLabel("任务分类:"))
-        self.category_combo = QComboBox()
-        self.category_combo.addItems(['未分类', '工作', '个人', '学习', '家庭', '健康', '娱乐'])
-        if self.task:
-            index = self.category_combo.findText(self.task.category)
-            if index >= 0:
-                self.category_combo.setCurrentIndex(index)
-        category_layout.addWidget(self.category_combo)
-        layout.addLayout(category_layout)
-        
-        # 优先级选择
-        priority_layout = QHBoxLayout()
-        priority_layout.addWidget(QLabel("优先级:"))
-        self.priority_combo = QComboBox()
-        self.priority_combo.addItems(['低', '中', '高'])
-        if self.task:
-            self.priority_combo.setCurrentIndex(self.task.priority - 1)
-        priority_layout.addWidget(self.priority_combo)
-        layout.addLayout(priority_layout)
-        
-        # 紧急程度选择
-        urgency_layout = QHBoxLayout()
-        urgency_layout.addWidget(QLabel("紧急程度:"))
-        self.urgency_combo = QComboBox()
-        self.urgency_combo.addItems(['不急', '一般', '紧急'])
-        if self.task:
-            self.urgency_combo.setCurrentIndex(self.task.urgency - 1)
-        urgency_layout.addWidget(self.urgency_combo)
-        layout.addLayout(urgency_layout)
-        
-        # 任务周期选择
-        duration_layout = QHBoxLayout()
-        duration_layout.addWidget(QLabel("任务周期:"))
-        self.duration_combo = QComboBox()
-        self.duration_combo.addItems(['短期', '中期', '长期'])
-        if self.task:
-            self.duration_combo.setCurrentIndex(self.task.duration - 1)
-        duration_layout.addWidget(self.duration_combo)
-        layout.addLayout(duration_layout)
-        
-        # 描述输入
-        layout.addWidget(QLabel("任务描述:"))
-        self.desc_edit = QTextEdit()
-        self.desc_edit.setMaximumHeight(100)
-        self.desc_edit.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        if self.task:
-            self.desc_edit.setPlainText(self.task.description)
-        layout.addWidget(self.desc_edit)
-        
-        # 按钮
-        btn_layout = QHBoxLayout()
-        self.ok_btn = QPushButton("确定")
-        self.cancel_btn = QPushButton("取消")
-        self.ok_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-        btn_layout.addWidget(self.ok_btn)
-        btn_layout.addWidget(self.cancel_btn)
-        layout.addLayout(btn_layout)
-        
-        self.setLayout(layout)
-        
-    def get_data(self):
-        priority_map = {'低': 1, '中': 2, '高': 3}
-        urgency_map = {'不急': 1, '一般': 2, '紧急': 3}
-        duration_map = {'短期': 1, '中期': 2, '长期': 3}
-        
-        return {
-            'title': self.title_edit.text(),
-            'description': self.desc_edit.toPlainText(),
-            'category': self.category_combo.currentText(),
-            'priority': priority_map[self.priority_combo.currentText()],
-            'urgency': urgency_map[self.urgency_combo.currentText()],
-            'duration': duration_map[self.duration_combo.currentText()]
-        }
-
-class BatchAddDialog(QDialog):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.initUI()
-        
-    def initUI(self):
-        self.setWindowTitle("批量添加任务")
-        self.setModal(True)
-        self.resize(500, 400)
-        
-        layout = QVBoxLayout()
-        
-        layout.addWidget(QLabel("每行一个任务标题，可选添加描述(用|分隔):"))
-        layout.addWidget(QLabel("例如: 购买食材|去超市买蔬菜水果"))
-        
-        self.text_edit = QTextEdit()
-        layout.addWidget(self.text_edit)
-        
-        # 默认属性设置
-        attr_group = QGroupBox("默认属性设置")
-        attr_layout = QVBoxLayout()
-        
-        # 分类选择
-        category_layout = QHBoxLayout()
-        category_layout.addWidget(QLabel("默认分类:"))
-        self.category_combo = QComboBox()
-        self.category_combo.addItems(['未分类', '工作', '个人', '学习', '家庭', '健康', '娱乐'])
-        category_layout.addWidget(self.category_combo)
-        attr_layout.addLayout(category_layout)
-        
-        # 优先级选择
-        priority_layout = QHBoxLayout()
-        priority_layout.addWidget(QLabel("默认优先级:"))
-        self.priority_combo = QComboBox()
-        self.priority_combo.addItems(['低', '中', '高'])
-        priority_layout.addWidget(self.priority_combo)
-        attr_layout.addLayout(priority_layout)
-        
-        # 紧急程度选择
-        urgency_layout = QHBoxLayout()
-        urgency_layout.addWidget(QLabel("默认紧急程度:"))
-        self.urgency_combo = QComboBox()
-        self.urgency_combo.addItems(['不急', '一般', '紧急'])
-        urgency_layout.addWidget(self.urgency_combo)
-        attr_layout.addLayout(urgency_layout)
-        
-        # 任务周期选择
-        duration_layout = QHBoxLayout()
-        duration_layout.addWidget(QLabel("默认任务周期:"))
-        self.duration_combo = QComboBox()
-        self.duration_combo.addItems(['短期', '中期', '长期'])
-        duration_layout.addWidget(self.duration_combo)
-        attr_layout.addLayout(duration_layout)
-        
-        attr_group.setLayout(attr_layout)
-        layout.addWidget(attr_group)
-        
-        # 按钮
-        btn_layout = QHBoxLayout()
-        self.ok_btn = QPushButton("添加")
-        self.cancel_btn = QPushButton("取消")
-        self.ok_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-        btn_layout.addWidget(self.ok_btn)
-        btn_layout.addWidget(self.cancel_btn)
-        layout.addLayout(btn_layout)
-        
-        self.setLayout(layout)
-        
-    def get_tasks(self):
-        text = self.text_edit.toPlainText()
-        tasks = []
-        for line in text.split('\n'):
-            if line.strip():
-                parts = line.split('|', 1)
-                title = parts[0].strip()
-                desc = parts[1].strip() if len(parts) > 1 else ""
-                if title:
-                    tasks.append({'title': title, 'description': desc})
-        return tasks
-        
-    def get_default_attributes(self):
-        priority_map = {'低': 1, '中': 2, '高': 3}
-        urgency_map = {'不急': 1, '一般': 2, '紧急': 3}
-        duration_map = {'短期': 1, '中期': 2, '长期': 3}
-        
-        return {
-            'category': self.category_combo.currentText(),
-            'priority': priority_map[self.priority_combo.currentText()],
-            'urgency': urgency_map[self.urgency_combo.currentText()],
-            'duration': duration_map[self.duration_combo.currentText()]
-        }
-
-class SettingsDialog(QDialog):
-    def __init__(self, parent=None, close_to_tray=True):
-        super().__init__(parent)
-        self.close_to_tray = close_to_tray
-        self.initUI()
-        
-    def initUI(self):
-        self.setWindowTitle("设置")
-        self.setModal(True)
-        layout = QVBoxLayout()
-        
-        self.tray_checkbox = QCheckBox("关闭时最小化到托盘")
-        self.tray_checkbox.setChecked(self.close_to_tray)
-        layout.addWidget(self.tray_checkbox)
-        
-        btn_layout = QHBoxLayout()
-        self.ok_btn = QPushButton("确定")
-        self.cancel_btn = QPushButton("取消")
-        self.ok_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
-        btn_layout.addWidget(self.ok_btn)
-        btn_layout.addWidget(self.cancel_btn)
-        layout.addLayout(btn_layout)
-        
-        self.setLayout(layout)
-        
-    def get_settings(self):
-        return {
-            'close_to_tray': self.tray_checkbox.isChecked()
-        }
-
-class TaskItemWidget(QWidget):
-    def __init__(self, task, parent=None):
-        super().__init__(parent)
-        self.task = task
-        self.initUI()
-        
-    def initUI(self):
-        self.main_layout = QVBoxLayout()
-        self.main_layout.setContentsMargins(5, 5, 5, 5)
-        self.main_layout.setSpacing(5)  # 增大间距
-        
-        # 主要信息行
-        top_layout = QHBoxLayout()
-        
-        # 完成状态的勾选框
-        self.completed_checkbox = QCheckBox()
-        self.completed_checkbox.setChecked(bool(self.task.completed))
-        self.completed_checkbox.toggled.connect(self.toggle_completed)
-        top_layout.addWidget(self.completed_checkbox)
-        
-        # 任务标题
-        self.title_label = QLabel(self.task.title)
-        self.title_label.setStyleSheet("font-weight: bold;")
-        self.title_label.setWordWrap(False)  # 不换行显示
-        self.title_label.setMinimumWidth(100)  # 设置最小宽度
-        self.title_label.setMaximumWidth(300)  # 设置最大宽度
-        self.title_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)  # 允许扩展
-        top_layout.addWidget(self.title_label)
-        top_layout.addStretch()
-        
-        # 标签区域（集中显示在右侧）
-        tags_layout = QHBoxLayout()
-        tags_layout.setSpacing(5)
-        
-        # 分类标签
-        self.category_label = QLabel(f"[{self.task.category}]")
-        self.category_label.setStyleSheet("color: blue; font-size: 10px; border: 1px solid blue; border-radius: 3px; padding: 1px 3px;")
-        tags_layout.addWidget(self.category_label)
-        
-        # 优先级标签
-        priority_text = ['低', '中', '高'][self.task.priority - 1]
-        priority_color = ['green', 'orange', 'red'][self.task.priority - 1]
-        self.priority_label = QLabel(priority_text)
-        self.priority_label.setStyleSheet(f"color: {priority_color}; font-size: 10px; border: 1px solid {priority_color}; border-radius: 3px; padding: 1px 3px;")
-        tags_layout.addWidget(self.priority_label)
-        
-        # 紧急程度标签
-        urgency_text = ['不急', '一般', '紧急'][self.task.urgency - 1]
-        urgency_color = ['gray', 'orange', 'red'][self.task.urgency - 1]
-        self.urgency_label = QLabel(urgency_text)
-        self.urgency_label.setStyleSheet(f"color: {urgency_color}; font-size: 10px; border: 1px solid {urgency_color}; border-radius: 3px; padding: 1px 3px;")
-        tags_layout.addWidget(self.urgency_label)
-        
-        # 任务周期标签
-        duration_text = ['短期', '中期', '长期'][self.task.duration - 1]
-        self.duration_label = QLabel(duration_text)
-        self.duration_label.setStyleSheet("color: purple; font-size: 10px; border: 1px solid purple; border-radius: 3px; padding: 1px 3px;")
-        tags_layout.addWidget(self.duration_label)
-        
-        top_layout.addLayout(tags_layout)
-        self.main_layout.addLayout(top_layout)
-        
-        # 任务描述（直接显示，不隐藏）
-        if self.task.description:
-            self.desc_label = QLabel(self.task.description)
-            self.desc_label.setStyleSheet("color: gray; font-size: 12px; margin-left: 20px;")
-            self.desc_label.setWordWrap(True)  # 允许描述换行
-            self.main_layout.addWidget(self.desc_label)
-        
-        # 时间信息行
-        time_layout = QHBoxLayout()
-        time_label = QLabel(self.task.created_time.strftime("%Y-%m-%d %H:%M"))
-        time_label.setStyleSheet("color: gray; font-size: 10px; margin-left: 20px;")
-        time_layout.addWidget(time_label)
-        time_layout.addStretch()
-        self.main_layout.addLayout(time_layout)
-        
-        self.setLayout(self.main_layout)
-        
-        # 根据完成状态设置样式
-        self.update_style()
-        
-    def toggle_completed(self, checked):
-        self.task.completed = int(checked)
-        # 更新数据库
-        conn = sqlite3.connect('data/tasks.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE tasks SET completed=?, updated_time=CURRENT_TIMESTAMP WHERE id=?', 
-                      (int(checked), self.task.id))
-        conn.commit()
-        conn.close()
-        
-        # 更新样式
-        self.update_style()
-        
-        # 通知主窗口重新排序任务列表
-        main_window = self.window()
-        if hasattr(main_window, 'reorder_tasks'):
-            main_window.reorder_tasks()
-        
-    def update_style(self):
-        if self.task.completed:
-            self.title_label.setStyleSheet("font-weight: bold; text-decoration: line-through; color: gray;")
-            if hasattr(self, 'desc_label'):
-                self.desc_label.setStyleSheet("color: gray; font-size: 12px; text-decoration: line-through; margin-left: 20px;")
-        else:
-            self.title_label.setStyleSheet("font-weight: bold;")
-            if hasattr(self, 'desc_label'):
-                self.desc_label.setStyleSheet("color: gray; font-size: 12px; margin-left: 20px;")
-                
-    def update_labels(self):
-        """更新标签显示内容"""
-        # 更新分类标签
-        self.category_label.setText(f"[{self.task.category}]")
-        
-        # 更新优先级标签
-        priority_text = ['低', '中', '高'][self.task.priority - 1]
-        priority_color = ['green', 'orange', 'red'][self.task.priority - 1]
-        self.priority_label.setText(priority_text)
-        self.priority_label.setStyleSheet(f"color: {priority_color}; font-size: 10px; border: 1px solid {priority_color}; border-radius: 3px; padding: 1px 3px;")
-        
-        # 更新紧急程度标签
-        urgency_text = ['不急', '一般', '紧急'][self.task.urgency - 1]
-        urgency_color = ['gray', 'orange', 'red'][self.task.urgency - 1]
-        self.urgency_label.setText(urgency_text)
-        self.urgency_label.setStyleSheet(f"color: {urgency_color}; font-size: 10px; border: 1px solid {urgency_color}; border-radius: 3px; padding: 1px 3px;")
-        
-        # 更新任务周期标签
-        duration_text = ['短期', '中期', '长期'][self.task.duration - 1]
-        self.duration_label.setText(duration_text)
-        self.duration_label.setStyleSheet("color: purple; font-size: 10px; border: 1px solid purple; border-radius: 3px; padding: 1px 3px;")
-        
-class TaskListApp(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.db_path = 'data/tasks.db'
-        self.init_db()
-        self.close_to_tray = True  # 默认关闭时最小化到托盘
-        self.initUI()
-        self.load_tasks()
-        self.create_tray_icon()
-        
-    def init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                category TEXT DEFAULT '未分类',
-                priority INTEGER DEFAULT 1,  -- 1=低, 2=中, 3=高
-                urgency INTEGER DEFAULT 1,   -- 1=不急, 2=一般, 3=紧急
-                duration INTEGER DEFAULT 2,  -- 1=短期, 2=中期, 3=长期
-                completed INTEGER DEFAULT 0,
-                created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        # 检查并添加新字段
-        try:
-            cursor.execute('ALTER TABLE tasks ADD COLUMN category TEXT DEFAULT "未分类"')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
-            
-        try:
-            cursor.execute('ALTER TABLE tasks ADD COLUMN priority INTEGER DEFAULT 1')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
-            
-        try:
-            cursor.execute('ALTER TABLE tasks ADD COLUMN urgency INTEGER DEFAULT 1')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
-            
-        try:
-            cursor.execute('ALTER TABLE tasks ADD COLUMN duration INTEGER DEFAULT 2')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
-            
-        conn.commit()
-        conn.close()
-        
-    def initUI(self):
-        self.setWindowTitle('任务清单')
-        self.setGeometry(100, 100, 600, 400)
-        
-        # 创建中央部件
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        main_layout = QVBoxLayout(central_widget)
-        
-        # 按钮布局
-        btn_layout = QHBoxLayout()
-        
-        self.add_btn = QPushButton('添加任务')
-        self.edit_btn = QPushButton('编辑任务')
-        self.delete_btn = QPushButton('删除任务')
-        self.batch_delete_btn = QPushButton('批量删除')
-        self.batch_add_btn = QPushButton('批量添加')
-        self.settings_btn = QPushButton('设置')
-        
-        self.add_btn.clicked.connect(self.add_task)
-        self.edit_btn.clicked.connect(self.edit_task)
-        self.delete_btn.clicked.connect(self.delete_task)
-        self.batch_delete_btn.clicked.connect(self.batch_delete_tasks)
-        self.batch_add_btn.clicked.connect(self.batch_add_tasks)
-        self.settings_btn.clicked.connect(self.open_settings)
-        
-        btn_layout.addWidget(self.add_btn)
-        btn_layout.addWidget(self.edit_btn)
-        btn_layout.addWidget(self.delete_btn)
-        btn_layout.addWidget(self.batch_delete_btn)
-        btn_layout.addWidget(self.batch_add_btn)
-        btn_layout.addStretch()
-        btn_layout.addWidget(self.settings_btn)
-        
-        main_layout.addLayout(btn_layout)
-        
-        # 任务列表
-        self.task_list = QListWidget()
-        main_layout.addWidget(self.task_list)
-        
-    def load_tasks(self):
-        self.task_list.clear()
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # 按照紧急程度和任务周期排序：
-        # 1. 紧急+短期 (urgency=3, duration=1)
-        # 2. 紧急+中期 (urgency=3, duration=2)
-        # 3. 紧急+长期 (urgency=3, duration=3)
-        # 4. 一般+短期 (urgency=2, duration=1)
-        # 5. 一般+中期 (urgency=2, duration=2)
-        # 6. 一般+长期 (urgency=2, duration=3)
-        # 7. 不急+短期 (urgency=1, duration=1)
-        # 8. 不急+中期 (urgency=1, duration=2)
-        # 9. 不急+长期 (urgency=1, duration=3)
-        # 在每个 urgency+duration 组内，未完成的任务在前，已完成的任务在后，按创建时间倒序排列
-        cursor.execute('''SELECT id, title, description, category, priority, urgency, duration, completed, created_time, updated_time 
-                         FROM tasks ORDER BY 
-                         (3 - urgency) * 3 + (duration - 1),  -- Urgency and duration sorting
-                         completed ASC,  -- Uncompleted first, completed last
-                         created_time DESC''')  # Sort by creation time descending
-        rows = cursor.fetchall()
-        conn.close()
-        
-        for row in rows:
-            task = Task(row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7],
-                       datetime.fromisoformat(row[8]), 
-                       datetime.fromisoformat(row[9]) if row[9] else datetime.fromisoformat(row[8]))
-            self.add_task_to_list(task)
-            
-    def add_task_to_list(self, task):
-        item = QListWidgetItem()
-        widget = TaskItemWidget(task)
-        item.setSizeHint(widget.sizeHint())
-        self.task_list.addItem(item)
-        self.task_list.setItemWidget(item, widget)
-        # 将task对象关联到item上
-        item.setData(Qt.UserRole, task)
-        
-    def add_task(self):
-        dialog = TaskDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            data = dialog.get_data()
-            if data['title'].strip():
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO tasks (title, description, category, priority, urgency, duration, completed) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (data['title'], data['description'], data['category'], data['priority'], 
-                      data['urgency'], data['duration'], 0))  # 新任务默认未完成
-                task_id = cursor.lastrowid
-                conn.commit()
-                conn.close()
-                
-                task = Task(task_id, data['title'], data['description'], data['category'], 
-                           data['priority'], data['urgency'], data['duration'], 0)
-                self.add_task_to_list(task)
-                
-    def edit_task(self):
-        current_item = self.task_list.currentItem()
-        if not current_item:
-            QMessageBox.information(self, "提示", "请先选择一个任务")
-            return
-            
-        task = current_item.data(Qt.UserRole)
-        dialog = TaskDialog(self, task)
-        if dialog.exec_() == QDialog.Accepted:
-            data = dialog.get_data()
-            if data['title'].strip():
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE tasks 
-                    SET title=?, description=?, category=?, priority=?, urgency=?, duration=?, updated_time=CURRENT_TIMESTAMP 
-                    WHERE id=?
-                ''', (data['title'], data['description'], data['category'], data['priority'], 
-                      data['urgency'], data['duration'], task.id))
-                conn.commit()
-                conn.close()
-                
-                # 更新任务对象
-                task.title = data['title']
-                task.description = data['description']
-                task.category = data['category']
-                task.priority = data['priority']
-                task.urgency = data['urgency']
-                task.duration = data['duration']
-                task.updated_time = datetime.now()
-                
-                # 更新界面
-                widget = self.task_list.itemWidget(current_item)
-                widget.title_label.setText(task.title)
-                
-                # 更新标签显示
-                widget.task = task  # 更新widget中的task引用
-                widget.update_labels()  # 刷新标签显示
-                
-                # 更新描述信息
-                if hasattr(widget, 'desc_label'):
-                    widget.desc_label.setText(task.description)
-                    # 如果描述为空，隐藏描述标签
-                    if not task.description:
-                        widget.desc_label.hide()
-                    else:
-                        widget.desc_label.show()
-                else:
-                    # 如果之前没有描述，现在添加了描述
-                    if task.description:
-                        widget.desc_label = QLabel(task.description)
-                        widget.desc_label.setStyleSheet("color: gray; font-size: 12px; margin-left: 20px;")
-                        widget.desc_label.setWordWrap(True)
-                        # 插入到正确位置
-                        widget.main_layout.insertWidget(1, widget.desc_label)
-                
-                # 更新样式（保持原有完成状态）
-                widget.update_style()
-                
-                # 重新加载任务列表以确保排序正确
-                self.load_tasks()
-                
-    def delete_task(self):
-        current_item = self.task_list.currentItem()
-        if not current_item:
-            QMessageBox.information(self, "提示", "请先选择一个任务")
-            return
-            
-        reply = QMessageBox.question(self, "确认", "确定要删除选中的任务吗？",
-                                    QMessageBox.Yes | QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            task = current_item.data(Qt.UserRole)
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM tasks WHERE id=?', (task.id,))
-            conn.commit()
-            conn.close()
-            
-            # 从列表中移除
-            row = self.task_list.row(current_item)
-            self.task_list.takeItem(row)
-            
-    def batch_delete_tasks(self):
-        selected_items = []
-        for i in range(self.task_list.count()):
-            item = self.task_list.item(i)
-            widget = self.task_list.itemWidget(item)
-            # 使用完成状态的checkbox而不是旧的checkbox
-            if widget.completed_checkbox.isChecked():
-                selected_items.append(item)
-                
-        if not selected_items:
-            QMessageBox.information(self, "提示", "请先选择要删除的任务")
-            return
-            
-        reply = QMessageBox.question(self, "确认", f"确定要删除选中的{len(selected_items)}个任务吗？",
-                                    QMessageBox.Yes | QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            ids_to_delete = []
-            rows_to_remove = []
-            
-            for item in selected_items:
-                task = item.data(Qt.UserRole)
-                ids_to_delete.append(task.id)
-                rows_to_remove.append(self.task_list.row(item))
-                
-            # 从数据库删除
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            placeholders = ','.join('?' * len(ids_to_delete))
-            cursor.execute(f'DELETE FROM tasks WHERE id IN ({placeholders})', ids_to_delete)
-            conn.commit()
-            conn.close()
-            
-            # 从列表中移除（从后往前删除，避免索引问题）
-            for row in sorted(rows_to_remove, reverse=True):
-                self.task_list.takeItem(row)
-                
-    def batch_add_tasks(self):
-        dialog = BatchAddDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            tasks = dialog.get_tasks()
-            default_attrs = dialog.get_default_attributes()
-            if tasks:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                for task_data in tasks:
-                    cursor.execute('''
-                        INSERT INTO tasks (title, description, category, priority, urgency, duration, completed) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (task_data['title'], task_data['description'], 
-                          default_attrs['category'], default_attrs['priority'], 
-                          default_attrs['urgency'], default_attrs['duration'], 0))  # 新任务默认未完成
-                    
-                conn.commit()
-                conn.close()
-                
-                # 重新加载任务列表
-                self.load_tasks()
-                QMessageBox.information(self, "提示", f"成功添加{len(tasks)}个任务")
-                
-    def open_settings(self):
-        dialog = SettingsDialog(self, self.close_to_tray)
-        if dialog.exec_() == QDialog.Accepted:
-            settings = dialog.get_settings()
-            self.close_to_tray = settings['close_to_tray']
-            
-    def reorder_tasks(self):
-        """重新排序任务列表，将已完成的任务移到底部"""
-        self.load_tasks()
-        
-    def create_tray_icon(self):
-        if not QSystemTrayIcon.isSystemTrayAvailable():
-            return
-            
-        self.tray_icon = QSystemTrayIcon(self)
-        self.tray_icon.setIcon(self.style().standardIcon(QStyle.SP_ComputerIcon))  # 使用标准图标
-        
-        # 创建托盘菜单
-        tray_menu = QMenu()
-        show_action = QAction("显示主窗口", self)
-        quit_action = QAction("退出", self)
-        
-        show_action.triggered.connect(self.show)
-        quit_action.triggered.connect(self.quit_application)  # 使用新的退出方法
-        
-        tray_menu.addAction(show_action)
-        tray_menu.addSeparator()
-        tray_menu.addAction(quit_action)
-        
-        self.tray_icon.setContextMenu(tray_menu)
-        self.tray_icon.show()
-        
-        # 连接系统托盘图标激活事件
-        self.tray_icon.activated.connect(self.on_tray_icon_activated)
-        
-    def on_tray_icon_activated(self, reason):
-        """处理托盘图标点击事件"""
-        if reason == QSystemTrayIcon.Trigger:  # 左键点击
-            self.show()
-            self.activateWindow()
-            
-    def closeEvent(self, event):
-        # 检查系统托盘是否可用并且用户设置了最小化到托盘
-        if self.close_to_tray and QSystemTrayIcon.isSystemTrayAvailable():
-            # 显示提示信息
-            QMessageBox.information(self, "提示", "程序将最小化到系统托盘，您可以通过托盘图标退出程序", QMessageBox.Ok)
-            # 隐藏主窗口
-            self.hide()
-            # 忽略关闭事件，防止程序退出
-            event.ignore()
-        else:
-            # 直接退出程序
-            self.quit_application()
-            event.accept()
-            
-    def quit_application(self):
-        """完全退出应用程序"""
-        # 隐藏主窗口
-        self.hide()
-        # 隐藏系统托盘图标
-        if hasattr(self, 'tray_icon'):
-            self.tray_icon.hide()
-        # 退出应用
-        QApplication.instance().quit()
-
-def main():
-    app = QApplication(sys.argv)
-    app.setQuitOnLastWindowClosed(False)  # 防止关闭主窗口时退出应用
-    
-    # 确保应用程序在所有窗口关闭后仍然运行
-    window = TaskListApp()
-    window.show()
-    
-    # 连接应用的aboutToQuit信号以确保正确清理
-    app.aboutToQuit.connect(window.quit_application)
-    
-    sys.exit(app.exec_())
-
-if __name__ == '__main__':
+import sys
+import os
+import json
+import time
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+                             QPushButton, QListView, QLineEdit, 
+                             QTextEdit, QDialog, QLabel, QCheckBox, QSystemTrayIcon, 
+                             QMenu, QAction, QMessageBox, QStyle, QComboBox, QGroupBox, QSizePolicy,
+                             QFileDialog, QProgressDialog, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QPlainTextEdit, QShortcut, QSpinBox, QDateTimeEdit, QListWidget,
+                             QTreeView, QCompleter)
+from PyQt5.QtCore import Qt, QTimer, QThread, QEvent, QDateTime, QRect, pyqtSignal
+from PyQt5.QtGui import QIcon, QFont, QKeySequence, QPainter
+
+from diagnostics import instrumentation, REPOSITORY_METHODS, MODEL_METHODS, DELEGATE_METHODS
+from task import (PRIORITY_TEXTS, URGENCY_TEXTS, DURATION_TEXTS, REMIND_OPTIONS, TAG_SEPARATORS, format_timestamp,
+                  format_duration, normalize_tags, with_tag, sort_group, ranks_between)
+from task_repository import TaskRepository, DEFAULT_ARCHIVE_DAYS, MIN_RANK_GAP, STATS_DAYS, and_clauses
+from write_queue import TaskWriteQueue
+from importer import LineSource, PARSERS, detect_format, import_tasks
+from task_model import TaskListModel, SubtaskModel, TaskItemDelegate, TaskRole, RollupRole
+from reminders import ReminderScheduler, REMIND
+from recurrence import FREQUENCIES, describe, occurrences
+
+# 确保data目录存在
+os.makedirs('data', exist_ok=True)
+
+
+def task_matches(task, filters):
+    """任务是否满足 {列: 值} 条件（'tag' 为标签名）"""
+    return all(value in task.tags if column == 'tag' else getattr(task, column) == value
+               for column, value in filters.items())
+
+
+def delete_question(subject, descendants):
+    """删除确认的提示文字，descendants 为一并删除的其余子孙任务数"""
+    if descendants > 0:
+        return f"确定要删除{subject}及其{descendants}个子任务吗？"
+    return f"确定要删除{subject}吗？"
+
+
+class TagEdit(QLineEdit):
+    """输入多个标签（逗号分隔），按数据库中已有的标签补全正在输入的一个"""
+    
+    def __init__(self, tags, parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText("多个标签用逗号分隔")
+        self.tag_completer = QCompleter(list(tags), self)
+        self.tag_completer.setWidget(self)
+        self.tag_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.tag_completer.activated.connect(self.insert_tag)
+        self.textEdited.connect(self.update_completion)
+        
+    def update_completion(self, text):
+        prefix = TAG_SEPARATORS.split(text)[-1].strip()
+        if not prefix:
+            self.tag_completer.popup().hide()
+            return
+        self.tag_completer.setCompletionPrefix(prefix)
+        self.tag_completer.complete()
+        
+    def insert_tag(self, tag):
+        tags = list(normalize_tags(TAG_SEPARATORS.split(self.text())[:-1]))
+        self.set_tags(tags + [tag])
+        self.setText(self.text() + ', ')
+        
+    def tags(self):
+        return normalize_tags(self.text())
+        
+    def set_tags(self, tags):
+        self.setText(', '.join(tags))
+
+
+class TaskDialog(QDialog):
+    def __init__(self, parent=None, task=None, tags=()):
+        """tags 为可供补全的已有标签"""
+        super().__init__(parent)
+        self.task = task
+        self.known_tags = tags
+        self.initUI()
+        
+    def initUI(self):
+        self.setWindowTitle("添加任务" if not self.task else "编辑任务")
+        self.setModal(True)
+        self.resize(450, 400)
+        
+        layout = QVBoxLayout()
+        layout.setSpacing(10)  # 设置整体间距
+        
+        # 标题输入
+        title_layout = QHBoxLayout()
+        title_layout.addWidget(QLabel("任务标题:"))
+        self.title_edit = QLineEdit()
+        if self.task:
+            self.title_edit.setText(self.task.title)
+        title_layout.addWidget(self.title_edit)
+        layout.addLayout(title_layout)
+        
+        # 标签
+        tag_layout = QHBoxLayout()
+        tag_layout.addWidget(QLabel("标签:"))
+        self.tag_edit = TagEdit(self.known_tags)
+        if self.task:
+            self.tag_edit.set_tags(self.task.tags)
+        tag_layout.addWidget(self.tag_edit)
+        layout.addLayout(tag_layout)
+        
+        # 优先级选择
+        priority_layout = QHBoxLayout()
+        priority_layout.addWidget(QLabel("优先级:"))
+        self.priority_combo = QComboBox()
+        self.priority_combo.addItems(PRIORITY_TEXTS)
+        if self.task:
+            self.priority_combo.setCurrentIndex(self.task.priority - 1)
+        priority_layout.addWidget(self.priority_combo)
+        layout.addLayout(priority_layout)
+        
+        # 紧急程度选择
+        urgency_layout = QHBoxLayout()
+        urgency_layout.addWidget(QLabel("紧急程度:"))
+        self.urgency_combo = QComboBox()
+        self.urgency_combo.addItems(URGENCY_TEXTS)
+        if self.task:
+            self.urgency_combo.setCurrentIndex(self.task.urgency - 1)
+        urgency_layout.addWidget(self.urgency_combo)
+        layout.addLayout(urgency_layout)
+        
+        # 任务周期选择
+        duration_layout = QHBoxLayout()
+        duration_layout.addWidget(QLabel("任务周期:"))
+        self.duration_combo = QComboBox()
+        self.duration_combo.addItems(DURATION_TEXTS)
+        if self.task:
+            self.duration_combo.setCurrentIndex(self.task.duration - 1)
+        duration_layout.addWidget(self.duration_combo)
+        layout.addLayout(duration_layout)
+        
+        # 截止时间与提醒
+        due_layout = QHBoxLayout()
+        self.due_checkbox = QCheckBox("截止时间:")
+        self.due_edit = QDateTimeEdit()
+        self.due_edit.setDisplayFormat("yyyy-MM-dd HH:mm")
+        self.due_edit.setCalendarPopup(True)
+        self.remind_combo = QComboBox()
+        self.remind_combo.addItems([text for text, _ in REMIND_OPTIONS])
+        due_ts = self.task.due_ts if self.task else None
+        if due_ts is not None:
+            self.due_checkbox.setChecked(True)
+            self.due_edit.setDateTime(QDateTime.fromSecsSinceEpoch(due_ts))
+            if self.task.remind_ts is not None:
+                offsets = [offset for _, offset in REMIND_OPTIONS]
+                offset = due_ts - self.task.remind_ts
+                if offset in offsets:
+                    self.remind_combo.setCurrentIndex(offsets.index(offset))
+        else:
+            # 默认为明天的当前时刻（精确到分钟）
+            now = QDateTime.currentDateTime().addDays(1)
+            self.due_edit.setDateTime(now.addSecs(-now.time().second()))
+        # 重复规则只能在添加任务时设置（以截止时间为第一次），之后在“重复任务”中管理
+        self.repeat_combo = QComboBox()
+        self.repeat_combo.addItem("不重复", None)
+        for freq, text in FREQUENCIES.items():
+            self.repeat_combo.addItem(text, freq)
+        self.repeat_combo.setVisible(self.task is None)
+        for widget in (self.due_edit, self.remind_combo, self.repeat_combo):
+            self.due_checkbox.toggled.connect(widget.setEnabled)
+            widget.setEnabled(self.due_checkbox.isChecked())
+        due_layout.addWidget(self.due_checkbox)
+        due_layout.addWidget(self.due_edit)
+        due_layout.addWidget(self.remind_combo)
+        due_layout.addWidget(self.repeat_combo)
+        layout.addLayout(due_layout)
+        if self.task and self.task.rule_id is not None:
+            layout.addWidget(QLabel("这是重复任务中的一次，修改内容会应用到之后的每一次"))
+        
+        # 描述输入
+        layout.addWidget(QLabel("任务描述:"))
+        self.desc_edit = QTextEdit()
+        self.desc_edit.setMaximumHeight(100)
+        self.desc_edit.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        if self.task:
+            self.desc_edit.setPlainText(self.task.description)
+        layout.addWidget(self.desc_edit)
+        
+        # 按钮
+        btn_layout = QHBoxLayout()
+        self.ok_btn = QPushButton("确定")
+        self.cancel_btn = QPushButton("取消")
+        self.ok_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.ok_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def get_data(self):
+        due_time = remind_time = None
+        if self.due_checkbox.isChecked():
+            due_time = self.due_edit.dateTime().toSecsSinceEpoch()
+            offset = REMIND_OPTIONS[self.remind_combo.currentIndex()][1]
+            if offset is not None:
+                remind_time = due_time - offset
+        return {
+            'title': self.title_edit.text(),
+            'description': self.desc_edit.toPlainText(),
+            'tags': self.tag_edit.tags(),
+            'priority': self.priority_combo.currentIndex() + 1,
+            'urgency': self.urgency_combo.currentIndex() + 1,
+            'duration': self.duration_combo.currentIndex() + 1,
+            'due_time': due_time,
+            'remind_time': remind_time,
+            'repeat': self.repeat_combo.currentData() if due_time is not None else None
+        }
+
+class BatchAddDialog(QDialog):
+    def __init__(self, parent=None, tags=()):
+        super().__init__(parent)
+        self.known_tags = tags
+        self.initUI()
+        
+    def initUI(self):
+        self.setWindowTitle("批量添加任务")
+        self.setModal(True)
+        self.resize(500, 400)
+        
+        layout = QVBoxLayout()
+        
+        layout.addWidget(QLabel("每行一个任务标题，可选添加描述(用|分隔):"))
+        layout.addWidget(QLabel("例如: 购买食材|去超市买蔬菜水果"))
+        
+        self.text_edit = QTextEdit()
+        layout.addWidget(self.text_edit)
+        
+        # 从文件导入
+        file_layout = QHBoxLayout()
+        self.file_btn = QPushButton("从文件导入...")
+        self.file_btn.clicked.connect(self.choose_file)
+        self.file_label = QLabel("支持 .txt / .csv / .jsonl 文件")
+        self.file_label.setStyleSheet("color: gray;")
+        file_layout.addWidget(self.file_btn)
+        file_layout.addWidget(self.file_label)
+        file_layout.addStretch()
+        layout.addLayout(file_layout)
+        self.import_path = None
+        
+        # 默认属性设置
+        attr_group = QGroupBox("默认属性设置")
+        attr_layout = QVBoxLayout()
+        
+        # 标签（文件中没有标签的任务使用）
+        tag_layout = QHBoxLayout()
+        tag_layout.addWidget(QLabel("默认标签:"))
+        self.tag_edit = TagEdit(self.known_tags)
+        tag_layout.addWidget(self.tag_edit)
+        attr_layout.addLayout(tag_layout)
+        
+        # 优先级选择
+        priority_layout = QHBoxLayout()
+        priority_layout.addWidget(QLabel("默认优先级:"))
+        self.priority_combo = QComboBox()
+        self.priority_combo.addItems(PRIORITY_TEXTS)
+        priority_layout.addWidget(self.priority_combo)
+        attr_layout.addLayout(priority_layout)
+        
+        # 紧急程度选择
+        urgency_layout = QHBoxLayout()
+        urgency_layout.addWidget(QLabel("默认紧急程度:"))
+        self.urgency_combo = QComboBox()
+        self.urgency_combo.addItems(URGENCY_TEXTS)
+        urgency_layout.addWidget(self.urgency_combo)
+        attr_layout.addLayout(urgency_layout)
+        
+        # 任务周期选择
+        duration_layout = QHBoxLayout()
+        duration_layout.addWidget(QLabel("默认任务周期:"))
+        self.duration_combo = QComboBox()
+        self.duration_combo.addItems(DURATION_TEXTS)
+        duration_layout.addWidget(self.duration_combo)
+        attr_layout.addLayout(duration_layout)
+        
+        attr_group.setLayout(attr_layout)
+        layout.addWidget(attr_group)
+        
+        # 按钮
+        btn_layout = QHBoxLayout()
+        self.ok_btn = QPushButton("添加")
+        self.cancel_btn = QPushButton("取消")
+        self.ok_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.ok_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def choose_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "选择导入文件", "",
+                                              "任务文件 (*.txt *.csv *.jsonl *.ndjson);;所有文件 (*)")
+        if path:
+            self.import_path = path
+            self.file_label.setText(os.path.basename(path))
+            self.text_edit.setEnabled(False)
+        
+    def get_source(self):
+        """返回 (逐行读取的数据源, 格式)，选择了文件时从文件导入，否则使用输入框中的文本"""
+        if self.import_path:
+            return LineSource(path=self.import_path), detect_format(self.import_path)
+        return LineSource(text=self.text_edit.toPlainText()), 'text'
+        
+    def get_default_attributes(self):
+        return {
+            'tags': self.tag_edit.tags(),
+            'priority': self.priority_combo.currentIndex() + 1,
+            'urgency': self.urgency_combo.currentIndex() + 1,
+            'duration': self.duration_combo.currentIndex() + 1
+        }
+
+class BulkEditDialog(QDialog):
+    """批量操作：对所选任务或满足条件的全部任务执行删除/修改"""
+    
+    SCOPES = ['所选任务', '全部已完成任务', '全部未完成任务', '带有指定标签的任务']
+    # 标签操作的取值为已有标签（添加时也可以输入新标签）
+    ACTIONS = {
+        '删除': None,
+        '添加标签': ('+tag', None),
+        '移除标签': ('-tag', None),
+        '修改优先级': ('priority', PRIORITY_TEXTS),
+        '修改紧急程度': ('urgency', URGENCY_TEXTS),
+        '修改任务周期': ('duration', DURATION_TEXTS),
+        '标记完成状态': ('completed', ['未完成', '已完成']),
+    }
+        
+    def __init__(self, parent=None, selected_count=0, tags=()):
+        super().__init__(parent)
+        self.selected_count = selected_count
+        self.known_tags = list(tags)
+        self.initUI()
+        
+    def initUI(self):
+        self.setWindowTitle("批量操作")
+        self.setModal(True)
+        layout = QVBoxLayout()
+        
+        # 操作范围
+        scope_layout = QHBoxLayout()
+        scope_layout.addWidget(QLabel("操作范围:"))
+        self.scope_combo = QComboBox()
+        self.scope_combo.addItems(self.SCOPES)
+        self.scope_combo.setItemText(0, f"所选任务（{self.selected_count}个）")
+        if not self.selected_count:
+            self.scope_combo.setCurrentIndex(1)
+        self.scope_combo.currentIndexChanged.connect(self.update_controls)
+        scope_layout.addWidget(self.scope_combo)
+        self.scope_tag_combo = QComboBox()
+        self.scope_tag_combo.addItems(self.known_tags)
+        scope_layout.addWidget(self.scope_tag_combo)
+        layout.addLayout(scope_layout)
+        
+        # 操作内容
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(QLabel("操作:"))
+        self.action_combo = QComboBox()
+        self.action_combo.addItems(list(self.ACTIONS))
+        self.action_combo.currentIndexChanged.connect(self.update_controls)
+        action_layout.addWidget(self.action_combo)
+        self.value_combo = QComboBox()
+        action_layout.addWidget(self.value_combo)
+        layout.addLayout(action_layout)
+        
+        btn_layout = QHBoxLayout()
+        self.ok_btn = QPushButton("确定")
+        self.cancel_btn = QPushButton("取消")
+        self.ok_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.ok_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        self.update_controls()
+        
+    def update_controls(self):
+        self.scope_tag_combo.setEnabled(self.scope_combo.currentIndex() == 3)
+        action = self.ACTIONS[self.action_combo.currentText()]
+        self.value_combo.clear()
+        if action:
+            self.value_combo.addItems(action[1] or self.known_tags)
+        self.value_combo.setEditable(action is not None and action[0] == '+tag')
+        self.value_combo.setEnabled(action is not None)
+        self.ok_btn.setEnabled(self.scope_combo.currentIndex() != 0 or self.selected_count > 0)
+        
+    def accept(self):
+        action = self.ACTIONS[self.action_combo.currentText()]
+        if action and action[1] is None and not self.value_combo.currentText().strip():
+            QMessageBox.information(self, "提示", "请选择或输入标签")
+            return
+        if self.scope_combo.currentIndex() == 3 and not self.scope_tag_combo.currentText():
+            QMessageBox.information(self, "提示", "还没有任何标签")
+            return
+        super().accept()
+        
+    def get_operation(self):
+        """返回 (是否作用于所选任务, 条件, 要修改的字段或None表示删除)
+
+        添加/移除标签时要修改的字段为 {'tag': (标签名, 是否添加)}。
+        """
+        scope = self.scope_combo.currentIndex()
+        filters = None
+        if scope == 1:
+            filters = {'completed': 1}
+        elif scope == 2:
+            filters = {'completed': 0}
+        elif scope == 3:
+            filters = {'tag': self.scope_tag_combo.currentText()}
+        
+        values = None
+        action = self.ACTIONS[self.action_combo.currentText()]
+        if action:
+            column, texts = action
+            value = self.value_combo.currentText().strip()
+            # 标签直接保存文字，其余字段保存 1-3 的取值（完成状态为 0/1）
+            if column in ('+tag', '-tag'):
+                values = {'tag': (value, column == '+tag')}
+            elif column == 'completed':
+                values = {column: texts.index(value)}
+            else:
+                values = {column: texts.index(value) + 1}
+        return scope == 0, filters, values
+
+class ImportThread(QThread):
+    """在后台线程中流式解析并分批写入任务"""
+    
+    progressChanged = pyqtSignal(int, int)  # (已导入数, 百分比)
+    importFinished = pyqtSignal(int, bool)  # (导入数, 是否被取消)
+    importFailed = pyqtSignal(str)
+    
+    def __init__(self, db_path, source, fmt, default_attrs, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.source = source
+        self.fmt = fmt
+        self.default_attrs = default_attrs
+        self._cancelled = False
+        
+    def cancel(self):
+        self._cancelled = True
+        
+    def run(self):
+        repository = TaskRepository(self.db_path)
+        instrumentation.attach(repository, 'import.db', REPOSITORY_METHODS)
+        try:
+            count = import_tasks(repository, PARSERS[self.fmt](self.source), self.default_attrs,
+                                 progress=lambda n: self.progressChanged.emit(n, self.source.progress()),
+                                 cancelled=lambda: self._cancelled)
+        except Exception as e:
+            self.importFailed.emit(str(e))
+        else:
+            self.importFinished.emit(count, self._cancelled)
+        finally:
+            instrumentation.detach(repository)
+            repository.close()
+
+class ArchiveThread(QThread):
+    """在后台线程中把已完成的旧任务移到归档数据库"""
+    
+    progressChanged = pyqtSignal(int)     # 已归档数
+    archiveFinished = pyqtSignal(int)     # 归档的任务数
+    archiveFailed = pyqtSignal(str)
+    
+    def __init__(self, db_path, days, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.days = days
+        self._cancelled = False
+        
+    def cancel(self):
+        self._cancelled = True
+        
+    def run(self):
+        repository = TaskRepository(self.db_path)
+        instrumentation.attach(repository, 'archive.db', REPOSITORY_METHODS)
+        try:
+            count = repository.archive_completed(self.days, progress=self.progressChanged.emit,
+                                                 cancelled=lambda: self._cancelled)
+        except Exception as e:
+            self.archiveFailed.emit(str(e))
+        else:
+            self.archiveFinished.emit(count)
+        finally:
+            instrumentation.detach(repository)
+            repository.close()
+
+class SettingsDialog(QDialog):
+    def __init__(self, parent=None, close_to_tray=True, diagnostics=False,
+                 auto_archive=True, archive_days=DEFAULT_ARCHIVE_DAYS):
+        super().__init__(parent)
+        self.close_to_tray = close_to_tray
+        self.diagnostics = diagnostics
+        self.auto_archive = auto_archive
+        self.archive_days = archive_days
+        self.initUI()
+        
+    def initUI(self):
+        self.setWindowTitle("设置")
+        self.setModal(True)
+        layout = QVBoxLayout()
+        
+        self.tray_checkbox = QCheckBox("关闭时最小化到托盘")
+        self.tray_checkbox.setChecked(self.close_to_tray)
+        layout.addWidget(self.tray_checkbox)
+        
+        self.diagnostics_checkbox = QCheckBox("启用性能诊断（Ctrl+Shift+D 打开诊断面板）")
+        self.diagnostics_checkbox.setChecked(self.diagnostics)
+        layout.addWidget(self.diagnostics_checkbox)
+        
+        archive_layout = QHBoxLayout()
+        self.archive_checkbox = QCheckBox("自动归档完成超过")
+        self.archive_checkbox.setChecked(self.auto_archive)
+        self.archive_days_spin = QSpinBox()
+        self.archive_days_spin.setRange(1, 3650)
+        self.archive_days_spin.setValue(self.archive_days)
+        archive_layout.addWidget(self.archive_checkbox)
+        archive_layout.addWidget(self.archive_days_spin)
+        archive_layout.addWidget(QLabel("天的任务"))
+        archive_layout.addStretch()
+        layout.addLayout(archive_layout)
+        
+        btn_layout = QHBoxLayout()
+        self.ok_btn = QPushButton("确定")
+        self.cancel_btn = QPushButton("取消")
+        self.ok_btn.clicked.connect(self.accept)
+        self.cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(self.ok_btn)
+        btn_layout.addWidget(self.cancel_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def get_settings(self):
+        return {
+            'close_to_tray': self.tray_checkbox.isChecked(),
+            'diagnostics': self.diagnostics_checkbox.isChecked(),
+            'auto_archive': self.archive_checkbox.isChecked(),
+            'archive_days': self.archive_days_spin.value()
+        }
+
+class DiagnosticsDialog(QDialog):
+    """实时显示各项操作的耗时统计，可分析一次重新加载并导出为JSON"""
+    
+    COLUMNS = ['操作', '次数', 'p50 (ms)', 'p95 (ms)', '最大 (ms)', '合计 (ms)']
+    
+    def __init__(self, parent=None, reload=None):
+        super().__init__(parent)
+        self.reload = reload
+        self.initUI()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+        self.refresh()
+        
+    def initUI(self):
+        self.setWindowTitle("性能诊断")
+        self.resize(700, 500)
+        layout = QVBoxLayout()
+        
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        self.profile_edit = QPlainTextEdit()
+        self.profile_edit.setReadOnly(True)
+        self.profile_edit.setFont(QFont("Consolas, Courier New, monospace", 9))
+        self.profile_edit.setPlaceholderText("点击“分析重新加载”查看一次重新加载的 cProfile 结果")
+        layout.addWidget(self.profile_edit)
+        
+        btn_layout = QHBoxLayout()
+        self.profile_btn = QPushButton("分析重新加载")
+        self.clear_btn = QPushButton("清空")
+        self.export_btn = QPushButton("导出JSON...")
+        self.close_btn = QPushButton("关闭")
+        self.profile_btn.clicked.connect(self.profile_reload)
+        self.clear_btn.clicked.connect(self.clear)
+        self.export_btn.clicked.connect(self.export)
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.profile_btn)
+        btn_layout.addWidget(self.clear_btn)
+        btn_layout.addWidget(self.export_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def refresh(self):
+        if instrumentation.enabled:
+            self.status_label.setText("诊断已开启，统计最近的操作耗时")
+        else:
+            self.status_label.setText("诊断未开启，请在“设置”中启用，或设置环境变量 TASKLIST_DIAGNOSTICS=1")
+        stats = instrumentation.stats()
+        self.table.setRowCount(len(stats))
+        for row, (name, values) in enumerate(stats.items()):
+            cells = [name, str(values['count'])] + [
+                f"{values[key]:.2f}" for key in ('p50', 'p95', 'max', 'total')]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+                
+    def profile_reload(self):
+        if self.reload is None:
+            return
+        self.profile_edit.setPlainText(instrumentation.profile(self.reload))
+        self.refresh()
+        
+    def clear(self):
+        instrumentation.clear()
+        self.profile_edit.clear()
+        self.refresh()
+        
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出诊断数据", "diagnostics.json", "JSON 文件 (*.json)")
+        if not path:
+            return
+        try:
+            instrumentation.export(path)
+        except OSError as e:
+            QMessageBox.warning(self, "错误", f"导出失败：{e}")
+            
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        super().closeEvent(event)
+        
+class ArchiveDialog(QDialog):
+    """按页浏览已归档的任务，可恢复所选任务或立即执行归档"""
+    
+    def __init__(self, parent, repository):
+        super().__init__(parent)
+        self.repository = repository
+        self.repository.attach_archive()
+        self.initUI()
+        self.reload()
+        
+    def initUI(self):
+        self.setWindowTitle("已归档的任务")
+        self.resize(600, 500)
+        layout = QVBoxLayout()
+        
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        
+        self.archive_model = TaskListModel(self, checkable=False)
+        self.archive_list = QListView()
+        self.archive_list.setModel(self.archive_model)
+        self.archive_list.setItemDelegate(TaskItemDelegate(self.archive_list))
+        self.archive_list.setLayoutMode(QListView.Batched)
+        self.archive_list.setBatchSize(200)
+        self.archive_list.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.archive_list.setSelectionMode(QListView.ExtendedSelection)
+        layout.addWidget(self.archive_list)
+        
+        btn_layout = QHBoxLayout()
+        self.archive_btn = QPushButton("立即归档")
+        self.restore_btn = QPushButton("恢复所选")
+        self.close_btn = QPushButton("关闭")
+        self.archive_btn.clicked.connect(self.parent().archive_now)
+        self.restore_btn.clicked.connect(self.restore_selected)
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.archive_btn)
+        btn_layout.addWidget(self.restore_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def reload(self):
+        self.status_label.setText(f"已归档 {self.repository.count_archived()} 个任务")
+        self.archive_model.set_source(
+            lambda cursor: self.repository.fetch_page(cursor, table='archive.archived_tasks'))
+        
+    def set_running(self, running):
+        self.archive_btn.setEnabled(not running)
+        self.archive_btn.setText("正在归档..." if running else "立即归档")
+        
+    def restore_selected(self):
+        ids = [index.data(TaskRole).id for index in self.archive_list.selectionModel().selectedIndexes()]
+        if not ids:
+            QMessageBox.information(self, "提示", "请先选择要恢复的任务")
+            return
+        self.repository.restore_tasks(ids)
+        self.archive_model.remove_tasks(ids)
+        self.status_label.setText(f"已归档 {self.repository.count_archived()} 个任务")
+        self.parent().load_tasks()
+        
+def apply_task_data(task, data):
+    """把任务对话框的结果写回任务对象（数据库由写入队列更新）"""
+    task.title = data['title']
+    task.description = data['description']
+    task.tags = tuple(data['tags'])
+    task.priority = data['priority']
+    task.urgency = data['urgency']
+    task.duration = data['duration']
+    task.due_ts = data['due_time']
+    task.remind_ts = data['remind_time']
+    task.updated_ts = int(time.time())
+    
+class SubtaskDialog(QDialog):
+    """任务的子任务树：展开节点时才读取其子任务，折叠的分支不会被读取"""
+    
+    def __init__(self, parent, task):
+        super().__init__(parent)
+        self.app = parent
+        self.task = task
+        self.initUI()
+        
+    def initUI(self):
+        self.setWindowTitle(f"子任务 - {self.task.title}")
+        self.resize(600, 500)
+        layout = QVBoxLayout()
+        
+        repository = self.app.repository
+        self.model = SubtaskModel(self.task.id, repository.fetch_children, repository.subtree_counts, self)
+        self.model.taskToggled.connect(self.toggle_completed)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setHeaderHidden(True)
+        self.tree.setItemDelegate(TaskItemDelegate(self.tree))
+        self.tree.doubleClicked.connect(self.edit_task)
+        layout.addWidget(self.tree)
+        
+        btn_layout = QHBoxLayout()
+        self.add_btn = QPushButton("添加子任务")
+        self.add_btn.setToolTip("添加到选中的子任务之下；未选中时添加到当前任务之下")
+        self.edit_btn = QPushButton("编辑")
+        self.delete_btn = QPushButton("删除")
+        self.close_btn = QPushButton("关闭")
+        self.add_btn.clicked.connect(self.add_task)
+        self.edit_btn.clicked.connect(lambda: self.edit_task(self.tree.currentIndex()))
+        self.delete_btn.clicked.connect(self.delete_task)
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.add_btn)
+        btn_layout.addWidget(self.edit_btn)
+        btn_layout.addWidget(self.delete_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def changed(self):
+        """写完队列后刷新子任务统计，主列表中的统计随后刷新"""
+        self.app.write_queue.flush()
+        self.model.refresh_rollups()
+        self.app.schedule_facet_refresh()
+        
+    def add_task(self):
+        index = self.tree.currentIndex()
+        parent = index.data(TaskRole) if index.isValid() else self.task
+        dialog = TaskDialog(self, tags=self.app.repository.tag_names())
+        dialog.repeat_combo.hide()  # 子任务不支持重复
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        data = dialog.get_data()
+        if not data['title'].strip():
+            return
+        data['parent_id'] = parent.id
+        task = self.app.repository.add_task(data)
+        # 父节点已展开时直接插入；未展开时展开后连同新任务一起读取
+        self.model.insert_task(task)
+        self.changed()
+        if index.isValid():
+            self.tree.expand(index)
+            
+    def edit_task(self, index):
+        if not index.isValid():
+            QMessageBox.information(self, "提示", "请先选择一个子任务")
+            return
+        task = index.data(TaskRole)
+        dialog = TaskDialog(self, task, self.app.repository.tag_names())
+        if dialog.exec_() == QDialog.Accepted:
+            data = dialog.get_data()
+            if data['title'].strip():
+                self.app.write_queue.update_task(task.id, data)
+                apply_task_data(task, data)
+                self.model.dataChanged.emit(index, index)
+                
+    def delete_task(self):
+        index = self.tree.currentIndex()
+        if not index.isValid():
+            QMessageBox.information(self, "提示", "请先选择一个子任务")
+            return
+        task = index.data(TaskRole)
+        rollup = index.data(RollupRole)
+        text = f"确定要删除“{task.title}”及其{rollup[0]}个子任务吗？" if rollup else f"确定要删除“{task.title}”吗？"
+        if QMessageBox.question(self, "确认", text, QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            self.app.write_queue.delete_task(task.id)
+            self.model.remove_task(task)
+            self.changed()
+            
+    def toggle_completed(self, task, checked):
+        # 完成时数据库中一条语句级联完成全部子孙任务
+        self.app.write_queue.set_completed(task.id, checked)
+        self.changed()
+        
+class RulesDialog(QDialog):
+    """管理重复规则：选中规则时按需生成并显示未来一段时间内的每一次"""
+    
+    PREVIEW_DAYS = 30
+    PREVIEW_LIMIT = 100
+    
+    def __init__(self, parent, repository):
+        super().__init__(parent)
+        self.repository = repository
+        self.rules = []
+        self.initUI()
+        self.reload()
+        
+    def initUI(self):
+        self.setWindowTitle("重复任务")
+        self.resize(560, 420)
+        layout = QVBoxLayout()
+        
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["标题", "重复", "下一次"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.itemSelectionChanged.connect(self.show_preview)
+        layout.addWidget(self.table)
+        
+        layout.addWidget(QLabel(f"未来{self.PREVIEW_DAYS}天:"))
+        self.preview_list = QListWidget()
+        self.preview_list.setMaximumHeight(120)
+        layout.addWidget(self.preview_list)
+        
+        btn_layout = QHBoxLayout()
+        self.delete_btn = QPushButton("删除规则")
+        self.close_btn = QPushButton("关闭")
+        self.delete_btn.clicked.connect(self.delete_rule)
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addWidget(self.delete_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def reload(self):
+        self.rules = self.repository.list_rules()
+        self.table.setRowCount(len(self.rules))
+        for row, rule in enumerate(self.rules):
+            next_time = rule[11]
+            self.table.setItem(row, 0, QTableWidgetItem(rule[1]))
+            self.table.setItem(row, 1, QTableWidgetItem(describe(rule[7], rule[8])))
+            self.table.setItem(row, 2, QTableWidgetItem(format_timestamp(next_time) if next_time else ''))
+        self.show_preview()
+        
+    def selected_rule(self):
+        rows = self.table.selectionModel().selectedRows()
+        return self.rules[rows[0].row()] if rows else None
+        
+    def show_preview(self):
+        self.preview_list.clear()
+        rule = self.selected_rule()
+        if rule is None:
+            return
+        start_time, freq, interval, next_time = rule[9], rule[7], rule[8], rule[11]
+        after = (next_time if next_time is not None else start_time) - 1
+        until = int(time.time()) + self.PREVIEW_DAYS * 86400
+        for i, ts in enumerate(occurrences(start_time, freq, interval, after, until)):
+            if i >= self.PREVIEW_LIMIT:
+                self.preview_list.addItem("...")
+                break
+            self.preview_list.addItem(format_timestamp(ts))
+            
+    def delete_rule(self):
+        rule = self.selected_rule()
+        if rule is None:
+            QMessageBox.information(self, "提示", "请先选择一条规则")
+            return
+        reply = QMessageBox.question(self, "确认", f"确定要删除重复任务“{rule[1]}”吗？已完成的记录会保留。",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.parent().write_queue.flush()
+            self.repository.delete_rule(rule[0])
+            self.reload()
+            self.parent().load_tasks()
+            
+class CompletionChart(QWidget):
+    """每日完成数的柱状图，柱下方标出几号"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.days = []
+        self.setMinimumHeight(140)
+        
+    def set_days(self, days):
+        self.days = days
+        self.update()
+        
+    def paintEvent(self, event):
+        if not self.days:
+            return
+        painter = QPainter(self)
+        line = painter.fontMetrics().height()
+        width = self.width() / len(self.days)
+        chart_height = self.height() - 2 * line
+        peak = max(count for _, count in self.days) or 1
+        for i, (day, count) in enumerate(self.days):
+            x = int(i * width)
+            bar = int(chart_height * count / peak)
+            top = line + chart_height - bar
+            painter.fillRect(x + 2, top, max(1, int(width) - 4), bar, self.palette().highlight())
+            if count:
+                painter.drawText(QRect(x, top - line, int(width), line), Qt.AlignCenter, str(count))
+            painter.drawText(QRect(x, self.height() - line, int(width), line), Qt.AlignCenter, str(int(day[8:])))
+        
+class StatsDialog(QDialog):
+    """统计：各紧急程度/周期与各标签的未完成/已完成任务数、每日完成数与平均完成耗时
+
+    只读取增量维护的计数表，任务再多也能立即打开。
+    """
+    
+    def __init__(self, parent, repository):
+        super().__init__(parent)
+        self.repository = repository
+        self.initUI()
+        self.reload()
+        
+    def initUI(self):
+        self.setWindowTitle("统计")
+        self.resize(560, 620)
+        layout = QVBoxLayout()
+        
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        
+        # 紧急在上，与任务列表的分组顺序一致
+        bucket_group = QGroupBox("按紧急程度与周期（未完成 / 已完成）")
+        bucket_layout = QVBoxLayout()
+        self.bucket_table = QTableWidget(len(URGENCY_TEXTS), len(DURATION_TEXTS))
+        self.bucket_table.setVerticalHeaderLabels(URGENCY_TEXTS[::-1])
+        self.bucket_table.setHorizontalHeaderLabels(DURATION_TEXTS)
+        self.bucket_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.bucket_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.bucket_table.setSelectionMode(QTableWidget.NoSelection)
+        self.bucket_table.setFixedHeight(self.bucket_table.horizontalHeader().sizeHint().height()
+                                         + 3 * self.bucket_table.verticalHeader().defaultSectionSize() + 4)
+        bucket_layout.addWidget(self.bucket_table)
+        bucket_group.setLayout(bucket_layout)
+        layout.addWidget(bucket_group)
+        
+        tag_group = QGroupBox("按标签")
+        tag_layout = QVBoxLayout()
+        self.tag_table = QTableWidget(0, 2)
+        self.tag_table.setHorizontalHeaderLabels(["未完成", "已完成"])
+        self.tag_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.tag_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.tag_table.setSelectionMode(QTableWidget.NoSelection)
+        tag_layout.addWidget(self.tag_table)
+        tag_group.setLayout(tag_layout)
+        layout.addWidget(tag_group)
+        
+        chart_group = QGroupBox(f"最近{STATS_DAYS}天每日完成数")
+        chart_layout = QVBoxLayout()
+        self.chart = CompletionChart()
+        chart_layout.addWidget(self.chart)
+        chart_group.setLayout(chart_layout)
+        layout.addWidget(chart_group)
+        
+        note_label = QLabel("只统计未归档的任务，完成时间为任务变为已完成的时间，之后的编辑不会改变它")
+        note_label.setStyleSheet("color: gray")
+        layout.addWidget(note_label)
+        
+        btn_layout = QHBoxLayout()
+        self.close_btn = QPushButton("关闭")
+        self.close_btn.clicked.connect(self.close)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.close_btn)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+        
+    def reload(self):
+        stats = self.repository.statistics()
+        pending = sum(counts[0] for counts in stats['buckets'].values())
+        completed = sum(counts[1] for counts in stats['buckets'].values())
+        average = stats['average_seconds']
+        self.summary_label.setText(
+            f"未完成 {pending} 个，已完成 {completed} 个任务；"
+            f"平均完成耗时 {format_duration(average) if average is not None else '暂无'}")
+        
+        for row in range(len(URGENCY_TEXTS)):
+            for column in range(len(DURATION_TEXTS)):
+                counts = stats['buckets'].get((len(URGENCY_TEXTS) - row, column + 1), (0, 0))
+                item = QTableWidgetItem(f"{counts[0]} / {counts[1]}")
+                item.setTextAlignment(Qt.AlignCenter)
+                self.bucket_table.setItem(row, column, item)
+        
+        tags = sorted(stats['tags'].items())
+        self.tag_table.setRowCount(len(tags))
+        self.tag_table.setVerticalHeaderLabels([name for name, _ in tags])
+        for row, (_, counts) in enumerate(tags):
+            for column, count in enumerate(counts):
+                item = QTableWidgetItem(str(count))
+                item.setTextAlignment(Qt.AlignCenter)
+                self.tag_table.setItem(row, column, item)
+        
+        self.chart.set_days(stats['days'])
+        
+class TaskListApp(QMainWindow):
+    startupFinished = pyqtSignal()
+    
+    # 筛选栏：(列, 标签, 取值的显示文字)
+    FACETS = [
+        ('tag', '标签', None),
+        ('priority', '优先级', PRIORITY_TEXTS),
+        ('urgency', '紧急程度', URGENCY_TEXTS),
+        ('duration', '周期', DURATION_TEXTS),
+    ]
+    
+    def __init__(self, db_path='data/tasks.db', deferred=False):
+        """deferred=True 时先显示窗口，首次绘制之后再打开数据库、加载任务并创建托盘图标"""
+        super().__init__()
+        self.db_path = db_path
+        self.repository = None
+        # 修改/勾选/删除在后台线程写入，界面先行更新
+        self.write_queue = TaskWriteQueue(self.db_path, self)
+        self.write_queue.failed.connect(self.on_write_failed)
+        self.write_queue.committed.connect(self.schedule_facet_refresh)
+        # 截止时间/提醒：只为最近的一个时间点定时
+        self.reminders = ReminderScheduler(self)
+        self.reminders.remindersDue.connect(self.on_reminders_due)
+        self.reminder_rev = None
+        self.close_to_tray = True  # 默认关闭时最小化到托盘
+        self.initUI()
+        instrumentation.attach(self.task_model, 'model', MODEL_METHODS)
+        instrumentation.attach(self.task_list.itemDelegate(), 'delegate', DELEGATE_METHODS)
+        if not deferred:
+            self.finish_startup()
+            return
+            
+        # 数据库就绪前禁用需要数据库的操作
+        self.set_actions_enabled(False)
+        self.task_list.viewport().installEventFilter(self)
+        # 窗口始终没有绘制时（例如启动后直接隐藏）也要完成启动
+        QTimer.singleShot(1000, self.finish_startup)
+        
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj is self.task_list.viewport():
+            # 首次绘制完成后再继续启动
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, self.on_first_paint)
+        return super().eventFilter(obj, event)
+        
+    def on_first_paint(self):
+        self.first_paint_time = time.time()
+        self.finish_startup()
+        
+    def finish_startup(self):
+        if self.repository is not None:
+            return
+        self.repository = TaskRepository(self.db_path)
+        self.write_queue.start()
+        # 登记需要计时的对象（诊断关闭时不做任何包装）
+        instrumentation.attach(self.repository, 'db', REPOSITORY_METHODS)
+        self.repository.prune_tombstones()
+        # 补建缺少待办实例的重复任务（例如待办实例被其他程序删除）
+        self.repository.materialize_rules()
+        self.load_tasks()
+        self.load_reminders()
+        self.set_actions_enabled(True)
+        self.create_tray_icon()
+        self.notify_overdue()
+        
+        # 检测其他进程（另一个实例或脚本）对数据库的修改
+        self.data_version = self.repository.data_version()
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setInterval(500)
+        self.sync_timer.timeout.connect(self.sync_external_changes)
+        self.sync_timer.start()
+        
+        # 启动一段时间后在后台自动归档（每天最多一次）
+        self.archive_thread = None
+        QTimer.singleShot(10000, self.auto_archive)
+        self.startupFinished.emit()
+        
+    def set_actions_enabled(self, enabled):
+        for widget in (self.add_btn, self.edit_btn, self.delete_btn, self.batch_delete_btn, self.batch_add_btn,
+                       self.bulk_edit_btn, self.archive_btn, self.stats_btn, self.rules_btn, self.subtasks_btn,
+                       self.settings_btn, self.search_edit, self.undo_shortcut, self.redo_shortcut,
+                       *self.facet_combos.values()):
+            widget.setEnabled(enabled)
+            
+
+    def initUI(self):
+        self.setWindowTitle('任务清单')
+        self.setGeometry(100, 100, 600, 400)
+        
+        # 创建中央部件
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        
+        # 按钮布局
+        btn_layout = QHBoxLayout()
+        
+        self.add_btn = QPushButton('添加任务')
+        self.edit_btn = QPushButton('编辑任务')
+        self.delete_btn = QPushButton('删除任务')
+        self.batch_delete_btn = QPushButton('批量删除')
+        self.batch_add_btn = QPushButton('批量添加')
+        self.bulk_edit_btn = QPushButton('批量操作')
+        self.archive_btn = QPushButton('归档')
+        self.stats_btn = QPushButton('统计')
+        self.rules_btn = QPushButton('重复任务')
+        self.subtasks_btn = QPushButton('子任务')
+        self.settings_btn = QPushButton('设置')
+        
+        self.add_btn.clicked.connect(self.add_task)
+        self.edit_btn.clicked.connect(self.edit_task)
+        self.delete_btn.clicked.connect(self.delete_task)
+        self.batch_delete_btn.clicked.connect(self.batch_delete_tasks)
+        self.batch_add_btn.clicked.connect(self.batch_add_tasks)
+        self.bulk_edit_btn.clicked.connect(self.bulk_edit_tasks)
+        self.archive_btn.clicked.connect(self.show_archive)
+        self.stats_btn.clicked.connect(self.show_stats)
+        self.rules_btn.clicked.connect(self.show_rules)
+        self.subtasks_btn.clicked.connect(self.show_subtasks)
+        self.settings_btn.clicked.connect(self.open_settings)
+        
+        btn_layout.addWidget(self.add_btn)
+        btn_layout.addWidget(self.edit_btn)
+        btn_layout.addWidget(self.delete_btn)
+        btn_layout.addWidget(self.subtasks_btn)
+        btn_layout.addWidget(self.batch_delete_btn)
+        btn_layout.addWidget(self.batch_add_btn)
+        btn_layout.addWidget(self.bulk_edit_btn)
+        btn_layout.addWidget(self.archive_btn)
+        btn_layout.addWidget(self.stats_btn)
+        btn_layout.addWidget(self.rules_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.settings_btn)
+        
+        main_layout.addLayout(btn_layout)
+        
+        # 搜索框（输入停顿后再查询，避免每个按键都查询数据库）
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText('搜索任务标题或描述')
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.load_tasks)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        main_layout.addWidget(self.search_edit)
+        
+        # 筛选栏，括号中为满足其他筛选条件的任务数
+        filter_layout = QHBoxLayout()
+        self.facet_combos = {}
+        for column, label, _ in self.FACETS:
+            combo = QComboBox()
+            combo.setSizeAdjustPolicy(QComboBox.AdjustToContents)
+            combo.addItem(f'全部{label}', None)
+            combo.currentIndexChanged.connect(self.on_facet_changed)
+            filter_layout.addWidget(combo)
+            self.facet_combos[column] = combo
+        filter_layout.addStretch()
+        main_layout.addLayout(filter_layout)
+        # 数据变化后合并刷新计数与提醒队列
+        self.facet_timer = QTimer(self)
+        self.facet_timer.setSingleShot(True)
+        self.facet_timer.setInterval(200)
+        self.facet_timer.timeout.connect(self.refresh_facets)
+        self.facet_timer.timeout.connect(self.sync_reminders)
+        self.facet_timer.timeout.connect(self.update_tray_tooltip)
+        
+        # 任务列表（模型/视图，只有可见行才会被绘制）
+        self.task_model = TaskListModel(self)
+        self.task_model.taskToggled.connect(self.toggle_completed)
+        self.task_model.tasksDropped.connect(self.move_tasks)
+        # 子任务变化后随筛选计数一起刷新各行的子任务统计
+        self.facet_timer.timeout.connect(self.task_model.refresh_rollups)
+        self.task_list = QListView()
+        self.task_list.setModel(self.task_model)
+        self.task_list.setItemDelegate(TaskItemDelegate(self.task_list))
+        self.task_list.setLayoutMode(QListView.Batched)
+        self.task_list.setBatchSize(200)
+        self.task_list.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.task_list.setSelectionMode(QListView.ExtendedSelection)  # 支持Ctrl/Shift多选
+        # 在同一紧急程度/周期分组内拖动调整顺序
+        self.task_list.setDragDropMode(QListView.InternalMove)
+        self.task_list.setDefaultDropAction(Qt.MoveAction)
+        self.task_list.setDropIndicatorShown(True)
+        # 双击任务项编辑（双击时该行已成为当前行）
+        self.task_list.doubleClicked.connect(lambda index: self.edit_task())
+        main_layout.addWidget(self.task_list)
+        
+        # 性能诊断面板
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.show_diagnostics)
+        
+        # 撤销/重做（Ctrl+Z / Ctrl+Y），输入框中仍撤销输入的文字
+        self.undo_shortcut = QShortcut(QKeySequence.Undo, self)
+        self.undo_shortcut.activated.connect(self.undo)
+        self.redo_shortcut = QShortcut(QKeySequence.Redo, self)
+        self.redo_shortcut.activated.connect(self.redo)
+        
+    def load_tasks(self):
+        """按页加载任务，首屏只读取一页，其余随滚动加载"""
+        with instrumentation.timed('app.load_tasks'):
+            self._load_tasks()
+            
+    def _load_tasks(self):
+        text = self.search_edit.text().strip()
+        self.search_where, self.search_params = self.repository.search_clause(text)
+        # 分面计数统计全部搜索结果，常见的短关键词同样使用索引
+        self.count_where, self.count_params = self.repository.search_clause(text, paged=False)
+        # 不搜索时只列出顶层任务，子任务在子任务树中展开；搜索时子任务同样会被搜到
+        top_level = ('parent_id IS NULL', ()) if not self.search_where else ('', ())
+        where, params = and_clauses((self.search_where, self.search_params), top_level,
+                                    self.repository.filter_clause(self.facet_filters()))
+        self.view_where, self.view_params = where, params
+        # 在读取第一页之前记录版本号，之后的修改都会被 sync_external_changes 读到
+        self.write_queue.flush()
+        self.sync_rev = self.repository.current_rev()
+        
+        def fetch_page(cursor):
+            # 先写完后台队列中的修改，保证查询结果与界面一致
+            self.write_queue.flush()
+            return self.repository.fetch_page(cursor, where=where, params=params)
+        
+        self.task_model.set_source(fetch_page, self.repository.subtree_counts)
+        self.schedule_facet_refresh()
+        
+    def facet_filters(self):
+        """筛选栏当前选择的 {列: 值}"""
+        filters = {}
+        for column, combo in self.facet_combos.items():
+            value = combo.currentData()
+            if value is not None:
+                filters[column] = value
+        return filters
+        
+    def matches_facets(self, task):
+        return task_matches(task, self.facet_filters())
+        
+    def on_facet_changed(self):
+        # 筛选条件直接走索引查询第一页，计数随后刷新
+        self.load_tasks()
+        
+    def schedule_facet_refresh(self):
+        self.facet_timer.start()
+        
+    def refresh_facets(self):
+        """更新筛选栏中各取值的任务数，保持当前选择不变"""
+        if self.repository is None:
+            return
+        selected = self.facet_filters()
+        counts = self.repository.facet_counts(self.count_where, self.count_params, selected)
+        for column, label, texts in self.FACETS:
+            combo = self.facet_combos[column]
+            column_counts = counts[column]
+            # 标签按名称排序，其余按级别从高到低，计数变化时顺序保持稳定
+            values = sorted(column_counts, reverse=texts is not None)
+            current = selected.get(column)
+            if current is not None and current not in column_counts:
+                values.append(current)  # 保留当前选择，计数为0
+            # 一个任务可以有多个标签，“全部标签”的任务数不能由各标签的计数相加
+            total = counts['total'] if column == 'tag' else sum(column_counts.values())
+            items = [(f'全部{label} ({total})', None)]
+            for value in values:
+                text = value if texts is None else texts[value - 1] if 1 <= value <= len(texts) else str(value)
+                items.append((f'{text} ({column_counts.get(value, 0)})', value))
+            combo.blockSignals(True)
+            if [combo.itemData(i) for i in range(combo.count())] == [value for _, value in items]:
+                # 取值未变时只更新文字，不影响已展开的下拉列表
+                for i, (text, _) in enumerate(items):
+                    combo.setItemText(i, text)
+            else:
+                combo.clear()
+                for text, value in items:
+                    combo.addItem(text, value)
+                combo.setCurrentIndex(values.index(current) + 1 if current is not None else 0)
+            combo.blockSignals(False)
+            
+    def add_task_to_list(self, task):
+        self.task_model.insert_task(task)
+        
+    def current_task(self):
+        index = self.task_list.currentIndex()
+        if not index.isValid():
+            return None
+        return index.data(TaskRole)
+        
+    def add_task(self):
+        dialog = TaskDialog(self, tags=self.repository.tag_names())
+        if dialog.exec_() == QDialog.Accepted:
+            data = dialog.get_data()
+            if data['title'].strip():
+                if data['repeat']:
+                    task = self.repository.add_rule(data, data['repeat'])
+                else:
+                    task = self.repository.add_task(data)
+                if self.matches_facets(task):
+                    self.add_task_to_list(task)
+                self.schedule_facet_refresh()
+                
+    def edit_task(self):
+        task = self.current_task()
+        if not task:
+            QMessageBox.information(self, "提示", "请先选择一个任务")
+            return
+            
+        dialog = TaskDialog(self, task, self.repository.tag_names())
+        if dialog.exec_() == QDialog.Accepted:
+            data = dialog.get_data()
+            if data['title'].strip():
+                self.write_queue.update_task(task.id, data)
+                
+                # 更新任务对象
+                apply_task_data(task, data)
+                
+                # 只刷新该行，紧急程度/周期变化时移动到新位置
+                if self.matches_facets(task):
+                    self.task_model.update_task(task)
+                else:
+                    self.task_model.remove_task(task)
+                
+    def delete_task(self):
+        index = self.task_list.currentIndex()
+        if not index.isValid():
+            QMessageBox.information(self, "提示", "请先选择一个任务")
+            return
+            
+        rollup = index.data(RollupRole)
+        text = f"确定要删除选中的任务及其{rollup[0]}个子任务吗？" if rollup else "确定要删除选中的任务吗？"
+        reply = QMessageBox.question(self, "确认", text, QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            task = index.data(TaskRole)
+            self.write_queue.delete_task(task.id)
+            
+            # 从列表中移除
+            self.task_model.remove_row(index.row())
+            
+    def batch_delete_tasks(self):
+        # 使用完成状态的勾选框作为批量选择（包括尚未加载的任务）
+        self.write_queue.flush()
+        count = self.repository.count_tasks({'completed': 1})
+                
+        if not count:
+            QMessageBox.information(self, "提示", "请先选择要删除的任务")
+            return
+            
+        # 子孙任务（包括未完成的）一并删除
+        ids = self.repository.subtree_ids(filters={'completed': 1})
+        reply = QMessageBox.question(self, "确认", delete_question(f"选中的{count}个任务", len(ids) - count),
+                                    QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            # 一条语句删除，并从列表中一次性移除（搜索时列表中也有子任务）
+            rev = self.repository.current_rev()
+            self.repository.bulk_delete(filters={'completed': 1})
+            self.task_model.remove_tasks(ids)
+            self.task_model.refresh_rollups()
+            self.show_new_occurrences(rev)
+            self.schedule_facet_refresh()
+            
+    def selected_tasks(self):
+        return [index.data(TaskRole) for index in self.task_list.selectionModel().selectedIndexes()]
+        
+    def bulk_edit_tasks(self):
+        selected = self.selected_tasks()
+        dialog = BulkEditDialog(self, len(selected), self.repository.tag_names())
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        use_selection, filters, values = dialog.get_operation()
+        
+        # 先写完后台队列中的修改，条件判断基于最新数据
+        self.write_queue.flush()
+        if use_selection:
+            task_ids = {task.id for task in selected}
+            count = len(task_ids)
+            match = lambda task: task.id in task_ids
+        else:
+            task_ids = None
+            count = self.repository.count_tasks(filters)
+            match = lambda task: task_matches(task, filters)
+        if not count:
+            QMessageBox.information(self, "提示", "没有符合条件的任务")
+            return
+            
+        if values is None or values.get('completed'):
+            # 删除与完成同样作用于其子孙任务（搜索时列表中也有子任务）
+            ids = self.repository.subtree_ids(filters, task_ids)
+            match = lambda task: task.id in ids
+            
+        rev = self.repository.current_rev()
+        if values is None:
+            reply = QMessageBox.question(self, "确认", delete_question(f"{count}个任务", len(ids) - count),
+                                        QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+            self.repository.bulk_delete(filters, task_ids)
+        elif 'tag' in values:
+            self.repository.bulk_tag(*values['tag'], filters, task_ids)
+        else:
+            self.repository.bulk_update(values, filters, task_ids)
+        if values and set(values) & set(self.facet_filters()):
+            # 修改了正在筛选的列，按新条件重新读取
+            self.load_tasks()
+        else:
+            if values and 'tag' in values:
+                # 各任务的新标签由其原有标签得出
+                tag, add = values['tag']
+                values = {'tags': lambda tags: with_tag(tags, tag, add)}
+            self.task_model.apply_bulk(match, values)
+            self.task_model.refresh_rollups()
+            self.show_new_occurrences(rev)
+        self.schedule_facet_refresh()
+        
+    def show_new_occurrences(self, rev):
+        """批量完成/删除重复任务后，把本连接上生成的下一次实例加入列表"""
+        tasks = self.repository.fetch_new_occurrences(rev, self.view_where, self.view_params)
+        if tasks:
+            self.task_model.apply_changes(tasks, [])
+                
+    def batch_add_tasks(self):
+        dialog = BatchAddDialog(self, self.repository.tag_names())
+        if dialog.exec_() == QDialog.Accepted:
+            source, fmt = dialog.get_source()
+            default_attrs = dialog.get_default_attributes()
+            
+            # 在后台线程导入，界面显示进度并可随时取消
+            self.import_progress = QProgressDialog("正在导入任务...", "取消", 0, 100, self)
+            self.import_progress.setWindowTitle("批量添加任务")
+            self.import_progress.setWindowModality(Qt.WindowModal)
+            self.import_progress.setAutoReset(False)
+            self.import_progress.setMinimumDuration(300)
+            # 导入结束后只读取此版本号之后新增的任务，增量合并到列表中
+            self.import_rev = self.repository.current_rev()
+            self.import_thread = ImportThread(self.db_path, source, fmt, default_attrs, self)
+            self.import_progress.canceled.connect(self.import_thread.cancel)
+            self.import_thread.progressChanged.connect(self.on_import_progress)
+            self.import_thread.importFinished.connect(self.on_import_finished)
+            self.import_thread.importFailed.connect(self.on_import_failed)
+            self.import_thread.start()
+            
+    def on_import_progress(self, count, percent):
+        self.import_progress.setLabelText(f"已导入{count}个任务...")
+        self.import_progress.setValue(percent)
+        
+    def on_import_finished(self, count, cancelled):
+        self.import_progress.close()
+        self.merge_imported_tasks()
+        if cancelled:
+            QMessageBox.information(self, "提示", f"导入已取消，已添加{count}个任务")
+        elif count:
+            QMessageBox.information(self, "提示", f"成功添加{count}个任务")
+            
+    def on_import_failed(self, message):
+        self.import_progress.close()
+        self.merge_imported_tasks()
+        QMessageBox.warning(self, "错误", f"导入任务失败：{message}")
+        
+    def merge_imported_tasks(self):
+        """把导入（包括取消或失败前已提交的批次）新增的任务合并到列表中，保留滚动位置与选中项
+
+        新增的任务很多（超过 MAX_CHANGES）时改为重新加载首页。
+        """
+        changes = self.repository.fetch_changes(self.import_rev, self.view_where, self.view_params)
+        if changes is None:
+            self.load_tasks()
+            return
+        tasks, removed_ids, current_rev = changes
+        if self.import_rev == self.sync_rev:
+            self.sync_rev = current_rev
+        self.task_model.apply_changes(tasks, removed_ids)
+        self.sync_reminders()
+        self.schedule_facet_refresh()
+        
+    def undo(self):
+        self.step_journal(self.repository.undo, '撤销')
+        
+    def redo(self):
+        self.step_journal(self.repository.redo, '重做')
+        
+    def step_journal(self, step, verb):
+        """执行撤销/重做，只读取这一步修改过的任务并增量更新列表，不重新加载"""
+        # 编辑与删除经由后台队列写入，先写完再撤销
+        self.write_queue.flush()
+        rev = self.repository.current_rev()
+        label = step()
+        if label is None:
+            self.statusBar().showMessage(f"没有可{verb}的操作", 3000)
+            return
+        tasks, removed_ids, current_rev = self.repository.fetch_changes(rev, self.view_where, self.view_params,
+                                                                        limit=None)
+        if rev == self.sync_rev:
+            self.sync_rev = current_rev
+        self.task_model.apply_changes(tasks, removed_ids)
+        self.task_model.refresh_rollups()
+        self.sync_reminders()
+        self.schedule_facet_refresh()
+        self.statusBar().showMessage(f"已{verb}：{label}", 3000)
+                
+    def open_settings(self):
+        dialog = SettingsDialog(self, self.close_to_tray, instrumentation.enabled,
+                                bool(self.repository.get_setting('auto_archive', 1)),
+                                self.repository.get_setting('archive_days', DEFAULT_ARCHIVE_DAYS))
+        if dialog.exec_() == QDialog.Accepted:
+            settings = dialog.get_settings()
+            self.close_to_tray = settings['close_to_tray']
+            instrumentation.set_enabled(settings['diagnostics'])
+            self.repository.set_setting('auto_archive', int(settings['auto_archive']))
+            self.repository.set_setting('archive_days', settings['archive_days'])
+            
+    def show_subtasks(self):
+        task = self.current_task()
+        if not task:
+            QMessageBox.information(self, "提示", "请先选择一个任务")
+            return
+        self.write_queue.flush()
+        SubtaskDialog(self, task).exec_()
+        
+    def show_rules(self):
+        self.write_queue.flush()
+        RulesDialog(self, self.repository).exec_()
+        
+    def show_stats(self):
+        self.write_queue.flush()
+        StatsDialog(self, self.repository).exec_()
+        
+    def show_archive(self):
+        if getattr(self, 'archive_dialog', None) is None:
+            self.archive_dialog = ArchiveDialog(self, self.repository)
+        else:
+            self.archive_dialog.reload()
+        self.archive_dialog.set_running(self.archive_thread is not None)
+        self.archive_dialog.show()
+        self.archive_dialog.raise_()
+        
+    def auto_archive(self):
+        if self.repository is None or not self.repository.get_setting('auto_archive', 1):
+            return
+        last_run = self.repository.get_setting('archive_last_run', 0)
+        if time.time() - last_run >= 86400:
+            self.archive_now()
+            
+    def archive_now(self):
+        """在后台线程中归档，列表通过跨进程修改检测移除被归档的任务"""
+        if self.archive_thread is not None:
+            return
+        days = self.repository.get_setting('archive_days', DEFAULT_ARCHIVE_DAYS)
+        self.write_queue.flush()
+        self.archive_thread = ArchiveThread(self.db_path, days, self)
+        self.archive_thread.archiveFinished.connect(self.on_archive_finished)
+        self.archive_thread.archiveFailed.connect(self.on_archive_failed)
+        self.archive_thread.start()
+        if getattr(self, 'archive_dialog', None) is not None:
+            self.archive_dialog.set_running(True)
+            
+    def on_archive_finished(self, count):
+        self.archive_thread = None
+        if getattr(self, 'archive_dialog', None) is not None:
+            self.archive_dialog.set_running(False)
+            if self.archive_dialog.isVisible():
+                self.archive_dialog.reload()
+                
+    def on_archive_failed(self, message):
+        self.on_archive_finished(0)
+        QMessageBox.warning(self, "错误", f"归档失败：{message}")
+            
+    def show_diagnostics(self):
+        def reload():
+            self.load_tasks()
+            QApplication.processEvents()  # 包含布局与绘制
+            
+        if getattr(self, 'diagnostics_dialog', None) is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self, reload)
+        self.diagnostics_dialog.refresh_timer.start()
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+            
+    def move_tasks(self, task_ids, row):
+        """拖动排序：把任务放到第 row 行之前，每个任务只写一次排序键，列表中只移动这几行"""
+        model = self.task_model
+        rows = sorted(r for r in (model.row_of_id(task_id) for task_id in task_ids) if r >= 0)
+        if not rows:
+            return
+        tasks = [model.task_at(r) for r in rows]
+        group = sort_group(tasks[0])
+        tasks = [task for task in tasks if sort_group(task) == group]
+        above, below = model.neighbors(row, {task.id for task in tasks})
+        # 只在同一分组内排序，放到其他分组时忽略
+        if above is not None and sort_group(above) != group:
+            above = None
+        if below is not None and sort_group(below) != group:
+            below = None
+        if above is None and below is None:
+            return
+        
+        ranks = ranks_between(above.rank if above else None, below.rank if below else None, len(tasks))
+        reload = False
+        if ranks is None:
+            # 相邻两项之间没有空位：写完队列后只重新分布附近一段的排序键
+            self.write_queue.flush()
+            anchor = above or below
+            changed = self.repository.rebalance_ranks(*group, anchor.rank, max(MIN_RANK_GAP, len(tasks) + 1))
+            reload = not model.set_ranks(changed)
+            ranks = ranks_between(above.rank if above else None, below.rank if below else None, len(tasks))
+            if ranks is None:
+                return
+        for task, rank in zip(tasks, ranks):
+            task.rank = rank
+            self.write_queue.set_rank(task.id, rank)
+            model.update_task(task)
+        if reload:
+            self.write_queue.flush()
+            self.load_tasks()
+            
+    def toggle_completed(self, task, checked):
+        with instrumentation.timed('app.toggle_completed'):
+            # 更新数据库
+            self.write_queue.set_completed(task.id, checked)
+            
+            # 将该任务移动到新位置（已完成的任务移到组内底部）
+            self.task_model.update_task(task)
+        
+    def sync_external_changes(self):
+        """数据库被其他连接修改后，只读取版本号之后修改过的任务并增量更新列表"""
+        version = self.repository.data_version()
+        if version == self.data_version:
+            return
+        self.data_version = version
+        # 本程序后台写入线程的提交同样会改变 data_version，先写完队列，避免读到旧值
+        self.write_queue.flush()
+        self.sync_reminders()
+        changes = self.repository.fetch_changes(self.sync_rev, self.view_where, self.view_params)
+        if changes is None:
+            self.load_tasks()
+            return
+        tasks, removed_ids, self.sync_rev = changes
+        if tasks or removed_ids:
+            self.task_model.apply_changes(tasks, removed_ids)
+            self.schedule_facet_refresh()
+            
+    def load_reminders(self):
+        """读取全部待提醒的任务，重建提醒队列"""
+        self.reminder_rev = self.repository.current_rev()
+        self.reminders.set_reminders(self.repository.fetch_reminders(int(time.time())))
+        
+    def sync_reminders(self):
+        """只为版本号之后修改过的任务更新提醒队列"""
+        if self.reminder_rev is None or self.repository is None:
+            return
+        changes = self.repository.fetch_changes(self.reminder_rev)
+        if changes is None:
+            self.load_reminders()
+            return
+        tasks, removed_ids, self.reminder_rev = changes
+        for task in tasks:
+            if task.completed:
+                self.reminders.remove(task.id)
+            else:
+                self.reminders.update(task.id, task.remind_ts, task.due_ts)
+        for task_id in removed_ids:
+            self.reminders.remove(task_id)
+            
+    def on_reminders_due(self, due):
+        """到达提醒/截止时间时通过托盘通知（以数据库中的最新状态为准）"""
+        self.task_list.viewport().update()  # 刷新过期标记
+        self.write_queue.flush()
+        now = time.time() + 1
+        lines = []
+        for task_id, kind in due:
+            task = self.repository.get_task(task_id)
+            if task is None or task.completed:
+                continue
+            if kind == REMIND and task.remind_ts is not None and task.remind_ts <= now:
+                lines.append(f"{task.title}（{format_timestamp(task.due_ts)} 截止）")
+            elif kind != REMIND and task.due_ts is not None and task.due_ts <= now:
+                lines.append(f"{task.title}（已到期）")
+        if not lines or not hasattr(self, 'tray_icon'):
+            return
+        title = "任务提醒" if len(lines) == 1 else f"{len(lines)} 个任务提醒"
+        message = '\n'.join(lines[:5]) + ('\n...' if len(lines) > 5 else '')
+        self.tray_icon.showMessage(title, message, QSystemTrayIcon.Information, 10000)
+        
+    def notify_overdue(self):
+        count = self.repository.count_overdue(int(time.time()))
+        if count and hasattr(self, 'tray_icon'):
+            self.tray_icon.showMessage("任务提醒", f"有 {count} 个未完成的任务已过截止时间",
+                                       QSystemTrayIcon.Warning, 10000)
+            
+    def on_write_failed(self, message):
+        """后台写入失败时，列表可能与数据库不一致，重新加载"""
+        QMessageBox.warning(self, "错误", f"保存任务失败：{message}")
+        self.load_tasks()
+        
+    def create_tray_icon(self):
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            return
+            
+        self.tray_icon = QSystemTrayIcon(self)
+        self.tray_icon.setIcon(self.style().standardIcon(QStyle.SP_ComputerIcon))  # 使用标准图标
+        
+        # 创建托盘菜单
+        tray_menu = QMenu()
+        show_action = QAction("显示主窗口", self)
+        quit_action = QAction("退出", self)
+        
+        show_action.triggered.connect(self.show)
+        quit_action.triggered.connect(self.quit_application)  # 使用新的退出方法
+        
+        tray_menu.addAction(show_action)
+        tray_menu.addSeparator()
+        tray_menu.addAction(quit_action)
+        
+        self.tray_icon.setContextMenu(tray_menu)
+        self.tray_icon.show()
+        
+        # 连接系统托盘图标激活事件
+        self.tray_icon.activated.connect(self.on_tray_icon_activated)
+        self.update_tray_tooltip()
+        
+    def update_tray_tooltip(self):
+        """托盘提示显示未完成与今天完成的任务数，只读计数表"""
+        if self.repository is None or not hasattr(self, 'tray_icon'):
+            return
+        pending, completed_today = self.repository.summary()
+        self.tray_icon.setToolTip(f"任务清单\n未完成 {pending} 个，今天已完成 {completed_today} 个")
+        
+    def on_tray_icon_activated(self, reason):
+        """处理托盘图标点击事件"""
+        if reason == QSystemTrayIcon.Trigger:  # 左键点击
+            self.show()
+            self.activateWindow()
+            
+    def closeEvent(self, event):
+        # 检查系统托盘是否可用并且用户设置了最小化到托盘
+        if self.close_to_tray and QSystemTrayIcon.isSystemTrayAvailable():
+            # 显示提示信息
+            QMessageBox.information(self, "提示", "程序将最小化到系统托盘，您可以通过托盘图标退出程序", QMessageBox.Ok)
+            # 隐藏主窗口
+            self.hide()
+            # 忽略关闭事件，防止程序退出
+            event.ignore()
+        else:
+            # 直接退出程序
+            self.quit_application()
+            event.accept()
+            
+    def quit_application(self):
+        """完全退出应用程序"""
+        # 隐藏主窗口
+        self.hide()
+        # 隐藏系统托盘图标
+        if hasattr(self, 'tray_icon'):
+            self.tray_icon.hide()
+        # 停止正在进行的导入，写完所有未保存的修改后关闭数据库连接
+        if hasattr(self, 'import_thread') and self.import_thread.isRunning():
+            self.import_thread.cancel()
+            self.import_thread.wait()
+        if getattr(self, 'archive_thread', None) is not None:
+            self.archive_thread.cancel()
+            self.archive_thread.wait()
+        if hasattr(self, 'sync_timer'):
+            self.sync_timer.stop()
+        self.write_queue.stop()
+        if self.repository is not None:
+            self.repository.close()
+            self.repository = None
+        # 退出应用
+        QApplication.instance().quit()
+
+def report_launch(window, launched_at):
+    """输出从启动到首次绘制、到数据库就绪的耗时（毫秒）后退出"""
+    def on_ready():
+        ready_time = time.time()
+        first_paint_time = getattr(window, 'first_paint_time', ready_time)
+        print(json.dumps({
+            'first_paint_ms': (first_paint_time - launched_at) * 1000,
+            'ready_ms': (ready_time - launched_at) * 1000,
+            'rows': window.task_model.rowCount(),
+        }), flush=True)
+        window.quit_application()
+        
+    window.startupFinished.connect(on_ready)
+    
+def main():
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)  # 防止关闭主窗口时退出应用
+    
+    # 确保应用程序在所有窗口关闭后仍然运行
+    window = TaskListApp(deferred=True)
+    window.show()
+    
+    # 启动计时（benchmarks/bench_startup.py 设置该变量为启动时刻）
+    launched_at = os.environ.get('TASKLIST_LAUNCH_PROBE')
+    if launched_at:
+        report_launch(window, float(launched_at))
+    
+    # 连接应用的aboutToQuit信号以确保正确清理
+    app.aboutToQuit.connect(window.quit_application)
+    
+    sys.exit(app.exec_())
+
+if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,52 @@
+import calendar
+from datetime import datetime, timedelta
+
+# 重复频率及其显示文字
+FREQUENCIES = {'daily': '每天', 'weekly': '每周', 'monthly': '每月'}
+_UNITS = {'daily': '天', 'weekly': '周', 'monthly': '个月'}
+
+
+def describe(freq, interval=1):
+    """如“每天”、“每2周”"""
+    return FREQUENCIES[freq] if interval == 1 else f'每{interval}{_UNITS[freq]}'
+
+
+def _nth(start, freq, n):
+    """第 n 次（从0开始）的本地时间；按月重复时日期超出当月天数则取当月最后一天"""
+    if freq == 'daily':
+        return start + timedelta(days=n)
+    if freq == 'weekly':
+        return start + timedelta(weeks=n)
+    month = start.month - 1 + n
+    year = start.year + month // 12
+    month = month % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(start_time, freq, interval, after):
+    """start_time 起每 interval 个周期重复一次，返回晚于 after 的第一次（整数秒）
+
+    直接由经过的时间估算次数，不逐次迭代，规则已开始多年也只需常数时间。
+    """
+    start = datetime.fromtimestamp(start_time)
+    if start_time > after:
+        return start_time
+    elapsed = datetime.fromtimestamp(after)
+    if freq == 'monthly':
+        periods = (elapsed.year - start.year) * 12 + elapsed.month - start.month
+    else:
+        periods = (elapsed - start).days // (7 if freq == 'weekly' else 1)
+    n = max(0, periods // interval) * interval
+    while True:
+        ts = int(_nth(start, freq, n).timestamp())
+        if ts > after:
+            return ts
+        n += interval
+
+
+def occurrences(start_time, freq, interval, after, until):
+    """逐次生成 (after, until] 内的重复时间，只在迭代时计算"""
+    ts = next_occurrence(start_time, freq, interval, after)
+    while ts <= until:
+        yield ts
+        ts = next_occurrence(start_time, freq, interval, ts)
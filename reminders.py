@@ -0,0 +1,142 @@
+import heapq
+import time
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+# 提醒类型：到达提醒时间 / 到达截止时间
+REMIND = 'remind'
+DUE = 'due'
+# 单次定时的最长间隔（毫秒），更远的时间到点后再重新定时
+MAX_INTERVAL_MS = 24 * 3600 * 1000
+# 定时按毫秒取整，提前不超过该秒数触发时同样视为到期
+TOLERANCE = 0.05
+
+
+class ReminderScheduler(QObject):
+    """按时间排列的提醒队列（最小堆），只用一个单次 QTimer 等待最近的一个时间点
+
+    没有提醒到期时不会定时唤醒；任务修改后只为该任务压入新的堆条目：
+    每次设置都有新的序号，旧条目序号不符即为失效，留在堆中等弹出时丢弃，
+    失效条目过多时整体重建一次。
+    """
+
+    # 到期的提醒 [(task_id, REMIND/DUE), ...]，同一时刻到期的合并为一次
+    remindersDue = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._heap = []      # (时间, 序号, task_id, 类型)
+        self._pending = {}   # task_id -> [序号, 尚未触发的条目数]
+        self._seq = 0
+        self._stale = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        # 只有一个定时器，使用精确定时避免提前触发后反复重新定时
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+        self._armed_at = None
+
+    def __len__(self):
+        return len(self._heap) - self._stale
+
+    def set_reminders(self, rows, now=None):
+        """用 (task_id, remind_time, due_time) 行重建队列，只保留晚于 now 的时间"""
+        now = int(time.time()) if now is None else now
+        heap = []
+        pending = {}
+        seq = self._seq
+        for task_id, remind_time, due_time in rows:
+            count = 0
+            if remind_time is not None and remind_time > now:
+                heap.append((remind_time, seq, task_id, REMIND))
+                count = 1
+            if due_time is not None and due_time > now and due_time != remind_time:
+                heap.append((due_time, seq, task_id, DUE))
+                count += 1
+            if count:
+                pending[task_id] = [seq, count]
+                seq += 1
+        heapq.heapify(heap)
+        self._heap = heap
+        self._pending = pending
+        self._seq = seq
+        self._stale = 0
+        self._arm()
+
+    def update(self, task_id, remind_time, due_time, now=None):
+        """任务的提醒/截止时间变化后调用（已完成的任务传 None）"""
+        now = int(time.time()) if now is None else now
+        self._discard(task_id)
+        seq = self._seq
+        count = 0
+        if remind_time is not None and remind_time > now:
+            heapq.heappush(self._heap, (remind_time, seq, task_id, REMIND))
+            count = 1
+        if due_time is not None and due_time > now and due_time != remind_time:
+            heapq.heappush(self._heap, (due_time, seq, task_id, DUE))
+            count += 1
+        if count:
+            self._pending[task_id] = [seq, count]
+            self._seq += 1
+        self._compact()
+        self._arm()
+
+    def remove(self, task_id):
+        self._discard(task_id)
+        self._compact()
+        self._arm()
+
+    def next_time(self):
+        """最近的提醒时间，没有时返回None"""
+        heap = self._heap
+        while heap and not self._is_valid(heap[0]):
+            heapq.heappop(heap)
+            self._stale -= 1
+        return heap[0][0] if heap else None
+
+    def _is_valid(self, entry):
+        pending = self._pending.get(entry[2])
+        return pending is not None and pending[0] == entry[1]
+
+    def _discard(self, task_id):
+        pending = self._pending.pop(task_id, None)
+        if pending is not None:
+            self._stale += pending[1]
+
+    def _compact(self):
+        if self._stale > 1024 and self._stale * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if self._is_valid(entry)]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _arm(self):
+        """按堆顶时间重新定时；堆顶不变时不重启定时器"""
+        next_time = self.next_time()
+        if next_time == self._armed_at:
+            return
+        self._armed_at = next_time
+        if next_time is None:
+            self._timer.stop()
+            return
+        delay = int((next_time - time.time()) * 1000)
+        self._timer.start(max(0, min(delay, MAX_INTERVAL_MS)))
+
+    def _on_timeout(self):
+        self._armed_at = None
+        now = time.time() + TOLERANCE
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if not self._is_valid(entry):
+                self._stale -= 1
+                continue
+            task_id = entry[2]
+            due.append((task_id, entry[3]))
+            pending = self._pending[task_id]
+            pending[1] -= 1
+            if not pending[1]:
+                del self._pending[task_id]
+        self._arm()
+        if due:
+            self.remindersDue.emit(due)
@@ -0,0 +1,195 @@
+import calendar
+import json
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+
+# 标签显示用的文字与颜色（索引 = 取值 - 1）
+PRIORITY_TEXTS = ['低', '中', '高']
+PRIORITY_COLORS = ['green', 'orange', 'red']
+URGENCY_TEXTS = ['不急', '一般', '紧急']
+URGENCY_COLORS = ['gray', 'orange', 'red']
+DURATION_TEXTS = ['短期', '中期', '长期']
+DURATION_COLOR = 'purple'
+TAG_COLOR = 'blue'
+# 新数据库中预置的标签，之后的标签均从数据库读取
+DEFAULT_TAGS = ['工作', '个人', '学习', '家庭', '健康', '娱乐']
+# 旧版本的默认分类，迁移或导入时视为没有标签
+UNTAGGED = '未分类'
+# 输入多个标签时的分隔符
+TAG_SEPARATORS = re.compile('[,，、]')
+# 新任务的默认属性
+DEFAULT_ATTRIBUTES = {'tags': (), 'priority': 1, 'urgency': 1, 'duration': 2}
+# 手动排序键的默认间隔：新任务取 创建时间 × RANK_STEP，相邻任务之间可以反复插入十几次
+RANK_STEP = 1 << 16
+# 提醒选项：(文字, 截止前的秒数)，None 表示不提醒
+REMIND_OPTIONS = [('不提醒', None), ('到期时', 0), ('提前5分钟', 300), ('提前15分钟', 900),
+                  ('提前1小时', 3600), ('提前1天', 86400)]
+
+
+def to_epoch(value):
+    """数据库中的时间统一为整数秒；兼容旧版本写入的 UTC 文本时间"""
+    if value is None or isinstance(value, int):
+        return value
+    return calendar.timegm(datetime.fromisoformat(value).timetuple())
+
+
+def parse_level(value, texts, default=None):
+    """把 1-3 的数字或“高/中/低”等文字转换为取值，无法识别时返回 default"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        value = value.strip()
+        if value in texts:
+            return texts.index(value) + 1
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if 1 <= value <= len(texts) else default
+
+
+def normalize_tags(value):
+    """把逗号分隔的文字或（其中每项也可以用逗号分隔的）标签列表整理为去重后的元组（保持原顺序），
+    “未分类”视为没有标签"""
+    if value is None:
+        return ()
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    tags = []
+    for item in value:
+        for tag in TAG_SEPARATORS.split(str(item)):
+            tag = tag.strip()
+            if tag and tag != UNTAGGED and tag not in tags:
+                tags.append(tag)
+    return tuple(tags)
+
+
+def encode_tags(tags):
+    """数据库中 tags 列的格式：JSON 数组，没有标签时为 NULL"""
+    return json.dumps(list(tags), ensure_ascii=False, separators=(',', ':')) if tags else None
+
+
+@lru_cache(maxsize=4096)
+def decode_tags(text):
+    """tags 列转换为元组；不同的标签组合不多，按原文缓存"""
+    return tuple(json.loads(text)) if text else ()
+
+
+def with_tag(tags, tag, add):
+    """添加或移除一个标签后的元组"""
+    if add:
+        return tags if tag in tags else tags + (tag,)
+    return tuple(t for t in tags if t != tag)
+
+
+@lru_cache(maxsize=4096)
+def _format_minute(minute):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(minute * 60))
+
+
+def format_timestamp(ts):
+    """格式化为本地时间（精确到分钟，结果按分钟缓存）"""
+    return _format_minute(ts // 60)
+
+
+def format_duration(seconds):
+    """时长，如“3天4小时”、“2小时5分钟”"""
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f'{days}天{hours}小时'
+    if hours:
+        return f'{hours}小时{minutes}分钟'
+    return f'{minutes}分钟'
+
+
+class Task:
+    """任务记录
+
+    使用 __slots__ 去掉每个实例的 __dict__；时间以整数秒保存，
+    只在真正需要显示时才转换为 datetime 或格式化字符串。
+    """
+
+    __slots__ = ('id', 'title', 'description', 'tags', 'priority', 'urgency', 'duration',
+                 'completed', 'created_ts', 'updated_ts', 'due_ts', 'remind_ts', 'rule_id', 'rank', 'parent_id')
+
+    def __init__(self, id, title, description, tags=(), priority=1, urgency=1, duration=2, completed=0, created_ts=None, updated_ts=None,
+                 due_ts=None, remind_ts=None, rule_id=None, rank=None, parent_id=None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.tags = tags          # 标签名元组
+        self.priority = priority  # 1=低, 2=中, 3=高
+        self.urgency = urgency    # 1=不急, 2=一般, 3=紧急
+        self.duration = duration  # 1=短期, 2=中期, 3=长期
+        self.completed = completed
+        self.created_ts = created_ts if created_ts is not None else int(time.time())
+        self.updated_ts = updated_ts if updated_ts is not None else self.created_ts
+        self.due_ts = due_ts        # 截止时间（整数秒），None 表示没有截止时间
+        self.remind_ts = remind_ts  # 提醒时间（整数秒），None 表示不提醒
+        self.rule_id = rule_id      # 所属的重复规则，None 表示不重复
+        self.rank = rank if rank is not None else self.created_ts * RANK_STEP  # 组内排序键，越大越靠前
+        self.parent_id = parent_id  # 父任务id，None 表示顶层任务
+
+    @property
+    def created_time(self):
+        return datetime.fromtimestamp(self.created_ts)
+
+    @property
+    def updated_time(self):
+        return datetime.fromtimestamp(self.updated_ts)
+
+    def is_overdue(self, now=None):
+        """未完成且已过截止时间"""
+        return (not self.completed and self.due_ts is not None
+                and self.due_ts <= (time.time() if now is None else now))
+
+    @classmethod
+    def from_row(cls, row):
+        """由 (id, title, description, tags, priority, urgency, duration, completed,
+        created_time, updated_time, due_time, remind_time, rule_id, rank, parent_id) 行构造"""
+        task = cls.__new__(cls)
+        (task.id, task.title, task.description, tags, task.priority,
+         task.urgency, task.duration, task.completed, created_ts, updated_ts,
+         task.due_ts, task.remind_ts, task.rule_id, task.rank, task.parent_id) = row[:15]
+        if created_ts.__class__ is not int:
+            created_ts = to_epoch(created_ts)
+        if updated_ts.__class__ is not int:
+            updated_ts = to_epoch(updated_ts) if updated_ts is not None else created_ts
+        task.tags = decode_tags(tags)
+        task.created_ts = created_ts
+        task.updated_ts = updated_ts
+        return task
+
+
+def sort_key(task):
+    """与load_tasks中ORDER BY一致的排序键：
+    (紧急程度/周期分组, 完成状态, 手动排序键倒序, id倒序)
+    """
+    return ((3 - task.urgency) * 3 + (task.duration - 1),
+            task.completed,
+            -task.rank,
+            -task.id)
+
+
+def sort_group(task):
+    """拖动排序只在同一 (紧急程度/周期分组, 完成状态) 内进行"""
+    return ((3 - task.urgency) * 3 + (task.duration - 1), task.completed)
+
+
+def ranks_between(upper, lower, count=1):
+    """在排序键 upper 与 lower 之间（不含两端）均匀取 count 个由大到小的键，间隔不够时返回None
+
+    upper/lower 为None表示放在组的最前/最后。
+    """
+    if upper is None and lower is None:
+        return None
+    if upper is None:
+        upper = lower + RANK_STEP * (count + 1)
+    elif lower is None:
+        lower = upper - RANK_STEP * (count + 1)
+    if upper - lower <= count:
+        return None
+    return [upper - (upper - lower) * (i + 1) // (count + 1) for i in range(count)]
@@ -0,0 +1,249 @@
+"""任务清单命令行工具，不依赖PyQt5，便于脚本与定时任务批量管理任务
+
+用法:
+    python task_cli.py list [--search 关键词] [--tag 标签] [--pending | --completed] [--limit N]
+    python task_cli.py add 标题 [-d 描述] [-g 标签 ...] [-p 高] [-u 紧急] [-t 短期] [--parent ID]
+                           [--due "2025-01-31 18:00" [--remind 分钟] [--repeat daily|weekly|monthly [--every N]]]
+    python task_cli.py complete ID [ID ...] [--undo]
+    python task_cli.py export [--format jsonl|csv] [-o 文件] [筛选条件同 list]
+    python task_cli.py import 文件 [--format text|csv|jsonl] [-g 标签] [-p 优先级] [-u 紧急程度] [-t 周期]
+
+导出与列表按页读取数据库并逐行输出，内存占用与任务数无关；
+导入按批次提交，文件为 - 时从标准输入读取。
+标签可以重复指定（-g 工作 -g 学习）或用逗号分隔；-c/--category 为旧版本的写法，含义相同。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from task import (DEFAULT_ATTRIBUTES, PRIORITY_TEXTS, URGENCY_TEXTS, DURATION_TEXTS,
+                  format_timestamp, normalize_tags, parse_level)
+from task_repository import TaskRepository, and_clauses
+from importer import PARSERS, detect_format, import_tasks
+from recurrence import FREQUENCIES
+
+DEFAULT_DB = 'data/tasks.db'
+# 设置该环境变量时使用其指定的数据库
+DB_ENV_VAR = 'TASKLIST_DB'
+# 导出的字段（CSV表头与 JSONL 键名相同，可直接再导入；CSV 中多个标签以逗号分隔）
+EXPORT_FIELDS = ['id', 'title', 'description', 'tags', 'priority', 'urgency', 'duration',
+                 'completed', 'created_time', 'updated_time', 'due_time', 'remind_time']
+# 列表/导出时每次从数据库读取的任务数
+STREAM_PAGE_SIZE = 1000
+
+
+def task_record(task):
+    return [task.id, task.title, task.description, list(task.tags), task.priority, task.urgency,
+            task.duration, task.completed, task.created_ts, task.updated_ts, task.due_ts, task.remind_ts]
+
+
+def level_type(texts):
+    """argparse 参数类型：接受 1-3 或对应文字"""
+    def convert(value):
+        level = parse_level(value, texts)
+        if level is None:
+            raise argparse.ArgumentTypeError(f'应为 1-{len(texts)} 或 {"/".join(texts)}')
+        return level
+    return convert
+
+
+def local_time(value):
+    """argparse 参数类型：本地时间 YYYY-MM-DD HH:MM 转换为整数秒"""
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return int(time.mktime(time.strptime(value, fmt)))
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError('应为 YYYY-MM-DD HH:MM')
+
+
+def open_repository(args):
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    return TaskRepository(args.db)
+
+
+def query(repository, args):
+    """由筛选参数得到 (WHERE条件, 参数)"""
+    filters = {}
+    if args.tag:
+        filters['tag'] = args.tag
+    if args.completed is not None:
+        filters['completed'] = args.completed
+    return and_clauses(repository.search_clause(args.search or ''), repository.filter_clause(filters))
+
+
+def matching_tasks(repository, args):
+    where, params = query(repository, args)
+    for count, task in enumerate(repository.iter_tasks(where, params, STREAM_PAGE_SIZE), start=1):
+        yield task
+        if args.limit and count >= args.limit:
+            return
+
+
+def cmd_list(repository, args):
+    out = sys.stdout
+    for task in matching_tasks(repository, args):
+        tags = ' '.join([*(f'[{tag}]' for tag in task.tags), PRIORITY_TEXTS[task.priority - 1],
+                         URGENCY_TEXTS[task.urgency - 1], DURATION_TEXTS[task.duration - 1]])
+        mark = 'x' if task.completed else ' '
+        due = f'  截止 {format_timestamp(task.due_ts)}' if task.due_ts is not None else ''
+        out.write(f'{task.id:>8} [{mark}] {task.title}  {tags}  {format_timestamp(task.created_ts)}{due}\n')
+    return 0
+
+
+def cmd_add(repository, args):
+    if args.remind is not None and (args.due is None or args.remind < 0):
+        print('--remind 需要同时指定 --due，且不能为负数', file=sys.stderr)
+        return 2
+    if args.repeat and (args.due is None or args.every < 1):
+        print('--repeat 需要同时指定 --due（第一次的时间），--every 至少为1', file=sys.stderr)
+        return 2
+    if args.parent is not None and (args.repeat or repository.get_task(args.parent) is None):
+        print(f'父任务 {args.parent} 不存在（子任务也不能设置 --repeat）', file=sys.stderr)
+        return 2
+    data = {
+        'title': args.title,
+        'description': args.description,
+        'tags': normalize_tags(args.tags),
+        'priority': args.priority,
+        'urgency': args.urgency,
+        'duration': args.duration,
+        'due_time': args.due,
+        'remind_time': args.due - args.remind * 60 if args.remind is not None else None,
+        'parent_id': args.parent,
+    }
+    if args.repeat:
+        task = repository.add_rule(data, args.repeat, args.every)
+    else:
+        task = repository.add_task(data)
+    print(task.id)
+    return 0
+
+
+def cmd_complete(repository, args):
+    # 完成时子孙任务一并完成，修改数可能多于指定的任务数；有不存在的任务时返回1
+    missing = [task_id for task_id in set(args.ids) if repository.get_task(task_id) is None]
+    count = repository.bulk_update({'completed': 0 if args.undo else 1}, task_ids=args.ids)
+    print(f'已修改 {count} 个任务', file=sys.stderr)
+    if missing:
+        print(f'任务不存在: {" ".join(map(str, sorted(missing)))}', file=sys.stderr)
+    return 1 if missing else 0
+
+
+def cmd_export(repository, args):
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        tasks = matching_tasks(repository, args)
+        if args.format == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_FIELDS)
+            for task in tasks:
+                record = task_record(task)
+                record[3] = ','.join(record[3])
+                writer.writerow(record)
+        else:
+            for task in tasks:
+                out.write(json.dumps(dict(zip(EXPORT_FIELDS, task_record(task))), ensure_ascii=False))
+                out.write('\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_import(repository, args):
+    default_attrs = {
+        'tags': normalize_tags(args.tags),
+        'priority': args.priority,
+        'urgency': args.urgency,
+        'duration': args.duration,
+    }
+    if args.file == '-':
+        records = PARSERS[args.format or 'jsonl'](sys.stdin)
+        count = import_tasks(repository, records, default_attrs)
+    else:
+        with open(args.file, encoding='utf-8-sig', newline='') as f:
+            records = PARSERS[args.format or detect_format(args.file)](f)
+            count = import_tasks(repository, records, default_attrs)
+    print(f'已导入 {count} 个任务', file=sys.stderr)
+    return 0
+
+
+def add_filter_arguments(parser):
+    parser.add_argument('--search', help='搜索关键词（空格分隔）')
+    parser.add_argument('--tag', '--category', dest='tag', help='只包含带有该标签的任务')
+    status = parser.add_mutually_exclusive_group()
+    status.add_argument('--pending', dest='completed', action='store_const', const=0, help='只包含未完成任务')
+    status.add_argument('--completed', dest='completed', action='store_const', const=1, help='只包含已完成任务')
+    parser.add_argument('--limit', type=int, help='最多输出的任务数')
+
+
+def add_attribute_arguments(parser):
+    parser.add_argument('-g', '--tag', '-c', '--category', dest='tags', action='append',
+                        help='标签，可重复指定或用逗号分隔')
+    parser.add_argument('-p', '--priority', type=level_type(PRIORITY_TEXTS),
+                        default=DEFAULT_ATTRIBUTES['priority'], help='优先级：1-3 或 ' + '/'.join(PRIORITY_TEXTS))
+    parser.add_argument('-u', '--urgency', type=level_type(URGENCY_TEXTS),
+                        default=DEFAULT_ATTRIBUTES['urgency'], help='紧急程度：1-3 或 ' + '/'.join(URGENCY_TEXTS))
+    parser.add_argument('-t', '--duration', type=level_type(DURATION_TEXTS),
+                        default=DEFAULT_ATTRIBUTES['duration'], help='周期：1-3 或 ' + '/'.join(DURATION_TEXTS))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='任务清单命令行工具')
+    parser.add_argument('--db', default=os.environ.get(DB_ENV_VAR, DEFAULT_DB),
+                        help=f'数据库文件（默认 {DEFAULT_DB}，可用环境变量 {DB_ENV_VAR} 指定）')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='按显示顺序列出任务')
+    add_filter_arguments(list_parser)
+    list_parser.set_defaults(handler=cmd_list)
+
+    add_parser = commands.add_parser('add', help='添加任务，输出新任务的id')
+    add_parser.add_argument('title', help='任务标题')
+    add_parser.add_argument('-d', '--description', default='', help='任务描述')
+    add_parser.add_argument('--due', type=local_time, help='截止时间（本地时间 YYYY-MM-DD HH:MM）')
+    add_parser.add_argument('--remind', type=int, metavar='MINUTES', help='在截止前多少分钟提醒（0 表示到期时）')
+    add_parser.add_argument('--repeat', choices=list(FREQUENCIES), help='按天/周/月重复，以 --due 为第一次')
+    add_parser.add_argument('--parent', type=int, metavar='ID', help='作为该任务的子任务添加')
+    add_parser.add_argument('--every', type=int, default=1, metavar='N', help='每 N 个周期重复一次（默认1）')
+    add_attribute_arguments(add_parser)
+    add_parser.set_defaults(handler=cmd_add)
+
+    complete_parser = commands.add_parser('complete', help='把任务（连同其子任务）标记为已完成')
+    complete_parser.add_argument('ids', type=int, nargs='+', metavar='ID', help='任务id')
+    complete_parser.add_argument('--undo', action='store_true', help='改为标记为未完成')
+    complete_parser.set_defaults(handler=cmd_complete)
+
+    export_parser = commands.add_parser('export', help='导出为 JSONL 或 CSV')
+    export_parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='输出格式')
+    export_parser.add_argument('-o', '--output', help='输出文件（默认标准输出）')
+    add_filter_arguments(export_parser)
+    export_parser.set_defaults(handler=cmd_export)
+
+    import_parser = commands.add_parser('import', help='从 .txt/.csv/.jsonl 文件导入任务')
+    import_parser.add_argument('file', help='导入文件，- 表示标准输入')
+    import_parser.add_argument('--format', choices=sorted(PARSERS), help='文件格式（默认按扩展名判断，标准输入为 jsonl）')
+    add_attribute_arguments(import_parser)
+    import_parser.set_defaults(handler=cmd_import)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repository = open_repository(args)
+    try:
+        return args.handler(repository, args)
+    except BrokenPipeError:
+        # 输出被提前关闭（如管道到 head），不再写入标准输出
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        repository.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,643 @@
+from bisect import bisect_left
+
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication
+from PyQt5.QtCore import Qt, QAbstractItemModel, QAbstractListModel, QModelIndex, QRect, QSize, QEvent, QMimeData, pyqtSignal
+
+from task import Task, format_timestamp, sort_key
+from theme import TAG_SPACING, theme
+
+# 通过该角色从模型中取出Task对象
+TaskRole = Qt.UserRole
+# 子孙任务的 (总数, 已完成数)，没有子任务时为None
+RollupRole = Qt.UserRole + 1
+# 拖动排序时携带任务id的数据格式
+TASK_IDS_MIME = 'application/x-tasklist-task-ids'
+
+
+class TaskListModel(QAbstractListModel):
+    """任务列表模型，只保存Task数据，不为每行创建控件
+
+    _tasks 始终按 sort_key 有序，_keys 与之一一对应，
+    增删改时用二分查找定位，只移动受影响的行。
+
+    通过 set_source 设置分页数据源后，视图滚动到底部时按页加载
+    （canFetchMore/fetchMore），尚未加载区域内的任务不会出现在模型中。
+    """
+
+    # 勾选框切换完成状态时发出 (task, checked)
+    taskToggled = pyqtSignal(object, bool)
+    # 拖动排序时发出 (任务id列表, 放到第几行之前)，由调用方计算排序键并移动
+    tasksDropped = pyqtSignal(list, int)
+
+    def __init__(self, parent=None, checkable=True):
+        super().__init__(parent)
+        self._checkable = checkable  # False 时只读（如归档视图），不能勾选
+        self._tasks = []
+        self._keys = []
+        self._key_by_id = {}
+        self._fetch_page = None
+        self._cursor = None
+        self._boundary = None  # 最后加载的一行的排序键
+        self._fetch_rollups = None
+        self._rollups = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self._tasks[index.row()]
+        if role == TaskRole:
+            return task
+        if role == RollupRole:
+            return self._rollups.get(task.id)
+        if role == Qt.DisplayRole:
+            return task.title
+        if role == Qt.ToolTipRole:
+            return task.description or None
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if task.completed else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole or not self._checkable:
+            return False
+        task = self._tasks[index.row()]
+        checked = value == Qt.Checked
+        task.completed = int(checked)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.taskToggled.emit(task, checked)
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            # 只能放在两行之间，不能放到某一行上
+            return Qt.ItemIsDropEnabled if self._checkable else Qt.NoItemFlags
+        if not self._checkable:
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [TASK_IDS_MIME]
+
+    def mimeData(self, indexes):
+        data = QMimeData()
+        ids = sorted({index.row() for index in indexes if index.isValid()})
+        data.setData(TASK_IDS_MIME, ','.join(str(self._tasks[row].id) for row in ids).encode())
+        return data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(TASK_IDS_MIME):
+            return False
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self._tasks)
+        task_ids = [int(task_id) for task_id in bytes(data.data(TASK_IDS_MIME)).decode().split(',') if task_id]
+        self.tasksDropped.emit(task_ids, row)
+        # 不实现 removeRows，视图不会再删除源行，移动由 update_task 完成
+        return True
+
+    def task_at(self, row):
+        return self._tasks[row]
+
+    def tasks(self):
+        return self._tasks
+
+    def _reset(self, tasks):
+        # 数据库返回的结果本身有序，Timsort对有序输入只需O(n)
+        tasks.sort(key=sort_key)
+        self.beginResetModel()
+        self._tasks = tasks
+        self._keys = [sort_key(task) for task in tasks]
+        self._key_by_id = {task.id: key for task, key in zip(tasks, self._keys)}
+        self.endResetModel()
+
+    def set_tasks(self, tasks):
+        """一次性设置全部任务（不分页）"""
+        self._fetch_page = None
+        self._cursor = None
+        self._reset(list(tasks))
+
+    def set_source(self, fetch_page, fetch_rollups=None):
+        """设置分页数据源并加载第一页
+
+        fetch_page(cursor) 返回 (按显示顺序排列的任务列表, 下一页游标或None)；
+        fetch_rollups(ids) 返回这些任务的子任务统计 {id: (总数, 已完成数)}，随每页一起读取
+        """
+        tasks, cursor = fetch_page(None)
+        self._fetch_page = fetch_page if cursor is not None else None
+        self._cursor = cursor
+        self._fetch_rollups = fetch_rollups
+        self._rollups = fetch_rollups([task.id for task in tasks]) if fetch_rollups else {}
+        self._reset(tasks)
+        self._boundary = self._keys[-1] if self._keys else None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetch_page is not None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._fetch_page is None:
+            return
+        tasks, cursor = self._fetch_page(self._cursor)
+        self._cursor = cursor
+        if cursor is None:
+            self._fetch_page = None
+        # 键集分页保证新的一页全部排在已加载任务之后
+        if tasks:
+            self._boundary = sort_key(tasks[-1])
+        tasks = [task for task in tasks if task.id not in self._key_by_id]
+        if not tasks:
+            return
+        if self._fetch_rollups:
+            self._rollups.update(self._fetch_rollups([task.id for task in tasks]))
+        row = len(self._tasks)
+        self.beginInsertRows(QModelIndex(), row, row + len(tasks) - 1)
+        for task in tasks:
+            key = sort_key(task)
+            self._tasks.append(task)
+            self._keys.append(key)
+            self._key_by_id[task.id] = key
+        self.endInsertRows()
+
+    def _is_loaded_range(self, key):
+        """排序键是否落在已加载的范围内（之后的任务会随分页加载）"""
+        return self._fetch_page is None or self._boundary is None or key <= self._boundary
+
+    def row_of(self, task):
+        """按记录的排序键二分查找任务所在行，不存在时返回-1"""
+        return self.row_of_id(task.id)
+
+    def row_of_id(self, task_id):
+        key = self._key_by_id.get(task_id)
+        if key is None:
+            return -1
+        row = bisect_left(self._keys, key)
+        if row < len(self._keys) and self._keys[row] == key:
+            return row
+        return -1
+
+    def insert_task(self, task):
+        key = sort_key(task)
+        if not self._is_loaded_range(key):
+            return -1
+        row = bisect_left(self._keys, key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._tasks.insert(row, task)
+        self._keys.insert(row, key)
+        self._key_by_id[task.id] = key
+        self.endInsertRows()
+        return row
+
+    def insert_tasks(self, tasks):
+        """批量插入：数量较少时逐个二分插入，较多时合并后一次性刷新"""
+        tasks = list(tasks)
+        if len(tasks) <= 64:
+            for task in tasks:
+                self.insert_task(task)
+        else:
+            self._reset(self._tasks + [task for task in tasks if self._is_loaded_range(sort_key(task))])
+
+    def update_task(self, task):
+        """任务字段已修改后调用，必要时把该行移动到新位置（单次移动）"""
+        row = self.row_of(task)
+        if row < 0:
+            return self.insert_task(task)
+        new_key = sort_key(task)
+        if not self._is_loaded_range(new_key):
+            # 移到了尚未加载的区域，之后翻页时会重新读到
+            self.remove_row(row)
+            return -1
+        new_row = bisect_left(self._keys, new_key)
+        if new_row > row:
+            new_row -= 1  # 移除原行后的位置
+        if new_row != row:
+            # beginMoveRows的目标位置以移动前的行号计算
+            dest = new_row + 1 if new_row > row else new_row
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), dest)
+            del self._tasks[row]
+            del self._keys[row]
+            self._tasks.insert(new_row, task)
+            self._keys.insert(new_row, new_key)
+            self._key_by_id[task.id] = new_key
+            self.endMoveRows()
+        else:
+            self._keys[row] = new_key
+            self._key_by_id[task.id] = new_key
+        index = self.index(new_row)
+        self.dataChanged.emit(index, index)
+        return new_row
+
+    def refresh_rollups(self):
+        """子任务变化后重新读取已加载任务的子任务统计"""
+        if self._fetch_rollups is None or not self._tasks:
+            return
+        rollups = self._fetch_rollups([task.id for task in self._tasks])
+        if rollups != self._rollups:
+            self._rollups = rollups
+            self.dataChanged.emit(self.index(0), self.index(len(self._tasks) - 1), [RollupRole])
+
+    def neighbors(self, row, excluded_ids):
+        """第 row 行之前、之后最近的不在 excluded_ids 中的任务（拖动时的放置位置），没有时为None"""
+        above = below = None
+        for i in range(row - 1, -1, -1):
+            if self._tasks[i].id not in excluded_ids:
+                above = self._tasks[i]
+                break
+        for i in range(row, len(self._tasks)):
+            if self._tasks[i].id not in excluded_ids:
+                below = self._tasks[i]
+                break
+        return above, below
+
+    def set_ranks(self, ranks):
+        """排序键重新分布后更新已加载任务的键（相对顺序不变，无需移动行）
+
+        分页加载中有尚未加载的任务被修改时返回False，分页游标可能已失效，调用方应重新加载。
+        """
+        # 先全部定位再修改，修改过程中 _keys 可能暂时无序
+        rows = [(self.row_of_id(task_id), rank) for task_id, rank in ranks.items()]
+        complete = self._fetch_page is None or all(row >= 0 for row, _ in rows)
+        for row, rank in rows:
+            if row < 0:
+                continue
+            task = self._tasks[row]
+            old_key = self._keys[row]
+            task.rank = rank
+            key = sort_key(task)
+            self._keys[row] = key
+            self._key_by_id[task.id] = key
+            if old_key == self._boundary:
+                self._boundary = key
+        return complete
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        task = self._tasks.pop(row)
+        del self._keys[row]
+        self._key_by_id.pop(task.id, None)
+        self.endRemoveRows()
+
+    def remove_task(self, task):
+        row = self.row_of(task)
+        if row >= 0:
+            self.remove_row(row)
+
+    def apply_bulk(self, match, values=None):
+        """对已加载的、满足 match(task) 的任务批量删除（values为None）或修改字段，一次性刷新视图
+
+        values 中的值为函数时，以该字段的原值调用得到新值。
+        """
+        tasks = []
+        for task in self._tasks:
+            if match(task):
+                if values is None:
+                    continue
+                for column, value in values.items():
+                    setattr(task, column, value(getattr(task, column)) if callable(value) else value)
+            tasks.append(task)
+        if values is not None:
+            tasks = [task for task in tasks if self._is_loaded_range(sort_key(task))]
+        self._reset(tasks)
+
+    def apply_changes(self, tasks, removed_ids):
+        """应用其他进程写入的修改：tasks 为新增或修改后的任务，removed_ids 为需要移除的任务id
+
+        已加载的任务在原对象上更新字段后按增量路径移动，其余任务按排序位置插入；
+        移除或插入的任务较多时（如撤销批量删除）各自一次性刷新。
+        """
+        if len(removed_ids) > 64:
+            self.remove_tasks(removed_ids)
+        else:
+            for task_id in removed_ids:
+                row = self.row_of_id(task_id)
+                if row >= 0:
+                    self.remove_row(row)
+        added = []
+        for task in tasks:
+            row = self.row_of_id(task.id)
+            if row < 0:
+                added.append(task)
+                continue
+            current = self._tasks[row]
+            for name in Task.__slots__:
+                setattr(current, name, getattr(task, name))
+            self.update_task(current)
+        self.insert_tasks(added)
+
+    def remove_tasks(self, ids):
+        """一次性移除多个任务，避免逐行删除的O(n²)开销"""
+        ids = set(ids)
+        self.beginResetModel()
+        kept = [(task, key) for task, key in zip(self._tasks, self._keys) if task.id not in ids]
+        self._tasks = [task for task, _ in kept]
+        self._keys = [key for _, key in kept]
+        for task_id in ids:
+            self._key_by_id.pop(task_id, None)
+        self.endResetModel()
+
+
+class SubtaskModel(QAbstractItemModel):
+    """某个任务的子任务树，展开节点时才读取该节点的直接子任务
+
+    索引的内部指针即 Task 对象；未展开的分支不会被读取，
+    只根据随父节点一起读取的子任务统计判断能否展开。
+    """
+
+    # 勾选框切换完成状态时发出 (task, checked)
+    taskToggled = pyqtSignal(object, bool)
+
+    def __init__(self, root_id, fetch_children, fetch_rollups, parent=None):
+        super().__init__(parent)
+        self._root_id = root_id
+        self._fetch_children = fetch_children
+        self._fetch_rollups = fetch_rollups
+        self._children = {}  # 父任务id -> 已读取的子任务列表（按 sort_key 有序）
+        self._tasks = {}     # 已读取的任务 id -> Task
+        self._rows = {}      # 已读取的任务 id -> 在兄弟任务中的行号
+        self._rollups = {}
+        self._set_children(root_id, self._read_children(root_id))
+
+    def _read_children(self, parent_id):
+        children = self._fetch_children(parent_id)
+        self._rollups.update(self._fetch_rollups([task.id for task in children]))
+        return children
+
+    def _set_children(self, parent_id, children):
+        self._children[parent_id] = children
+        for task in children:
+            self._tasks[task.id] = task
+        self._number_rows(parent_id)
+
+    def _number_rows(self, parent_id):
+        for row, task in enumerate(self._children[parent_id]):
+            self._rows[task.id] = row
+
+    def _id(self, index):
+        return index.internalPointer().id if index.isValid() else self._root_id
+
+    def index_of(self, task_id):
+        """已读取的任务对应的索引，根任务或未读取时返回无效索引"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return QModelIndex()
+        return self.createIndex(self._rows[task_id], 0, task)
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        children = self._children.get(self._id(parent))
+        if children is None or column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_of(index.internalPointer().parent_id)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self._children.get(self._id(parent), ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        task_id = self._id(parent)
+        if task_id in self._children:
+            return bool(self._children[task_id])
+        return task_id in self._rollups
+
+    def canFetchMore(self, parent):
+        task_id = self._id(parent)
+        return task_id not in self._children and task_id in self._rollups
+
+    def fetchMore(self, parent):
+        task_id = self._id(parent)
+        if task_id in self._children:
+            return
+        children = self._read_children(task_id)
+        if not children:
+            self._children[task_id] = []
+            return
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        self._set_children(task_id, children)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = index.internalPointer()
+        if role == TaskRole:
+            return task
+        if role == RollupRole:
+            return self._rollups.get(task.id)
+        if role == Qt.DisplayRole:
+            return task.title
+        if role == Qt.ToolTipRole:
+            return task.description or None
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if task.completed else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        task = index.internalPointer()
+        checked = value == Qt.Checked
+        task.completed = int(checked)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        if checked:
+            # 与数据库中的级联一致：已读取的子孙任务同样标记为已完成
+            self._complete_loaded(task.id)
+        self.taskToggled.emit(task, checked)
+        return True
+
+    def _complete_loaded(self, task_id):
+        children = self._children.get(task_id)
+        if not children:
+            return
+        for child in children:
+            child.completed = 1
+            self._complete_loaded(child.id)
+        self.dataChanged.emit(self.index_of(children[0].id), self.index_of(children[-1].id),
+                              [Qt.CheckStateRole])
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def rollup(self, task_id):
+        return self._rollups.get(task_id)
+
+    def insert_task(self, task):
+        """新增的子任务：父节点已展开时按排序位置插入，否则只需刷新统计"""
+        siblings = self._children.get(task.parent_id)
+        if siblings is None:
+            return
+        row = bisect_left([sort_key(sibling) for sibling in siblings], sort_key(task))
+        self.beginInsertRows(self.index_of(task.parent_id), row, row)
+        siblings.insert(row, task)
+        self._tasks[task.id] = task
+        self._number_rows(task.parent_id)
+        self.endInsertRows()
+
+    def remove_task(self, task):
+        """删除任务，其子孙任务随之从树中移除"""
+        index = self.index_of(task.id)
+        if not index.isValid():
+            return
+        self.beginRemoveRows(index.parent(), index.row(), index.row())
+        del self._children[task.parent_id][index.row()]
+        self._forget(task.id)
+        self._number_rows(task.parent_id)
+        self.endRemoveRows()
+
+    def _forget(self, task_id):
+        self._tasks.pop(task_id, None)
+        self._rows.pop(task_id, None)
+        for child in self._children.pop(task_id, ()):
+            self._forget(child.id)
+
+    def refresh_rollups(self):
+        """子任务变化后重新读取已读取节点的子任务统计"""
+        rollups = self._fetch_rollups([self._root_id, *self._tasks])
+        if rollups == self._rollups:
+            return
+        self._rollups = rollups
+        for children in self._children.values():
+            if children:
+                self.dataChanged.emit(self.index_of(children[0].id), self.index_of(children[-1].id),
+                                      [RollupRole])
+
+
+class TaskItemDelegate(QStyledItemDelegate):
+    """绘制任务行：勾选框、标题、标签、描述、创建时间和子任务统计（列表与子任务树共用）"""
+
+    MARGIN = 5
+    SPACING = 5
+    INDENT = 20
+    TITLE_MAX_WIDTH = 300
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.theme = theme()
+        self._size_cache = {}
+
+    def sizeHint(self, option, index):
+        task = index.data(TaskRole)
+        has_desc = bool(task.description)
+        size = self._size_cache.get(has_desc)
+        if size is None:
+            theme = self.theme
+            height = self.MARGIN * 2 + theme.top_height + self.SPACING + theme.time_height
+            if has_desc:
+                height += theme.desc_height + self.SPACING
+            size = QSize(200, height)
+            self._size_cache[has_desc] = size
+        return size
+
+    def _check_rect(self, rect):
+        theme = self.theme
+        check = theme.check_size
+        return QRect(rect.left() + self.MARGIN,
+                     rect.top() + self.MARGIN + (theme.top_height - check.height()) // 2,
+                     check.width(), check.height())
+
+    def paint(self, painter, option, index):
+        task = index.data(TaskRole)
+        if task is None:
+            return
+        self.initStyleOption(option, index)
+        style = option.widget.style() if option.widget else QApplication.style()
+        theme = self.theme
+        completed = bool(task.completed)
+
+        painter.save()
+        # 背景（选中/悬停状态）
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+        rect = option.rect
+        top_h = theme.top_height
+        left = rect.left() + self.MARGIN
+        right = rect.right() - self.MARGIN
+        y = rect.top() + self.MARGIN
+
+        # 完成状态的勾选框
+        check_opt = QStyleOptionButton()
+        check_opt.rect = self._check_rect(rect)
+        check_opt.state = QStyle.State_Enabled | (QStyle.State_On if completed else QStyle.State_Off)
+        style.drawPrimitive(QStyle.PE_IndicatorCheckBox, check_opt, painter, option.widget)
+
+        # 标签区域（集中显示在右侧，使用缓存的标签图片）
+        tags, tags_width = theme.task_tags(task)
+        tag_y = y + (top_h - theme.tag_height) // 2
+        x = right - tags_width
+        tag_x = x + TAG_SPACING
+        for pixmap, tag_w in tags:
+            painter.drawPixmap(tag_x, tag_y, pixmap)
+            tag_x += tag_w + TAG_SPACING
+
+        # 任务标题（单行显示，超出部分省略）
+        title_left = check_opt.rect.right() + self.SPACING + 1
+        title_width = max(0, min(self.TITLE_MAX_WIDTH, x - title_left))
+        painter.setFont(theme.title_fonts[completed])
+        if completed:
+            painter.setPen(theme.muted_color)
+        else:
+            painter.setPen(option.palette.color(
+                option.palette.HighlightedText if option.state & QStyle.State_Selected else option.palette.Text))
+        title = theme.title_metrics[completed].elidedText(task.title, Qt.ElideRight, title_width)
+        painter.drawText(QRect(title_left, y, title_width, top_h), Qt.AlignVCenter | Qt.AlignLeft, title)
+        y += top_h + self.SPACING
+
+        # 任务描述
+        painter.setPen(theme.muted_color)
+        if task.description:
+            desc_h = theme.desc_height
+            painter.setFont(theme.desc_fonts[completed])
+            desc_width = max(0, right - left - self.INDENT)
+            desc = theme.desc_metrics[completed].elidedText(task.description.replace('\n', ' '),
+                                                            Qt.ElideRight, desc_width)
+            painter.drawText(QRect(left + self.INDENT, y, desc_width, desc_h), Qt.AlignVCenter | Qt.AlignLeft, desc)
+            y += desc_h + self.SPACING
+
+        # 时间信息：创建时间，设置了截止时间时随后显示（过期未完成为红色）
+        painter.setFont(theme.small_font)
+        time_rect = QRect(left + self.INDENT, y, right - left - self.INDENT, theme.time_height)
+        created = format_timestamp(task.created_ts)
+        painter.drawText(time_rect, Qt.AlignVCenter | Qt.AlignLeft, created)
+        # 子任务完成情况显示在右侧
+        rollup = index.data(RollupRole)
+        if rollup is not None:
+            total, done = rollup
+            painter.drawText(time_rect, Qt.AlignVCenter | Qt.AlignRight, f"子任务 {done}/{total}")
+        if task.due_ts is not None:
+            if task.is_overdue():
+                painter.setPen(theme.overdue_color)
+            time_rect.setLeft(time_rect.left() + theme.small_metrics.horizontalAdvance(created) + self.SPACING * 2)
+            due = f"截止 {format_timestamp(task.due_ts)}"
+            if task.rule_id is not None:
+                due += " · 重复"
+            painter.drawText(time_rect, Qt.AlignVCenter | Qt.AlignLeft, due)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        """处理勾选框的点击和空格键"""
+        if not (index.flags() & Qt.ItemIsUserCheckable):
+            return False
+        if event.type() in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            if event.button() != Qt.LeftButton or not self._check_rect(option.rect).contains(event.pos()):
+                return False
+            if event.type() != QEvent.MouseButtonRelease:
+                return True  # 吞掉按下/双击事件，避免改变选择
+        elif event.type() == QEvent.KeyPress:
+            if event.key() != Qt.Key_Space:
+                return False
+        else:
+            return False
+        state = Qt.Unchecked if index.data(Qt.CheckStateRole) == Qt.Checked else Qt.Checked
+        return model.setData(index, state, Qt.CheckStateRole)
@@ -0,0 +1,1631 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from diagnostics import instrumentation
+from recurrence import next_occurrence
+from task import Task, RANK_STEP, DEFAULT_TAGS, UNTAGGED, decode_tags, encode_tags
+
+# 查询任务时统一使用的列顺序，与 Task.from_row 对应
+TASK_COLUMNS = ('id, title, description, tags, priority, urgency, duration, completed, created_time, updated_time, '
+                'due_time, remind_time, rule_id, rank, parent_id')
+# 查询结果中紧跟在任务列之后的附加列的位置
+EXTRA_COLUMN = len(TASK_COLUMNS.split(','))
+# 整行保存与恢复（撤销日志、归档）时另带上只用于统计的完成时间
+ROW_COLUMNS = TASK_COLUMNS + ', completed_time'
+
+# 按照紧急程度和任务周期排序：
+# 1. 紧急+短期 (urgency=3, duration=1)
+# 2. 紧急+中期 (urgency=3, duration=2)
+# 3. 紧急+长期 (urgency=3, duration=3)
+# 4. 一般+短期 (urgency=2, duration=1)
+# 5. 一般+中期 (urgency=2, duration=2)
+# 6. 一般+长期 (urgency=2, duration=3)
+# 7. 不急+短期 (urgency=1, duration=1)
+# 8. 不急+中期 (urgency=1, duration=2)
+# 9. 不急+长期 (urgency=1, duration=3)
+# 在每个 urgency+duration 组内，未完成的任务在前，已完成的任务在后，按手动排序键倒序排列
+# （排序键默认为 创建时间 × RANK_STEP，未拖动过的任务仍按创建时间倒序）
+# 该顺序与 task.sort_key 保持一致，列表据此做增量更新
+ORDER_BY = '''(3 - urgency) * 3 + (duration - 1),  -- Urgency and duration sorting
+              completed ASC,  -- Uncompleted first, completed last
+              rank DESC,  -- Manual order, newest first by default
+              id DESC'''
+
+# 批量操作中允许作为条件或修改目标的列（按标签筛选见 TAG_FILTER）
+BULK_COLUMNS = ('priority', 'urgency', 'duration', 'completed')
+# 带有某个标签的任务：只读 task_tags 的主键索引
+TAG_FILTER = 'id IN (SELECT task_id FROM task_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?))'
+# 同上，但沿 idx_tasks_display_order 逐行用主键检查，按显示顺序分页时无需排序
+TAG_SCAN_FILTER = ('EXISTS (SELECT 1 FROM task_tags '
+                   'WHERE tag_id = (SELECT id FROM tags WHERE name = ?) AND task_id = tasks.id)')
+
+# 归档：已完成超过指定天数的任务移到同目录下的 archive.db
+ARCHIVE_COLUMNS = ROW_COLUMNS + ', archived_time'
+ARCHIVE_CHUNK_SIZE = 5000
+DEFAULT_ARCHIVE_DAYS = 30
+
+# 筛选栏中的分面列；其余各列的组合计数保存在 task_facet_counts 中，
+# 每个标签与这些列的组合计数保存在 task_tag_counts 中（一个任务可以有多个标签，两者不能互相推出）
+FACET_COLUMNS = ('tag', 'priority', 'urgency', 'duration')
+LEVEL_COLUMNS = ('priority', 'urgency', 'duration')
+FACET_GROUP = 'priority, urgency, duration'
+# 计数表另按完成状态分组，统计面板由此得到未完成/已完成的任务数
+COUNT_GROUP = FACET_GROUP + ', completed'
+# 按组合累加/扣减计数
+ADD_FACET_COUNT_SQL = f'''INSERT INTO task_facet_counts ({COUNT_GROUP}, count)
+                          VALUES (?, ?, ?, ?, ?)
+                          ON CONFLICT ({COUNT_GROUP}) DO UPDATE SET count = count + excluded.count'''
+ADD_TAG_COUNT_SQL = f'''INSERT INTO task_tag_counts (tag_id, {COUNT_GROUP}, count)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (tag_id, {COUNT_GROUP}) DO UPDATE SET count = count + excluded.count'''
+# 已完成的任务按完成日期（本地时间）计数，同时累计从创建到完成的秒数，用于每日完成数与平均完成耗时。
+# 完成时间只在任务变为已完成时写入 completed_time，之后的编辑不会改变；
+# 其他程序写入的已完成任务没有完成时间时，仍以 updated_time 代替
+COMPLETION_TIME = 'IFNULL({row}.completed_time, {row}.updated_time)'
+ADD_COMPLETIONS_SQL = '''INSERT INTO task_completion_days (day, count, seconds)
+                         VALUES (?, ?, ?)
+                         ON CONFLICT (day) DO UPDATE SET count = count + excluded.count,
+                                                         seconds = seconds + excluded.seconds'''
+# 统计面板显示最近多少天的每日完成数
+STATS_DAYS = 14
+
+# 紧急程度/周期分组表达式，需与索引 idx_tasks_display_order 中的写法完全一致
+SORT_BUCKET = '(3 - urgency) * 3 + (duration - 1)'
+
+# 分页加载时每页的任务数
+PAGE_SIZE = 200
+
+# 当前时间（整数秒），数据库中的时间均以此格式保存
+NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+# 新任务的排序键
+NEW_RANK = f'{NOW} * {RANK_STEP}'
+# 排序键间隔用尽时，重新分布后相邻任务之间至少保留的间隔
+MIN_RANK_GAP = RANK_STEP >> 4
+
+# 修改版本号：任何连接对 tasks 的写入都会使 sync_state.rev 递增，
+# 被修改的行记录该版本号，被删除的行记录在 task_tombstones 中
+CURRENT_REV = '(SELECT rev FROM sync_state)'
+BUMP_REV_SQL = 'UPDATE sync_state SET rev = rev + 1'
+# 一次读取的修改数超过该值时直接重新加载
+MAX_CHANGES = 500
+# 保留的删除记录数，更早的记录会被清理
+TOMBSTONE_LIMIT = 10000
+
+# SQL语句保持为固定字符串，sqlite3 会按语句文本缓存已编译的语句
+SELECT_ALL_SQL = f'SELECT {TASK_COLUMNS} FROM tasks ORDER BY {ORDER_BY}'
+SELECT_ONE_SQL = f'SELECT {TASK_COLUMNS} FROM tasks WHERE id=?'
+INSERT_SQL = f'''INSERT INTO tasks (title, description, tags, priority, urgency, duration, completed,
+                                    due_time, remind_time, parent_id, created_time, updated_time, rank)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {NOW}, {NOW}, {NEW_RANK})'''
+# 批量插入时直接写入版本号（调用前先递增一次），不再逐行触发 tasks_rev_insert
+INSERT_ROWS_SQL = f'''INSERT INTO tasks (title, description, tags, priority, urgency, duration, completed, completed_time,
+                                         created_time, updated_time, rank, rev)
+                      VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, CASE WHEN ?7 THEN {NOW} END,
+                              {NOW}, {NOW}, {NEW_RANK}, {CURRENT_REV})'''
+# 编辑任务时修改的列，顺序与 UPDATE_SQL 的参数一致
+EDIT_COLUMNS = ('title', 'description', 'tags', 'priority', 'urgency', 'duration', 'due_time', 'remind_time')
+UPDATE_SQL = f'''UPDATE tasks
+                 SET title=?, description=?, tags=?, priority=?, urgency=?, duration=?,
+                     due_time=?, remind_time=?, updated_time={NOW}
+                 WHERE id=?'''
+SET_COMPLETED_SQL = f'UPDATE tasks SET completed=?1, completed_time=CASE WHEN ?1 THEN {NOW} END, updated_time={NOW} WHERE id=?2'
+SET_RANK_SQL = 'UPDATE tasks SET rank=? WHERE id=?'
+# 重复规则：按模板插入一次实例（提醒时间由规则中的提前秒数推算）
+RULE_COLUMNS = 'id, title, description, tags, priority, urgency, duration, freq, interval, start_time, remind_offset, next_time'
+INSERT_OCCURRENCE_SQL = f'''INSERT INTO tasks (title, description, tags, priority, urgency, duration, completed,
+                                               due_time, remind_time, rule_id, created_time, updated_time, rank)
+                            SELECT title, description, tags, priority, urgency, duration, 0,
+                                   ?1, ?1 - remind_offset, id, {NOW}, {NOW}, {NEW_RANK}
+                            FROM task_rules WHERE id = ?2'''
+# 子任务：沿 idx_tasks_parent 递归展开 {seed} 选出的任务及其全部子孙任务
+SUBTREE_CTE = '''WITH RECURSIVE subtree(id) AS (
+                     {seed}
+                     UNION
+                     SELECT t.id FROM tasks t JOIN subtree s ON t.parent_id = s.id
+                 )'''
+# 完成任务时连同全部子孙任务一起标记为已完成（一条语句，调用前先递增版本号，整棵子树共用）
+COMPLETE_SUBTREE_SQL = (SUBTREE_CTE +
+                        f' UPDATE tasks SET completed=1, completed_time={NOW}, updated_time={NOW}, rev={CURRENT_REV}'
+                        f' WHERE id IN subtree AND completed=0')
+
+# 撤销日志：每次操作只保存撤销它所需的逆操作——
+# 'restore' 把 undo_rows 中保存的任务行按原id插回（删除的逆操作），
+# 'remove' 按 id 范围删除任务（批量添加的逆操作），'revert' 把各任务的列改回原值（编辑的逆操作）。
+# 执行逆操作后该条目改为保存再次逆转所需的操作，撤销与重做共用同一条目
+JOURNAL_LIMIT = 100
+# 日志中保存的任务行总数上限，超出时清理最早的条目（最近一次操作总是保留）
+JOURNAL_ROW_LIMIT = 200000
+# 按 id 范围 [[起始, 结束], ...] 选出任务，每个范围沿主键读取
+RANGE_IDS = ('SELECT tasks.id FROM json_each(?) r '
+             "JOIN tasks ON tasks.id BETWEEN r.value ->> 0 AND r.value ->> 1")
+
+
+def _create_tasks_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            category TEXT DEFAULT '未分类',
+            priority INTEGER DEFAULT 1,  -- 1=低, 2=中, 3=高
+            urgency INTEGER DEFAULT 1,   -- 1=不急, 2=一般, 3=紧急
+            duration INTEGER DEFAULT 2,  -- 1=短期, 2=中期, 3=长期
+            completed INTEGER DEFAULT 0,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # 旧版本创建的数据库可能缺少这些字段
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(tasks)')}
+    if 'category' not in columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN category TEXT DEFAULT '未分类'")
+    if 'priority' not in columns:
+        conn.execute('ALTER TABLE tasks ADD COLUMN priority INTEGER DEFAULT 1')
+    if 'urgency' not in columns:
+        conn.execute('ALTER TABLE tasks ADD COLUMN urgency INTEGER DEFAULT 1')
+    if 'duration' not in columns:
+        conn.execute('ALTER TABLE tasks ADD COLUMN duration INTEGER DEFAULT 2')
+
+
+def _add_display_order_index(conn):
+    # 表达式与 ORDER_BY 完全一致，按显示顺序读取时直接走索引，无需临时排序
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_tasks_display_order
+                    ON tasks((3 - urgency) * 3 + (duration - 1), completed, created_time DESC, id DESC)''')
+
+
+CREATE_FTS_INSERT_TRIGGER_SQL = '''CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                                       INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+                                   END'''
+
+
+def _create_fulltext_index(conn):
+    # trigram 分词按连续三个字符建立索引，中文标题无需分词也能做子串匹配
+    # （需要 SQLite 3.34+，不支持时跳过，搜索退化为 LIKE 查询）
+    try:
+        conn.execute('''CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                            title, description, content='tasks', content_rowid='id', tokenize='trigram')''')
+    except sqlite3.OperationalError:
+        return
+    conn.execute("INSERT INTO tasks_fts(tasks_fts) VALUES('rebuild')")
+    # 触发器保持全文索引与 tasks 表同步
+    conn.execute(CREATE_FTS_INSERT_TRIGGER_SQL)
+    conn.execute('''CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+                        VALUES ('delete', old.id, old.title, old.description);
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+                        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+                        VALUES ('delete', old.id, old.title, old.description);
+                        INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+                    END''')
+
+
+# 一两个字的关键词（常见的中文词）用不上 trigram 索引：另把标题与描述按每个位置起的两个字
+# （末尾为一个字）拆成一个个词，建立只记录任务id的 FTS5 索引。两个字的关键词匹配同样的词，
+# 一个字的关键词按前缀匹配（以该字开头的词），找出的候选任务再用 LIKE 精确判断。
+# 触发器中不能使用递归CTE，各位置由 json_each 遍历与给定长度等长的数组得到。
+# substr 要从头数到第几个字，文字先切成 256 字一段（多带一个字组成段末的词），再在段内取词，
+# 避免长描述的开销随长度平方增长
+ZEROS_SQL = "'[' || rtrim(replace(hex(zeroblob({count})), '00', '0,'), ',') || ']'"
+GRAMS_SQL = ('''(WITH chunks(chunk) AS MATERIALIZED (
+                     SELECT substr({text}, key * 256 + 1, 257)
+                     FROM json_each(''' + ZEROS_SQL.format(count='(length({text}) + 255) / 256') + '''))
+                 SELECT group_concat(substr(chunk, pos.key + 1, 2), ' ')
+                 FROM chunks, json_each(''' + ZEROS_SQL.format(count='min(256, length(chunk))') + ''') AS pos)''')
+
+
+def grams_of(row):
+    """row（new/old/tasks）的标题与描述拆成的词"""
+    return GRAMS_SQL.format(text=f"({row}.title || ' ' || IFNULL({row}.description, ''))")
+
+
+def split_grams(title, description):
+    """与 GRAMS_SQL 相同的拆分，批量写入时在 Python 中完成，比逐行执行 SQL 快得多"""
+    text = f"{title} {description or ''}"
+    return ' '.join(text[k:k + 2] for k in range(len(text)))
+
+
+def _insert_grams(conn, where):
+    rows = conn.execute(f'SELECT id, title, description FROM tasks WHERE {where}')
+    conn.executemany('INSERT INTO tasks_grams(rowid, grams) VALUES (?, ?)',
+                     ((task_id, split_grams(title, description)) for task_id, title, description in rows))
+
+
+CREATE_GRAMS_INSERT_TRIGGER_SQL = f'''CREATE TRIGGER tasks_grams_insert AFTER INSERT ON tasks BEGIN
+                                          INSERT INTO tasks_grams(rowid, grams) VALUES (new.id, {grams_of('new')});
+                                      END'''
+
+
+def _convert_timestamps_to_epoch(conn):
+    # 旧版本以 CURRENT_TIMESTAMP 文本（UTC）保存时间，统一转换为整数秒，
+    # 读取时无需逐行解析字符串，排序和比较也更快
+    conn.execute("UPDATE tasks SET created_time = CAST(strftime('%s', created_time) AS INTEGER) "
+                 "WHERE typeof(created_time) = 'text'")
+    conn.execute("UPDATE tasks SET updated_time = COALESCE(CAST(strftime('%s', updated_time) AS INTEGER), created_time) "
+                 "WHERE typeof(updated_time) != 'integer'")
+
+
+def _add_change_tracking(conn):
+    # 由触发器维护，其他进程或脚本直接写数据库时同样会记录
+    conn.execute('ALTER TABLE tasks ADD COLUMN rev INTEGER NOT NULL DEFAULT 0')
+    conn.execute('CREATE INDEX idx_tasks_rev ON tasks(rev)')
+    conn.execute('''CREATE TABLE sync_state (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        rev INTEGER NOT NULL,
+                        pruned_rev INTEGER NOT NULL  -- 不大于该版本的删除记录已被清理
+                    )''')
+    conn.execute('INSERT INTO sync_state (id, rev, pruned_rev) VALUES (1, 0, 0)')
+    conn.execute('CREATE TABLE task_tombstones (id INTEGER PRIMARY KEY, rev INTEGER NOT NULL)')
+    conn.execute('CREATE INDEX idx_task_tombstones_rev ON task_tombstones(rev)')
+    # 已写入版本号的语句（批量插入/修改）不再逐行处理
+    conn.execute('''CREATE TRIGGER tasks_rev_insert AFTER INSERT ON tasks WHEN new.rev = 0 BEGIN
+                        UPDATE sync_state SET rev = rev + 1;
+                        UPDATE tasks SET rev = (SELECT rev FROM sync_state) WHERE id = new.id;
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_rev_update AFTER UPDATE ON tasks WHEN new.rev = old.rev BEGIN
+                        UPDATE sync_state SET rev = rev + 1;
+                        UPDATE tasks SET rev = (SELECT rev FROM sync_state) WHERE id = new.id;
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_rev_delete AFTER DELETE ON tasks BEGIN
+                        UPDATE sync_state SET rev = rev + 1;
+                        INSERT OR REPLACE INTO task_tombstones (id, rev) VALUES (old.id, (SELECT rev FROM sync_state));
+                    END''')
+
+
+def _add_facet_counts(conn):
+    # 按分类筛选时仍按显示顺序直接读取索引
+    conn.execute(f'''CREATE INDEX IF NOT EXISTS idx_tasks_category_order
+                     ON tasks(category, {SORT_BUCKET}, completed, created_time DESC, id DESC)''')
+    # 各分面组合的任务数（最多几百行），由触发器增量维护，读取计数无需扫描 tasks
+    conn.execute('''CREATE TABLE task_facet_counts (
+                        category TEXT NOT NULL,
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (category, priority, urgency, duration)
+                    )''')
+    conn.execute('''INSERT INTO task_facet_counts (category, priority, urgency, duration, count)
+                    SELECT IFNULL(category, ''), priority, urgency, duration, COUNT(*) FROM tasks
+                    GROUP BY IFNULL(category, ''), priority, urgency, duration''')
+    # 与版本号触发器相同，已写入版本号的批量语句自行做集合更新
+    conn.execute('''CREATE TRIGGER tasks_facets_insert AFTER INSERT ON tasks WHEN new.rev = 0 BEGIN
+                        INSERT INTO task_facet_counts (category, priority, urgency, duration, count)
+                        VALUES (IFNULL(new.category, ''), new.priority, new.urgency, new.duration, 1)
+                        ON CONFLICT (category, priority, urgency, duration) DO UPDATE SET count = count + 1;
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_facets_update AFTER UPDATE OF category, priority, urgency, duration ON tasks
+                    WHEN new.rev = old.rev BEGIN
+                        UPDATE task_facet_counts SET count = count - 1
+                        WHERE category = IFNULL(old.category, '') AND priority IS old.priority
+                          AND urgency IS old.urgency AND duration IS old.duration;
+                        INSERT INTO task_facet_counts (category, priority, urgency, duration, count)
+                        VALUES (IFNULL(new.category, ''), new.priority, new.urgency, new.duration, 1)
+                        ON CONFLICT (category, priority, urgency, duration) DO UPDATE SET count = count + 1;
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_facets_delete AFTER DELETE ON tasks BEGIN
+                        UPDATE task_facet_counts SET count = count - 1
+                        WHERE category = IFNULL(old.category, '') AND priority IS old.priority
+                          AND urgency IS old.urgency AND duration IS old.duration;
+                    END''')
+
+
+def _add_settings_and_archive_index(conn):
+    conn.execute('CREATE TABLE settings (key TEXT PRIMARY KEY, value) WITHOUT ROWID')
+    # 只包含已完成任务的部分索引，查找可归档的任务无需扫描全表
+    conn.execute('CREATE INDEX idx_tasks_completed_updated ON tasks(updated_time) WHERE completed = 1')
+
+
+def _add_due_dates(conn):
+    conn.execute('ALTER TABLE tasks ADD COLUMN due_time INTEGER')
+    conn.execute('ALTER TABLE tasks ADD COLUMN remind_time INTEGER')
+    # 只索引未完成且设置了截止时间的任务（提醒时间总是不晚于截止时间），
+    # 启动时读取待提醒的任务只需扫描该覆盖索引中的一段
+    conn.execute('''CREATE INDEX idx_tasks_due ON tasks(due_time, remind_time)
+                    WHERE completed = 0 AND due_time IS NOT NULL''')
+
+
+def _add_recurrence_rules(conn):
+    # 每条规则只在 tasks 中保留下一次待办的实例（pending_task_id），完成后再生成下一次
+    conn.execute('''CREATE TABLE task_rules (
+                        id INTEGER PRIMARY KEY,
+                        title TEXT NOT NULL,
+                        description TEXT,
+                        category TEXT,
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        freq TEXT NOT NULL,          -- daily/weekly/monthly
+                        interval INTEGER NOT NULL DEFAULT 1,
+                        start_time INTEGER NOT NULL, -- 第一次的时间，同时决定每次的时刻
+                        remind_offset INTEGER,       -- 提前提醒的秒数，NULL 表示不提醒
+                        next_time INTEGER,           -- 待办实例的截止时间
+                        pending_task_id INTEGER,
+                        created_time INTEGER
+                    )''')
+    conn.execute('ALTER TABLE tasks ADD COLUMN rule_id INTEGER')
+    conn.execute('CREATE INDEX idx_tasks_rule ON tasks(rule_id) WHERE rule_id IS NOT NULL')
+
+
+def _add_manual_rank(conn):
+    # 稀疏的手动排序键：拖动时取相邻两项的中间值，只改被拖动的一行
+    conn.execute('ALTER TABLE tasks ADD COLUMN rank INTEGER')
+    # 整条语句共用一个版本号，不逐行触发 tasks_rev_update
+    conn.execute(BUMP_REV_SQL)
+    conn.execute(f'UPDATE tasks SET rank = created_time * {RANK_STEP}, rev = {CURRENT_REV}')
+    conn.execute('DROP INDEX IF EXISTS idx_tasks_display_order')
+    conn.execute('DROP INDEX IF EXISTS idx_tasks_category_order')
+    conn.execute(f'CREATE INDEX idx_tasks_display_order ON tasks({SORT_BUCKET}, completed, rank DESC, id DESC)')
+    conn.execute(f'''CREATE INDEX idx_tasks_category_order
+                     ON tasks(category, {SORT_BUCKET}, completed, rank DESC, id DESC)''')
+
+
+def _add_subtasks(conn):
+    # 顶层任务的 parent_id 为 NULL；子任务按父任务沿该索引直接按显示顺序读取，递归查询同样使用它
+    conn.execute('ALTER TABLE tasks ADD COLUMN parent_id INTEGER')
+    conn.execute(f'''CREATE INDEX idx_tasks_parent ON tasks(parent_id, {SORT_BUCKET}, completed, rank DESC, id DESC)
+                     WHERE parent_id IS NOT NULL''')
+
+
+# 标签：tasks.tags 以 JSON 数组保存标签名，读取任务时无需关联查询；
+# 触发器据此维护 tags（每个名称只保存一次）、task_tags 与 task_tag_counts，
+# 按标签筛选只读 task_tags 的索引，按标签计数只读 task_tag_counts
+ADD_TASK_TAGS_SQL = f'''INSERT OR IGNORE INTO tags (name) SELECT value FROM json_each(new.tags);
+                        INSERT OR IGNORE INTO task_tags (tag_id, task_id)
+                        SELECT tags.id, new.id FROM json_each(new.tags) j JOIN tags ON tags.name = j.value;
+                        INSERT INTO task_tag_counts (tag_id, {COUNT_GROUP}, count)
+                        SELECT tag_id, new.priority, new.urgency, new.duration, new.completed, 1
+                        FROM task_tags WHERE task_id = new.id
+                        ON CONFLICT (tag_id, {COUNT_GROUP}) DO UPDATE SET count = count + 1;'''
+REMOVE_TASK_TAGS_SQL = '''UPDATE task_tag_counts SET count = count - 1
+                          WHERE tag_id IN (SELECT tag_id FROM task_tags WHERE task_id = old.id)
+                            AND priority IS old.priority AND urgency IS old.urgency AND duration IS old.duration
+                            AND completed IS old.completed;
+                          DELETE FROM task_tags WHERE task_id = old.id;'''
+CREATE_TAGS_INSERT_TRIGGER_SQL = f'''CREATE TRIGGER tasks_tags_insert AFTER INSERT ON tasks WHEN new.tags IS NOT NULL BEGIN
+                                         {ADD_TASK_TAGS_SQL}
+                                     END'''
+
+
+def _add_tags(conn):
+    # 该版本的计数表与触发器不区分完成状态，之后由 _add_statistics 重建
+    add_task_tags = '''INSERT OR IGNORE INTO tags (name) SELECT value FROM json_each(new.tags);
+                       INSERT OR IGNORE INTO task_tags (tag_id, task_id)
+                       SELECT tags.id, new.id FROM json_each(new.tags) j JOIN tags ON tags.name = j.value;
+                       INSERT INTO task_tag_counts (tag_id, priority, urgency, duration, count)
+                       SELECT tag_id, new.priority, new.urgency, new.duration, 1 FROM task_tags WHERE task_id = new.id
+                       ON CONFLICT (tag_id, priority, urgency, duration) DO UPDATE SET count = count + 1;'''
+    remove_task_tags = '''UPDATE task_tag_counts SET count = count - 1
+                          WHERE tag_id IN (SELECT tag_id FROM task_tags WHERE task_id = old.id)
+                            AND priority IS old.priority AND urgency IS old.urgency AND duration IS old.duration;
+                          DELETE FROM task_tags WHERE task_id = old.id;'''
+    conn.execute('CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    # 主键 (tag_id, task_id) 即为按标签查找的覆盖索引，反向索引用于修改标签与删除任务
+    conn.execute('''CREATE TABLE task_tags (
+                        tag_id INTEGER NOT NULL,
+                        task_id INTEGER NOT NULL,
+                        PRIMARY KEY (tag_id, task_id)
+                    ) WITHOUT ROWID''')
+    conn.execute('CREATE INDEX idx_task_tags_task ON task_tags(task_id, tag_id)')
+    conn.execute('''CREATE TABLE task_tag_counts (
+                        tag_id INTEGER NOT NULL,
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (tag_id, priority, urgency, duration)
+                    )''')
+    conn.execute('ALTER TABLE tasks ADD COLUMN tags TEXT')
+    conn.execute('ALTER TABLE task_rules ADD COLUMN tags TEXT')
+    conn.executemany('INSERT INTO tags (name) VALUES (?)', [(name,) for name in DEFAULT_TAGS])
+    # 原有的分类迁移为一个标签，“未分类”即没有标签；整条语句共用一个版本号
+    conn.execute(BUMP_REV_SQL)
+    conn.execute(f"UPDATE tasks SET tags = json_array(category), rev = {CURRENT_REV} WHERE category NOT IN ('', ?)",
+                 (UNTAGGED,))
+    conn.execute("UPDATE task_rules SET tags = json_array(category) WHERE category NOT IN ('', ?)", (UNTAGGED,))
+    conn.execute('''INSERT OR IGNORE INTO tags (name)
+                    SELECT category FROM tasks WHERE tags IS NOT NULL
+                    UNION SELECT category FROM task_rules WHERE tags IS NOT NULL''')
+    conn.execute('''INSERT INTO task_tags (tag_id, task_id)
+                    SELECT tags.id, tasks.id FROM tasks JOIN tags ON tags.name = tasks.category
+                    WHERE tasks.tags IS NOT NULL''')
+    conn.execute(f'''INSERT INTO task_tag_counts (tag_id, priority, urgency, duration, count)
+                     SELECT tag_id, {FACET_GROUP}, COUNT(*) FROM task_tags JOIN tasks ON tasks.id = task_tags.task_id
+                     GROUP BY tag_id, {FACET_GROUP}''')
+    conn.execute(f'''CREATE TRIGGER tasks_tags_insert AFTER INSERT ON tasks WHEN new.tags IS NOT NULL BEGIN
+                         {add_task_tags}
+                     END''')
+    # 整条语句共用版本号的批量修改（bulk_update / bulk_tag）不逐行触发，由调用方按组合一次性维护
+    conn.execute(f'''CREATE TRIGGER tasks_tags_update AFTER UPDATE OF tags, priority, urgency, duration ON tasks
+                     WHEN new.rev = old.rev
+                      AND (new.tags IS NOT old.tags
+                           OR (old.tags IS NOT NULL
+                               AND (new.priority IS NOT old.priority OR new.urgency IS NOT old.urgency
+                                    OR new.duration IS NOT old.duration))) BEGIN
+                         {remove_task_tags}
+                         {add_task_tags}
+                     END''')
+    conn.execute(f'''CREATE TRIGGER tasks_tags_delete AFTER DELETE ON tasks WHEN old.tags IS NOT NULL BEGIN
+                         {remove_task_tags}
+                     END''')
+    # 分类列不再使用：分面计数改为只按优先级/紧急程度/周期分组，按分类的索引也不再需要
+    for trigger in ('tasks_facets_insert', 'tasks_facets_update', 'tasks_facets_delete'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    conn.execute('DROP TABLE task_facet_counts')
+    conn.execute('DROP INDEX IF EXISTS idx_tasks_category_order')
+    conn.execute('''CREATE TABLE task_facet_counts (
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (priority, urgency, duration)
+                    )''')
+    conn.execute(f'''INSERT INTO task_facet_counts (priority, urgency, duration, count)
+                     SELECT {FACET_GROUP}, COUNT(*) FROM tasks GROUP BY {FACET_GROUP}''')
+    conn.execute('''CREATE TRIGGER tasks_facets_insert AFTER INSERT ON tasks WHEN new.rev = 0 BEGIN
+                        INSERT INTO task_facet_counts (priority, urgency, duration, count)
+                        VALUES (new.priority, new.urgency, new.duration, 1)
+                        ON CONFLICT (priority, urgency, duration) DO UPDATE SET count = count + 1;
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_facets_update AFTER UPDATE OF priority, urgency, duration ON tasks
+                    WHEN new.rev = old.rev BEGIN
+                        UPDATE task_facet_counts SET count = count - 1
+                        WHERE priority IS old.priority AND urgency IS old.urgency AND duration IS old.duration;
+                        INSERT INTO task_facet_counts (priority, urgency, duration, count)
+                        VALUES (new.priority, new.urgency, new.duration, 1)
+                        ON CONFLICT (priority, urgency, duration) DO UPDATE SET count = count + 1;
+                    END''')
+    conn.execute('''CREATE TRIGGER tasks_facets_delete AFTER DELETE ON tasks BEGIN
+                        UPDATE task_facet_counts SET count = count - 1
+                        WHERE priority IS old.priority AND urgency IS old.urgency AND duration IS old.duration;
+                    END''')
+
+
+def _create_counts_triggers(conn, completion_time, time_columns):
+    """维护计数表的触发器；completion_time 为完成时间的表达式（{row} 为 new/old），time_columns 为其用到的列"""
+    new_time, old_time = completion_time.format(row='new'), completion_time.format(row='old')
+    # 与原来一样，整条语句共用版本号的批量修改不逐行触发，由调用方整体维护（见 _count_groups）
+    add_counts = f'''INSERT INTO task_facet_counts ({COUNT_GROUP}, count)
+                     VALUES (new.priority, new.urgency, new.duration, new.completed, 1)
+                     ON CONFLICT ({COUNT_GROUP}) DO UPDATE SET count = count + 1;
+                     INSERT INTO task_completion_days (day, count, seconds)
+                     SELECT date({new_time}, 'unixepoch', 'localtime'), 1, {new_time} - new.created_time
+                     WHERE new.completed
+                     ON CONFLICT (day) DO UPDATE SET count = count + 1, seconds = seconds + excluded.seconds;'''
+    remove_counts = f'''UPDATE task_facet_counts SET count = count - 1
+                        WHERE priority IS old.priority AND urgency IS old.urgency AND duration IS old.duration
+                          AND completed IS old.completed;
+                        UPDATE task_completion_days
+                        SET count = count - 1, seconds = seconds - ({old_time} - old.created_time)
+                        WHERE old.completed AND day = date({old_time}, 'unixepoch', 'localtime');'''
+    conn.execute(f'''CREATE TRIGGER tasks_counts_insert AFTER INSERT ON tasks WHEN new.rev = 0 BEGIN
+                         {add_counts}
+                     END''')
+    conn.execute(f'''CREATE TRIGGER tasks_counts_update AFTER UPDATE OF priority, urgency, duration, completed, {time_columns}
+                     ON tasks WHEN new.rev = old.rev BEGIN
+                         {remove_counts}
+                         {add_counts}
+                     END''')
+    conn.execute(f'''CREATE TRIGGER tasks_counts_delete AFTER DELETE ON tasks BEGIN
+                         {remove_counts}
+                     END''')
+
+
+def _add_statistics(conn):
+    # 统计面板与托盘提示只读计数表，耗时与任务数无关：
+    # 两个计数表增加完成状态，另按完成日期统计已完成的任务；计数表与触发器整体重建
+    for trigger in ('tasks_facets_insert', 'tasks_facets_update', 'tasks_facets_delete',
+                    'tasks_tags_insert', 'tasks_tags_update', 'tasks_tags_delete'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    conn.execute('DROP TABLE task_facet_counts')
+    conn.execute('DROP TABLE task_tag_counts')
+    conn.execute('''CREATE TABLE task_facet_counts (
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        completed INTEGER,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (priority, urgency, duration, completed)
+                    )''')
+    conn.execute('''CREATE TABLE task_tag_counts (
+                        tag_id INTEGER NOT NULL,
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        completed INTEGER,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (tag_id, priority, urgency, duration, completed)
+                    )''')
+    conn.execute('''CREATE TABLE task_completion_days (
+                        day TEXT PRIMARY KEY,        -- 本地日期 YYYY-MM-DD
+                        count INTEGER NOT NULL,
+                        seconds INTEGER NOT NULL     -- 这些任务从创建到完成的总秒数
+                    )''')
+    conn.execute(f'''INSERT INTO task_facet_counts ({COUNT_GROUP}, count)
+                     SELECT {COUNT_GROUP}, COUNT(*) FROM tasks GROUP BY {COUNT_GROUP}''')
+    conn.execute(f'''INSERT INTO task_tag_counts (tag_id, {COUNT_GROUP}, count)
+                     SELECT tag_id, {COUNT_GROUP}, COUNT(*) FROM task_tags JOIN tasks ON tasks.id = task_tags.task_id
+                     GROUP BY tag_id, {COUNT_GROUP}''')
+    conn.execute('''INSERT INTO task_completion_days (day, count, seconds)
+                    SELECT date(updated_time, 'unixepoch', 'localtime'), COUNT(*), SUM(updated_time - created_time)
+                    FROM tasks WHERE completed GROUP BY 1''')
+    _create_counts_triggers(conn, '{row}.updated_time', 'updated_time')
+    conn.execute(CREATE_TAGS_INSERT_TRIGGER_SQL)
+    conn.execute(f'''CREATE TRIGGER tasks_tags_update AFTER UPDATE OF tags, priority, urgency, duration, completed ON tasks
+                     WHEN new.rev = old.rev
+                      AND (new.tags IS NOT old.tags
+                           OR (old.tags IS NOT NULL
+                               AND (new.priority IS NOT old.priority OR new.urgency IS NOT old.urgency
+                                    OR new.duration IS NOT old.duration OR new.completed IS NOT old.completed))) BEGIN
+                         {REMOVE_TASK_TAGS_SQL}
+                         {ADD_TASK_TAGS_SQL}
+                     END''')
+    conn.execute(f'''CREATE TRIGGER tasks_tags_delete AFTER DELETE ON tasks WHEN old.tags IS NOT NULL BEGIN
+                         {REMOVE_TASK_TAGS_SQL}
+                     END''')
+
+
+def _add_undo_journal(conn):
+    # 日志保存在数据库中，撤销与重做在重启后、其他窗口中同样可用
+    conn.execute('''CREATE TABLE undo_journal (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        label TEXT NOT NULL,             -- 显示文字，如“删除3个任务”
+                        op TEXT NOT NULL,                -- 'restore' / 'remove' / 'revert'
+                        payload TEXT,                    -- JSON：remove 为 id 范围，revert 为 {id: {列: 值}}
+                        size INTEGER NOT NULL DEFAULT 0, -- 保存的任务行数（undo_rows）或修改的任务数
+                        undone INTEGER NOT NULL DEFAULT 0
+                    )''')
+    conn.execute('''CREATE TABLE undo_rows (
+                        entry_id INTEGER NOT NULL,
+                        id INTEGER NOT NULL,
+                        title TEXT NOT NULL,
+                        description TEXT,
+                        tags TEXT,
+                        priority INTEGER,
+                        urgency INTEGER,
+                        duration INTEGER,
+                        completed INTEGER,
+                        created_time INTEGER,
+                        updated_time INTEGER,
+                        due_time INTEGER,
+                        remind_time INTEGER,
+                        rule_id INTEGER,
+                        rank INTEGER,
+                        parent_id INTEGER,
+                        PRIMARY KEY (entry_id, id)
+                    ) WITHOUT ROWID''')
+
+
+def _add_short_term_index(conn):
+    # 与 tasks_fts 一样，不支持 FTS5 时跳过，短关键词仍用 LIKE 查询
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'").fetchone() is None:
+        return
+    # 不保存内容与位置（detail='none'），索引只有 词 -> 任务id；prefix='1' 为单字前缀单独建索引
+    conn.execute('''CREATE VIRTUAL TABLE tasks_grams USING fts5(
+                        grams, content='', detail='none', prefix='1', tokenize='unicode61')''')
+    _insert_grams(conn, '1')
+    conn.execute(CREATE_GRAMS_INSERT_TRIGGER_SQL)
+    # 无内容表删除时需提供原来的内容，由旧值重新拆分
+    remove = f"INSERT INTO tasks_grams(tasks_grams, rowid, grams) VALUES ('delete', old.id, {grams_of('old')});"
+    conn.execute(f'''CREATE TRIGGER tasks_grams_delete AFTER DELETE ON tasks BEGIN
+                         {remove}
+                     END''')
+    conn.execute(f'''CREATE TRIGGER tasks_grams_update AFTER UPDATE OF title, description ON tasks BEGIN
+                         {remove}
+                         INSERT INTO tasks_grams(rowid, grams) VALUES (new.id, {grams_of('new')});
+                     END''')
+
+
+
+def _add_completion_time(conn):
+    # 完成日期原来取自 updated_time，之后编辑、批量修改标签或从归档恢复都会改变它：
+    # 另设只在变为已完成时写入的 completed_time，已完成的任务以原来的 updated_time 补上
+    conn.execute('ALTER TABLE tasks ADD COLUMN completed_time INTEGER')
+    conn.execute('ALTER TABLE undo_rows ADD COLUMN completed_time INTEGER')
+    # 整条语句共用一个版本号，不逐行触发 tasks_rev_update；补上的完成日期与原来相同，计数不变
+    conn.execute(BUMP_REV_SQL)
+    conn.execute(f'UPDATE tasks SET completed_time = updated_time, rev = {CURRENT_REV} WHERE completed')
+    conn.execute('UPDATE undo_rows SET completed_time = updated_time WHERE completed')
+    for trigger in ('tasks_counts_insert', 'tasks_counts_update', 'tasks_counts_delete'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    _create_counts_triggers(conn, COMPLETION_TIME, 'completed_time, updated_time')
+
+# 数据库迁移步骤，第 n 个步骤执行后 user_version = n；只能在末尾追加
+MIGRATIONS = [
+    _create_tasks_table,
+    _add_display_order_index,
+    _create_fulltext_index,
+    _convert_timestamps_to_epoch,
+    _add_change_tracking,
+    _add_facet_counts,
+    _add_settings_and_archive_index,
+    _add_due_dates,
+    _add_recurrence_rules,
+    _add_manual_rank,
+    _add_subtasks,
+    _add_tags,
+    _add_statistics,
+    _add_undo_journal,
+    _add_short_term_index,
+    _add_completion_time,
+]
+
+
+def and_clauses(*clauses):
+    """合并多个 (WHERE条件, 参数)，空条件会被忽略"""
+    where = ' AND '.join(f'({clause})' for clause, _ in clauses if clause)
+    params = [param for clause, clause_params in clauses if clause for param in clause_params]
+    return where, params
+
+
+def merge_ranges(ranges):
+    """把按起始值排列的 (起始, 结束) 合并为互不相邻的 [[起始, 结束], ...]"""
+    merged = []
+    for first, last in ranges:
+        if merged and merged[-1][1] + 1 >= first:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+
+class TaskRepository:
+    """任务数据访问层，程序运行期间只持有一个数据库连接"""
+
+    def __init__(self, db_path='data/tasks.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=5.0, cached_statements=256)
+        self._transaction_depth = 0
+        self.configure()
+        self.init_db()
+        self.has_fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'").fetchone() is not None
+        self.has_grams = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_grams'").fetchone() is not None
+
+    def configure(self):
+        cursor = self.conn.cursor()
+        # 新建数据库时生效；已有数据库在下一次 VACUUM（首次归档）时转换
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        # WAL模式下读写互不阻塞，synchronous=NORMAL时提交不再每次fsync
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA cache_size=-16000')  # 约16MB页缓存
+        cursor.execute('PRAGMA mmap_size=67108864')  # 64MB内存映射读取
+        cursor.execute('PRAGMA temp_store=MEMORY')
+
+    def init_db(self):
+        """按 PRAGMA user_version 依次执行尚未执行的迁移步骤"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return  # 数据库已是最新版本，无需任何检查
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            self.conn.execute('BEGIN')
+            try:
+                migration(self.conn)
+                self.conn.execute(f'PRAGMA user_version={target}')
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def close(self):
+        self.conn.close()
+
+    def get_setting(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM settings WHERE key=?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_setting(self, key, value):
+        with self.transaction():
+            self.conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, value))
+
+    @contextmanager
+    def transaction(self):
+        """写事务，可嵌套：只有最外层结束时才提交（出错时整体回滚）"""
+        if self._transaction_depth:
+            self._transaction_depth += 1
+            try:
+                yield self.conn
+            finally:
+                self._transaction_depth -= 1
+            return
+        self._transaction_depth = 1
+        try:
+            with self.conn:
+                # 显式开始事务，使其中的DDL语句也包含在同一事务内
+                if not self.conn.in_transaction:
+                    self.conn.execute('BEGIN')
+                yield self.conn
+        finally:
+            self._transaction_depth = 0
+
+    def load_tasks(self):
+        rows = self.conn.execute(SELECT_ALL_SQL).fetchall()
+        with instrumentation.timed('task.from_row'):
+            return [Task.from_row(row) for row in rows]
+
+    def search_clause(self, text, paged=True):
+        """把搜索文本转换为 (WHERE条件, 参数)，多个关键词之间为“且”的关系
+
+        三个字及以上的关键词使用 trigram 全文索引；一两个字的关键词合并为一个 tasks_grams 查询，
+        按页读取（paged=True）且匹配的任务很多时改为按显示顺序逐行判断，每页很快就能凑满；
+        统计全部搜索结果（如分面计数）时总是使用索引。
+        """
+        conditions = []
+        params = []
+        short_terms = []
+        like_terms = []
+        for term in text.split():
+            if self.has_fts and len(term) >= 3:
+                # 作为短语匹配，双引号需转义
+                conditions.append('id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)')
+                params.append('"' + term.replace('"', '""') + '"')
+            elif self.has_grams and term.isalnum():
+                short_terms.append(term)
+            else:
+                # 含标点的短关键词无法使用索引
+                like_terms.append(term)
+        if short_terms:
+            query = ' AND '.join(f'"{term}"*' if len(term) == 1 else f'"{term}"' for term in short_terms)
+            if paged and self._is_common_match(query):
+                like_terms.extend(short_terms)
+            else:
+                conditions.append('id IN (SELECT rowid FROM tasks_grams WHERE tasks_grams MATCH ?)')
+                params.append(query)
+                # unicode61 分词不区分大小写与变音符号（LIKE 只对 ASCII 字母不区分大小写），
+                # 含其他大小写字母的关键词对候选任务再用 LIKE 精确判断；中文与 ASCII 关键词无需判断
+                like_terms.extend(term for term in short_terms
+                                  if not all(ch.isascii() or ch.lower() == ch.upper() for ch in term))
+        for term in like_terms:
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append("(title LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        return ' AND '.join(conditions), params
+
+    def _is_common_match(self, query):
+        """与 _tag_condition 的判断相同：匹配的任务数² > 页大小 × 总任务数 时逐行扫描更快
+
+        tasks_grams 只保存任务id，计数只读这几个词的id列表，不读取任务表。
+        """
+        matched, total = self.conn.execute(
+            '''SELECT (SELECT COUNT(*) FROM tasks_grams WHERE tasks_grams MATCH ?),
+                      (SELECT IFNULL(SUM(count), 0) FROM task_facet_counts)''', (query,)).fetchone()
+        return matched * matched > PAGE_SIZE * total
+
+    def fetch_page(self, after=None, limit=PAGE_SIZE, where='', params=(), table='tasks'):
+        """按显示顺序取一页任务（键集分页），返回 (任务列表, 下一页游标)
+
+        游标为上一页最后一行的 (分组, 完成状态, 排序键, id) 原始值，
+        每一层查询都能在 idx_tasks_display_order 上直接定位，
+        因此无论翻到第几页，开销都与页大小成正比。没有更多任务时游标为None。
+        table 为 'archive.archived_tasks' 时按同样的顺序浏览归档（需先调用 attach_archive）。
+        """
+        extra = f' AND ({where})' if where else ''
+        params = list(params)
+        if after is None:
+            queries = [(f'SELECT {TASK_COLUMNS}, {SORT_BUCKET} FROM {table} WHERE 1{extra} '
+                        f'ORDER BY {ORDER_BY} LIMIT ?', params)]
+        else:
+            bucket, completed, rank, task_id = after
+            queries = [
+                # 同一分组、同一完成状态中排在游标之后的任务
+                (f'SELECT {TASK_COLUMNS}, {SORT_BUCKET} FROM {table} '
+                 f'WHERE {SORT_BUCKET} = ? AND completed = ? AND (rank, id) < (?, ?){extra} '
+                 f'ORDER BY rank DESC, id DESC LIMIT ?',
+                 [bucket, completed, rank, task_id] + params),
+                # 同一分组中完成状态靠后的任务
+                (f'SELECT {TASK_COLUMNS}, {SORT_BUCKET} FROM {table} '
+                 f'WHERE {SORT_BUCKET} = ? AND completed > ?{extra} '
+                 f'ORDER BY completed, rank DESC, id DESC LIMIT ?',
+                 [bucket, completed] + params),
+                # 之后的分组
+                (f'SELECT {TASK_COLUMNS}, {SORT_BUCKET} FROM {table} '
+                 f'WHERE {SORT_BUCKET} > ?{extra} '
+                 f'ORDER BY {ORDER_BY} LIMIT ?',
+                 [bucket] + params),
+            ]
+        rows = []
+        for sql, query_params in queries:
+            rows.extend(self.conn.execute(sql, query_params + [limit - len(rows)]).fetchall())
+            if len(rows) >= limit:
+                break
+        with instrumentation.timed('task.from_row'):
+            tasks = [Task.from_row(row) for row in rows]
+        if len(rows) < limit:
+            return tasks, None
+        last = rows[-1]
+        return tasks, (last[EXTRA_COLUMN], last[7], last[13], last[0])
+
+    def iter_tasks(self, where='', params=(), page_size=PAGE_SIZE):
+        """按显示顺序逐页读取满足条件的全部任务，内存中最多只保留一页"""
+        cursor = None
+        while True:
+            tasks, cursor = self.fetch_page(cursor, page_size, where, params)
+            yield from tasks
+            if cursor is None:
+                return
+
+    def get_task(self, task_id):
+        row = self.conn.execute(SELECT_ONE_SQL, (task_id,)).fetchone()
+        return Task.from_row(row) if row else None
+
+    def add_task(self, data):
+        """插入单个任务，返回带有数据库生成时间的Task"""
+        with self.transaction():
+            cursor = self.conn.execute(INSERT_SQL, (
+                data['title'], data['description'], encode_tags(data['tags']), data['priority'],
+                data['urgency'], data['duration'], 0,  # 新任务默认未完成
+                data.get('due_time'), data.get('remind_time'), data.get('parent_id')))
+            row = self.conn.execute(SELECT_ONE_SQL, (cursor.lastrowid,)).fetchone()
+        return Task.from_row(row)
+
+    def insert_rows(self, rows):
+        """用 executemany 在一个事务内插入多行 (title, description, tags, priority, urgency, duration, completed)
+
+        tags 为 encode_tags 的结果。返回新任务的 id 范围 (起始, 结束)，没有插入时为None。
+        """
+        with self.transaction():
+            self._insert_bulk(lambda: self.conn.executemany(INSERT_ROWS_SQL, rows))
+            first_id, last_id = self.conn.execute(
+                f'SELECT MIN(id), MAX(id) FROM tasks WHERE rev = {CURRENT_REV}').fetchone()
+        return (first_id, last_id) if first_id is not None else None
+
+    def _insert_bulk(self, insert):
+        """执行 insert()，其插入的行需写入 rev = 当前版本号（本方法先递增一次）
+
+        逐行触发器更新全文索引与标签的开销远大于插入本身：
+        在同一事务内暂时去掉触发器，插入后按版本号一次性写入，计数也整体累加，
+        其他连接只能看到提交后的结果，不会观察到触发器缺失的状态。
+        """
+        self.conn.execute(BUMP_REV_SQL)
+        self.conn.execute('DROP TRIGGER tasks_tags_insert')
+        if self.has_fts:
+            self.conn.execute('DROP TRIGGER tasks_fts_insert')
+        if self.has_grams:
+            self.conn.execute('DROP TRIGGER tasks_grams_insert')
+        insert()
+        if self.has_fts:
+            self.conn.execute(f'''INSERT INTO tasks_fts(rowid, title, description)
+                                  SELECT id, title, description FROM tasks WHERE rev = {CURRENT_REV}''')
+            self.conn.execute(CREATE_FTS_INSERT_TRIGGER_SQL)
+        if self.has_grams:
+            _insert_grams(self.conn, f'rev = {CURRENT_REV}')
+            self.conn.execute(CREATE_GRAMS_INSERT_TRIGGER_SQL)
+        self.conn.execute(f'''INSERT OR IGNORE INTO tags (name)
+                              SELECT DISTINCT j.value FROM tasks, json_each(tasks.tags) j
+                              WHERE tasks.rev = {CURRENT_REV} AND tasks.tags IS NOT NULL''')
+        self.conn.execute(f'''INSERT OR IGNORE INTO task_tags (tag_id, task_id)
+                              SELECT tags.id, tasks.id FROM tasks, json_each(tasks.tags) j JOIN tags ON tags.name = j.value
+                              WHERE tasks.rev = {CURRENT_REV} AND tasks.tags IS NOT NULL''')
+        self.conn.execute(CREATE_TAGS_INSERT_TRIGGER_SQL)
+        self._add_counts(self._count_groups(f'rev = {CURRENT_REV}'))
+
+    def update_task(self, task_id, data):
+        """修改任务内容，被修改的列的原值记入撤销日志"""
+        values = {**data, 'tags': encode_tags(data['tags']),
+                  'due_time': data.get('due_time'), 'remind_time': data.get('remind_time')}
+        values = tuple(values[column] for column in EDIT_COLUMNS)
+        with self.transaction():
+            row = self.conn.execute(f"SELECT {', '.join(EDIT_COLUMNS)} FROM tasks WHERE id=?", (task_id,)).fetchone()
+            if row is not None:
+                changed = {column: old for column, old, new in zip(EDIT_COLUMNS, row, values) if old != new}
+                if changed:
+                    self._record_journal('编辑任务', 'revert', {task_id: changed}, 1)
+            self._write_edit(task_id, values)
+
+    def _write_edit(self, task_id, values):
+        """按 EDIT_COLUMNS 的顺序写入各列"""
+        self.conn.execute(UPDATE_SQL, (*values, task_id))
+        # 修改待办实例时同时修改所属规则，之后生成的实例沿用新内容
+        title, description, tags, priority, urgency, duration, due_time, remind_time = values
+        self.conn.execute('''UPDATE task_rules SET title=?, description=?, tags=?, priority=?, urgency=?,
+                                 duration=?, remind_offset=?
+                             WHERE pending_task_id = ?''', (
+            title, description, tags, priority, urgency, duration,
+            due_time - remind_time if due_time is not None and remind_time is not None else None,
+            task_id))
+
+    def set_completed(self, task_id, completed):
+        """完成时其子孙任务一并完成；取消完成只影响该任务本身"""
+        with self.transaction():
+            if completed:
+                self._complete_subtrees('SELECT ?', (task_id,))
+            else:
+                self.conn.execute(SET_COMPLETED_SQL, (0, task_id))
+                self._reopen_occurrence(task_id)
+
+    def _complete_subtrees(self, seed, params=()):
+        """把 seed 选出的任务连同其全部子孙任务用一条语句标记为已完成，返回新完成的任务数"""
+        subtree = SUBTREE_CTE.format(seed=seed) + ' SELECT id FROM subtree'
+        before = self._count_groups(f'id IN ({subtree}) AND completed=0', params)
+        self.conn.execute(BUMP_REV_SQL)
+        self.conn.execute(COMPLETE_SUBTREE_SQL.format(seed=seed), params)
+        # 以 WITH 开头的语句 sqlite3 不提供 rowcount
+        count = self.conn.execute('SELECT changes()').fetchone()[0]
+        self._add_counts(before, -1)
+        self._add_counts(self._count_groups(f'rev = {CURRENT_REV}'))
+        self.materialize_rules()
+        return count
+
+    def set_rank(self, task_id, rank):
+        """拖动排序：只修改这一行的排序键"""
+        self.conn.execute(SET_RANK_SQL, (rank, task_id))
+
+    def rebalance_ranks(self, bucket, completed, rank, min_gap=MIN_RANK_GAP, window=32):
+        """排序键间隔用尽时，把同组中 rank 附近的一段任务重新均匀分布，返回 {id: 新排序键}
+
+        先取 rank 上下各 window 行，两侧相邻任务之间放不下时窗口加倍，
+        只修改这一段，相对顺序不变，不会重排整组或整表。
+        """
+        group = f'{SORT_BUCKET} = ? AND completed = ?'
+        with self.transaction():
+            while True:
+                above = self.conn.execute(f'SELECT id, rank FROM tasks WHERE {group} AND rank > ? '
+                                          f'ORDER BY rank, id LIMIT ?',
+                                          (bucket, completed, rank, window + 1)).fetchall()
+                below = self.conn.execute(f'SELECT id, rank FROM tasks WHERE {group} AND rank <= ? '
+                                          f'ORDER BY rank DESC, id DESC LIMIT ?',
+                                          (bucket, completed, rank, window + 1)).fetchall()
+                rows = above[:window][::-1] + below[:window]
+                if not rows:
+                    return {}
+                count = len(rows)
+                # 窗口外紧邻的任务限定了可用的区间，组的两端不受限制
+                upper = above[window][1] if len(above) > window else rows[0][1] + min_gap * (count + 1)
+                lower = below[window][1] if len(below) > window else rows[-1][1] - min_gap * (count + 1)
+                if (upper - lower) // (count + 1) >= min_gap:
+                    break
+                window *= 2
+            ranks = {task_id: upper - (upper - lower) * (i + 1) // (count + 1)
+                     for i, (task_id, _) in enumerate(rows)}
+            # 整批共用一个版本号，不逐行触发 tasks_rev_update
+            self.conn.execute(BUMP_REV_SQL)
+            self.conn.executemany(f'UPDATE tasks SET rank = ?, rev = {CURRENT_REV} WHERE id = ?',
+                                  [(new_rank, task_id) for task_id, new_rank in ranks.items()])
+        return ranks
+
+    def delete_task(self, task_id):
+        """删除任务及其全部子孙任务，删除的任务行保存在撤销日志中"""
+        with self.transaction():
+            entry_id = self._record_journal('', 'restore')
+            count = self._move_to_journal(entry_id, 'SELECT ?', (task_id,))
+            self._finish_journal(entry_id, f'删除{count}个任务', count)
+            self.materialize_rules()
+
+    def delete_tasks(self, task_ids):
+        return self.bulk_delete(task_ids=task_ids)
+
+    def _select_ids(self, task_ids):
+        """把任务id写入临时表，用于集合操作（不受SQLite参数个数限制）"""
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS selected_ids (id INTEGER PRIMARY KEY)')
+        self.conn.execute('DELETE FROM temp.selected_ids')
+        self.conn.executemany('INSERT OR IGNORE INTO temp.selected_ids (id) VALUES (?)',
+                              ((task_id,) for task_id in task_ids))
+        return 'id IN (SELECT id FROM temp.selected_ids)'
+
+    def filter_clause(self, filters):
+        """把 {列名: 值} 转换为 (WHERE条件, 参数)，只允许 BULK_COLUMNS 中的列与 'tag'（标签名）"""
+        conditions = []
+        params = []
+        for column, value in filters.items():
+            if column == 'tag':
+                conditions.append(self._tag_condition(value))
+            elif column in BULK_COLUMNS:
+                conditions.append(f'{column} = ?')
+            else:
+                raise ValueError(f'不支持的列: {column}')
+            params.append(value)
+        return ' AND '.join(conditions), params
+
+    def _tag_condition(self, tag):
+        """按标签筛选的条件
+
+        带该标签的任务较少时按 id 逐个读取后排序，开销与这些任务数成正比；
+        较多时按显示顺序扫描、逐行检查，每页约扫描 页大小 × 总任务数 / 带标签任务数 行。
+        两者相等处约为 带标签任务数² = 页大小 × 总任务数，计数均来自增量维护的计数表。
+        """
+        tagged, total = self.conn.execute(
+            '''SELECT (SELECT IFNULL(SUM(count), 0) FROM task_tag_counts
+                       WHERE tag_id = (SELECT id FROM tags WHERE name = ?)),
+                      (SELECT IFNULL(SUM(count), 0) FROM task_facet_counts)''', (tag,)).fetchone()
+        return TAG_SCAN_FILTER if tagged * tagged > PAGE_SIZE * total else TAG_FILTER
+
+    def _count_groups(self, where, params=()):
+        """满足条件的任务在各计数表中的分组计数
+
+        整条语句共用版本号的批量修改不逐行触发计数触发器：修改前后各读取一次，
+        扣减修改前的分组、累加修改后的分组（修改后的任务即 rev = 当前版本号的任务）。
+        按 tags 列与各列一起分组，一次扫描同时得到分面组合与标签组合，无需关联 task_tags。
+        """
+        tag_ids = {name: tag_id for tag_id, name in self.tag_names_by_id().items()}
+        facets, tags = {}, {}
+        for row in self.conn.execute(f'SELECT tags, {COUNT_GROUP}, COUNT(*) FROM tasks WHERE {where} '
+                                     f'GROUP BY tags, {COUNT_GROUP}', params):
+            group, count = row[1:5], row[5]
+            facets[group] = facets.get(group, 0) + count
+            for name in set(decode_tags(row[0])):
+                key = (tag_ids[name],) + group
+                tags[key] = tags.get(key, 0) + count
+        completion_time = COMPLETION_TIME.format(row='tasks')
+        days = self.conn.execute(f'''SELECT date({completion_time}, 'unixepoch', 'localtime'), COUNT(*),
+                                            SUM({completion_time} - created_time) FROM tasks
+                                     WHERE ({where}) AND completed GROUP BY 1''', params).fetchall()
+        return facets, tags, days
+
+    def _add_counts(self, groups, sign=1):
+        facets, tags, days = groups
+        self.conn.executemany(ADD_FACET_COUNT_SQL, [group + (sign * count,) for group, count in facets.items()])
+        self.conn.executemany(ADD_TAG_COUNT_SQL, [group + (sign * count,) for group, count in tags.items()])
+        self.conn.executemany(ADD_COMPLETIONS_SQL, [(day, sign * count, sign * seconds) for day, count, seconds in days])
+
+    def _target_clause(self, filters, task_ids):
+        if task_ids is not None:
+            return self._select_ids(task_ids), []
+        if not filters:
+            raise ValueError('批量操作需要指定条件或任务')
+        return self.filter_clause(filters)
+
+    def subtree_ids(self, filters=None, task_ids=None):
+        """按条件或任务id集合选出的任务及其全部子孙任务的id（批量删除与完成会作用于这些任务）"""
+        with self.transaction():
+            where, params = self._target_clause(filters, task_ids)
+            return {row[0] for row in self.conn.execute(
+                SUBTREE_CTE.format(seed=f'SELECT id FROM tasks WHERE {where}') + ' SELECT id FROM subtree', params)}
+
+    def count_tasks(self, filters=None):
+        where, params = self.filter_clause(filters or {})
+        sql = 'SELECT COUNT(*) FROM tasks' + (f' WHERE {where}' if where else '')
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def bulk_delete(self, filters=None, task_ids=None):
+        """按条件（如 {'completed': 1}）或任务id集合用一条语句删除（包括其子孙任务），返回删除的任务数"""
+        with self.transaction():
+            where, params = self._target_clause(filters, task_ids)
+            entry_id = self._record_journal('', 'restore')
+            count = self._move_to_journal(entry_id, f'SELECT id FROM tasks WHERE {where}', params)
+            self._finish_journal(entry_id, f'删除{count}个任务', count)
+            self.materialize_rules()
+            return count
+
+    def bulk_update(self, values, filters=None, task_ids=None):
+        """按条件或任务id集合用一条语句修改优先级/紧急程度/周期/完成状态，返回修改的任务数
+
+        与 set_completed 相同，标记为已完成时其子孙任务一并完成，取消完成只影响这些任务本身。
+        """
+        assignments, assignment_params = [], []
+        for column, value in values.items():
+            if column not in BULK_COLUMNS:
+                raise ValueError(f'不支持的列: {column}')
+            if column == 'completed' and value:
+                continue  # 由 _complete_subtrees 修改
+            assignments.append(f'{column}=?')
+            assignment_params.append(value)
+        if 'completed' in values and not values['completed']:
+            assignments.append('completed_time=NULL')
+        with self.transaction():
+            where, params = self._target_clause(filters, task_ids)
+            count = 0
+            if assignments:
+                before = self._count_groups(where, params)
+                # 整条语句共用一个版本号，不再逐行触发 tasks_rev_update / tasks_counts_update / tasks_tags_update
+                self.conn.execute(BUMP_REV_SQL)
+                count = self.conn.execute(
+                    f"UPDATE tasks SET {', '.join(assignments)}, updated_time={NOW}, rev={CURRENT_REV} WHERE {where}",
+                    assignment_params + params).rowcount
+                self._add_counts(before, -1)
+                self._add_counts(self._count_groups(f'rev = {CURRENT_REV}'))
+            if values.get('completed'):
+                count += self._complete_subtrees(f'SELECT id FROM tasks WHERE {where}', params)
+            return count
+
+    def facet_counts(self, where='', params=(), selected=None):
+        """各分面取值的任务数 {列: {值: 数量}}，标签的取值为标签名
+
+        每个分面的计数只受其他分面已选条件的限制（不含自身），便于切换同一分面的取值。
+        一个任务可以有多个标签，各标签的计数相加不是任务数：'total' 另外给出满足其他分面条件的任务数。
+        没有搜索条件时读取增量维护的 task_facet_counts 与 task_tag_counts；
+        否则对搜索结果按标签组合与各列分组，一次扫描同时得到两者。
+        """
+        selected = selected or {}
+        tag = selected.get('tag')
+        levels = {column: value for column, value in selected.items() if column != 'tag'}
+        if where:
+            rows = [(decode_tags(row[0]),) + row[1:] for row in self.conn.execute(
+                f'SELECT tags, {FACET_GROUP}, COUNT(*) FROM tasks WHERE {where} GROUP BY tags, {FACET_GROUP}', params)]
+            all_rows = [row[1:] for row in rows]
+            level_rows = [row[1:] for row in rows if tag is None or tag in row[0]]
+            tag_rows = [(name,) + row[1:] for row in rows for name in row[0]]
+        else:
+            names = self.tag_names_by_id()
+            tag_rows = [(names[row[0]],) + row[1:] for row in self.conn.execute(
+                f'SELECT tag_id, {FACET_GROUP}, count FROM task_tag_counts WHERE count > 0')]
+            all_rows = self.conn.execute(f'SELECT {FACET_GROUP}, count FROM task_facet_counts WHERE count > 0').fetchall()
+            # 选中标签时其余分面只统计带该标签的任务，即该标签的组合计数
+            level_rows = all_rows if tag is None else [row[1:] for row in tag_rows if row[0] == tag]
+        counts = {column: {} for column in FACET_COLUMNS}
+        counts['total'] = sum(row[3] for row in all_rows
+                              if all(row[LEVEL_COLUMNS.index(column)] == value for column, value in levels.items()))
+        for row in level_rows:
+            values = dict(zip(LEVEL_COLUMNS, row))
+            for column in LEVEL_COLUMNS:
+                if all(values[other] == value for other, value in levels.items() if other != column):
+                    column_counts = counts[column]
+                    column_counts[values[column]] = column_counts.get(values[column], 0) + row[3]
+        tag_counts = counts['tag']
+        for row in tag_rows:
+            if all(row[LEVEL_COLUMNS.index(column) + 1] == value for column, value in levels.items()):
+                tag_counts[row[0]] = tag_counts.get(row[0], 0) + row[4]
+        return counts
+
+    # ---- 统计 ----
+
+    def summary(self):
+        """(未完成任务数, 今天完成的任务数)，供托盘提示使用"""
+        return self.conn.execute(
+            '''SELECT (SELECT IFNULL(SUM(count), 0) FROM task_facet_counts WHERE completed = 0),
+                      (SELECT IFNULL(SUM(count), 0) FROM task_completion_days WHERE day = date('now', 'localtime'))'''
+        ).fetchone()
+
+    def statistics(self, days=STATS_DAYS):
+        """统计面板的数据，只读计数表（行数只与标签数、天数有关，与任务数无关）
+
+        返回 {'buckets': {(紧急程度, 周期): [未完成, 已完成]}, 'tags': {标签名: [未完成, 已完成]},
+              'days': [(日期, 完成数), ...]（最近 days 天，包括今天）, 'average_seconds': 平均完成耗时或None}
+        """
+        stats = {'buckets': {}, 'tags': {}}
+        for urgency, duration, completed, count in self.conn.execute(
+                '''SELECT urgency, duration, completed, SUM(count) FROM task_facet_counts
+                   GROUP BY 1, 2, 3 HAVING SUM(count) > 0'''):
+            stats['buckets'].setdefault((urgency, duration), [0, 0])[1 if completed else 0] += count
+        names = self.tag_names_by_id()
+        for tag_id, completed, count in self.conn.execute(
+                'SELECT tag_id, completed, SUM(count) FROM task_tag_counts GROUP BY 1, 2 HAVING SUM(count) > 0'):
+            stats['tags'].setdefault(names[tag_id], [0, 0])[1 if completed else 0] += count
+        counts = dict(self.conn.execute(
+            "SELECT day, count FROM task_completion_days WHERE day > date('now', 'localtime', ?)", (f'-{days} days',)))
+        today = date.today()
+        stats['days'] = [(day, counts.get(day, 0)) for day in
+                         (str(today - timedelta(days=n)) for n in range(days - 1, -1, -1))]
+        count, seconds = self.conn.execute('SELECT SUM(count), SUM(seconds) FROM task_completion_days').fetchone()
+        stats['average_seconds'] = seconds / count if count else None
+        return stats
+
+    # ---- 标签 ----
+
+    def tag_names_by_id(self):
+        return dict(self.conn.execute('SELECT id, name FROM tags'))
+
+    def tag_names(self):
+        """全部标签名（按名称排序），供选择标签时使用"""
+        return [row[0] for row in self.conn.execute('SELECT name FROM tags ORDER BY name')]
+
+    def bulk_tag(self, tag, add, filters=None, task_ids=None):
+        """按条件或任务id集合用一条语句为任务添加/移除一个标签，返回修改的任务数"""
+        with self.transaction():
+            where, params = self._target_clause(filters, task_ids)
+            if add:
+                tags = "json_insert(IFNULL(tags, '[]'), '$[#]', ?)"
+                condition = f'NOT {TAG_FILTER}'
+            else:
+                # 移除最后一个标签后为 NULL，与没有标签的新任务一致
+                tags = ('(SELECT CASE WHEN COUNT(*) THEN json_group_array(value) END '
+                        'FROM json_each(tasks.tags) WHERE value != ?)')
+                condition = TAG_FILTER
+            target = f'({where}) AND {condition}'
+            before = self._count_groups(target, list(params) + [tag])
+            # 整条语句共用一个版本号，不再逐行触发 tasks_counts_update / tasks_tags_update；
+            # 被修改的任务即带有该版本号的任务，之后按 idx_tasks_rev 一次性同步 task_tags 与计数
+            self.conn.execute(BUMP_REV_SQL)
+            count = self.conn.execute(
+                f'UPDATE tasks SET tags = {tags}, updated_time={NOW}, rev={CURRENT_REV} WHERE {target}',
+                [tag] + list(params) + [tag]).rowcount
+            if not count:
+                return count
+            self.conn.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag,))
+            tag_id = self.conn.execute('SELECT id FROM tags WHERE name = ?', (tag,)).fetchone()[0]
+            if add:
+                self.conn.execute(f'INSERT INTO task_tags (tag_id, task_id) SELECT ?, id FROM tasks WHERE rev = {CURRENT_REV}',
+                                  (tag_id,))
+            else:
+                self.conn.execute(f'''DELETE FROM task_tags
+                                      WHERE tag_id = ? AND task_id IN (SELECT id FROM tasks WHERE rev = {CURRENT_REV})''',
+                                  (tag_id,))
+            self._add_counts(before, -1)
+            self._add_counts(self._count_groups(f'rev = {CURRENT_REV}'))
+            return count
+
+    # ---- 跨进程修改检测 ----
+
+    def data_version(self):
+        """其他连接提交写入后该值会变化（本连接自己的写入不会），查询开销极小"""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def current_rev(self):
+        return self.conn.execute('SELECT rev FROM sync_state').fetchone()[0]
+
+    def fetch_changes(self, since_rev, where='', params=(), limit=MAX_CHANGES):
+        """读取版本号 since_rev 之后的修改，返回 (修改后仍满足条件的任务, 已删除或不再满足条件的id, 当前版本号)
+
+        修改超过 limit 个（None 表示不限）或所需的删除记录已被清理时返回None，调用方应重新加载。
+        """
+        limit = -1 if limit is None else limit + 1  # SQLite 中 LIMIT -1 表示不限
+        matched = f'({where})' if where else '1'
+        with self.transaction():
+            rev, pruned_rev = self.conn.execute('SELECT rev, pruned_rev FROM sync_state').fetchone()
+            if rev == since_rev:
+                return [], [], rev
+            if since_rev < pruned_rev:
+                return None
+            rows = self.conn.execute(
+                f'SELECT {TASK_COLUMNS}, {matched} FROM tasks WHERE rev > ? LIMIT ?',
+                [*params, since_rev, limit]).fetchall()
+            removed = [row[0] for row in self.conn.execute(
+                'SELECT id FROM task_tombstones WHERE rev > ? LIMIT ?', (since_rev, limit))]
+        if limit >= 0 and len(rows) + len(removed) >= limit:
+            return None
+        tasks = [Task.from_row(row) for row in rows if row[EXTRA_COLUMN]]
+        removed.extend(row[0] for row in rows if not row[EXTRA_COLUMN])
+        return tasks, removed, rev
+
+    def prune_tombstones(self, keep=TOMBSTONE_LIMIT):
+        """只保留最近 keep 条删除记录"""
+        row = self.conn.execute('SELECT rev FROM task_tombstones ORDER BY rev DESC LIMIT 1 OFFSET ?',
+                                (keep,)).fetchone()
+        if row is None:
+            return
+        with self.transaction():
+            self.conn.execute('DELETE FROM task_tombstones WHERE rev <= ?', row)
+            self.conn.execute('UPDATE sync_state SET pruned_rev = MAX(pruned_rev, ?)', row)
+
+    # ---- 子任务 ----
+
+    def fetch_children(self, parent_id):
+        """直接子任务，按显示顺序（沿 idx_tasks_parent 读取，无需排序）"""
+        return [Task.from_row(row) for row in self.conn.execute(
+            f'SELECT {TASK_COLUMNS} FROM tasks WHERE parent_id = ? ORDER BY {ORDER_BY}', (parent_id,))]
+
+    def subtree_counts(self, task_ids):
+        """各任务全部子孙任务的 {id: (总数, 已完成数)}，没有子任务的任务不在结果中
+
+        先从 idx_tasks_parent 中找出有子任务的任务，递归查询只从这些任务向下展开，
+        开销与子任务数成正比，与传入的任务数基本无关。
+        """
+        with self.transaction():
+            parents = {row[0] for row in self.conn.execute(
+                'SELECT DISTINCT parent_id FROM tasks WHERE parent_id IS NOT NULL')}
+            task_ids = [task_id for task_id in task_ids if task_id in parents]
+            if not task_ids:
+                return {}
+            self._select_ids(task_ids)
+            rows = self.conn.execute('''WITH RECURSIVE descendant(root, id, completed) AS (
+                                            SELECT parent_id, id, completed FROM tasks
+                                            WHERE parent_id IN (SELECT id FROM temp.selected_ids)
+                                            UNION
+                                            SELECT d.root, t.id, t.completed FROM tasks t JOIN descendant d ON t.parent_id = d.id
+                                        )
+                                        SELECT root, COUNT(*), SUM(completed) FROM descendant GROUP BY root''').fetchall()
+        return {root: (total, done) for root, total, done in rows}
+
+    # ---- 截止时间与提醒 ----
+
+    def fetch_reminders(self, after):
+        """截止时间晚于 after 的未完成任务的 (id, remind_time, due_time)
+
+        提醒时间只与截止时间一起设置且不晚于截止时间，因此只需读取覆盖索引 idx_tasks_due。
+        """
+        return self.conn.execute('SELECT id, remind_time, due_time FROM tasks WHERE completed = 0 AND due_time > ?',
+                                 (after,)).fetchall()
+
+    def count_overdue(self, now):
+        return self.conn.execute('SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_time <= ?',
+                                 (now,)).fetchone()[0]
+
+    # ---- 重复任务 ----
+
+    def add_rule(self, data, freq, interval=1):
+        """新建重复规则（data['due_time'] 为第一次的时间），返回第一次的实例"""
+        due_time, remind_time = data['due_time'], data.get('remind_time')
+        with self.transaction():
+            rule_id = self.conn.execute(f'''INSERT INTO task_rules (title, description, tags, priority, urgency, duration,
+                                                                  freq, interval, start_time, remind_offset, created_time)
+                                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {NOW})''', (
+                data['title'], data['description'], encode_tags(data['tags']), data['priority'], data['urgency'],
+                data['duration'], freq, interval, due_time,
+                due_time - remind_time if remind_time is not None else None)).lastrowid
+            task_id = self._insert_occurrence(rule_id, due_time)
+        return self.get_task(task_id)
+
+    def _insert_occurrence(self, rule_id, due_time):
+        task_id = self.conn.execute(INSERT_OCCURRENCE_SQL, (due_time, rule_id)).lastrowid
+        self.conn.execute('UPDATE task_rules SET pending_task_id = ?, next_time = ? WHERE id = ?',
+                          (task_id, due_time, rule_id))
+        return task_id
+
+    def materialize_rules(self):
+        """为待办实例已完成或已被删除的规则生成下一次实例，返回生成的个数
+
+        规则表只有几十上百行，按主键关联 tasks 即可判断，每次勾选的额外开销很小；
+        错过的周期不补建，下一次取晚于当前时间（及上一次截止时间）的第一次。
+        """
+        with self.transaction():
+            rows = self.conn.execute('''SELECT r.id, r.freq, r.interval, r.start_time, r.next_time
+                                        FROM task_rules r LEFT JOIN tasks t ON t.id = r.pending_task_id
+                                        WHERE t.id IS NULL OR t.completed = 1''').fetchall()
+            now = int(time.time())
+            for rule_id, freq, interval, start_time, next_time in rows:
+                after = max(now, next_time if next_time is not None else start_time - 1)
+                self._insert_occurrence(rule_id, next_occurrence(start_time, freq, interval, after))
+        return len(rows)
+
+    def _reopen_occurrence(self, task_id):
+        """取消完成某次实例时，撤销因它生成、尚未完成的下一次实例"""
+        row = self.conn.execute('''SELECT r.id, r.pending_task_id, t.due_time
+                                   FROM tasks t JOIN task_rules r ON r.id = t.rule_id WHERE t.id = ?''',
+                                (task_id,)).fetchone()
+        if row is None or row[1] == task_id:
+            return
+        rule_id, pending_id, due_time = row
+        if self.conn.execute('DELETE FROM tasks WHERE id = ? AND completed = 0', (pending_id,)).rowcount:
+            self.conn.execute('UPDATE task_rules SET pending_task_id = ?, next_time = ? WHERE id = ?',
+                              (task_id, due_time, rule_id))
+
+    def fetch_new_occurrences(self, since_rev, where='', params=()):
+        """版本号 since_rev 之后生成、满足条件的待办实例（本连接上的批量操作之后用于更新列表）"""
+        where, params = and_clauses(('rule_id IS NOT NULL AND completed = 0 AND rev > ?', (since_rev,)),
+                                    (where, params))
+        return [Task.from_row(row) for row in self.conn.execute(
+            f'SELECT {TASK_COLUMNS} FROM tasks WHERE {where}', params)]
+
+    def list_rules(self):
+        """全部重复规则 [(RULE_COLUMNS 各列)]，按下一次时间排序"""
+        return self.conn.execute(f'SELECT {RULE_COLUMNS} FROM task_rules ORDER BY next_time, id').fetchall()
+
+    def delete_rule(self, rule_id):
+        """删除规则及其待办实例，已完成的实例保留"""
+        with self.transaction():
+            self.conn.execute('DELETE FROM tasks WHERE rule_id = ? AND completed = 0', (rule_id,))
+            self.conn.execute('UPDATE tasks SET rule_id = NULL WHERE rule_id = ?', (rule_id,))
+            self.conn.execute('DELETE FROM task_rules WHERE id = ?', (rule_id,))
+
+    # ---- 归档 ----
+
+    def archive_path(self):
+        return os.path.join(os.path.dirname(self.db_path) or '.', 'archive.db')
+
+    def attach_archive(self):
+        """附加归档数据库（不存在时创建），同一连接只附加一次"""
+        if any(row[1] == 'archive' for row in self.conn.execute('PRAGMA database_list')):
+            return
+        self.conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path(),))
+        self.conn.execute('PRAGMA archive.auto_vacuum=INCREMENTAL')
+        self.conn.execute('PRAGMA archive.journal_mode=WAL')
+        with self.transaction():
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS archive.archived_tasks (
+                                    id INTEGER PRIMARY KEY,
+                                    title TEXT NOT NULL,
+                                    description TEXT,
+                                    tags TEXT,
+                                    priority INTEGER,
+                                    urgency INTEGER,
+                                    duration INTEGER,
+                                    completed INTEGER,
+                                    created_time INTEGER,
+                                    updated_time INTEGER,
+                                    archived_time INTEGER,
+                                    due_time INTEGER,
+                                    remind_time INTEGER,
+                                    rule_id INTEGER,
+                                    rank INTEGER,
+                                    parent_id INTEGER,
+                                    completed_time INTEGER
+                                )''')
+            # 旧版本创建的归档表补上新增的列
+            columns = {row[1] for row in self.conn.execute('PRAGMA archive.table_info(archived_tasks)')}
+            for column in ('due_time', 'remind_time', 'rule_id', 'rank', 'parent_id', 'completed_time'):
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE archive.archived_tasks ADD COLUMN {column} INTEGER')
+            if 'completed_time' not in columns:
+                self.conn.execute('UPDATE archive.archived_tasks SET completed_time = updated_time WHERE completed')
+            if 'tags' not in columns:
+                self.conn.execute('ALTER TABLE archive.archived_tasks ADD COLUMN tags TEXT')
+                self.conn.execute("UPDATE archive.archived_tasks SET tags = json_array(category) "
+                                  "WHERE category NOT IN ('', ?)", (UNTAGGED,))
+            if 'rank' not in columns:
+                self.conn.execute(f'UPDATE archive.archived_tasks SET rank = created_time * {RANK_STEP}')
+                self.conn.execute('DROP INDEX IF EXISTS archive.idx_archived_display_order')
+            # 与 idx_tasks_display_order 相同，归档视图同样按页读取
+            self.conn.execute(f'''CREATE INDEX IF NOT EXISTS archive.idx_archived_display_order
+                                 ON archived_tasks({SORT_BUCKET}, completed, rank DESC, id DESC)''')
+
+    def count_archivable(self, older_than_days):
+        cutoff = int(time.time()) - older_than_days * 86400
+        return self.conn.execute('SELECT COUNT(*) FROM tasks WHERE completed = 1 AND updated_time < ?',
+                                 (cutoff,)).fetchone()[0]
+
+    def count_archived(self):
+        self.attach_archive()
+        return self.conn.execute('SELECT COUNT(*) FROM archive.archived_tasks').fetchone()[0]
+
+    def archive_completed(self, older_than_days, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None, cancelled=None):
+        """把完成超过 older_than_days 天的任务分批移到归档数据库，完成后回收空间，返回归档的任务数
+
+        每批一个事务，写锁只持有很短时间；删除经由触发器同步全文索引、分面计数与删除记录，
+        其他窗口会像看到普通删除一样移除这些任务。
+        WAL模式下跨数据库的事务不保证整体原子性，因此先写归档（按id覆盖）再删除：
+        中途中断最多留下一份重复的归档副本，下次归档时会被覆盖。
+        """
+        self.attach_archive()
+        cutoff = int(time.time()) - older_than_days * 86400
+        count = 0
+        while True:
+            with self.transaction():
+                ids = [row[0] for row in self.conn.execute(
+                    'SELECT id FROM tasks WHERE completed = 1 AND updated_time < ? LIMIT ?',
+                    (cutoff, chunk_size))]
+                if not ids:
+                    break
+                target = self._select_ids(ids)
+                self.conn.execute(f'''INSERT OR REPLACE INTO archive.archived_tasks ({ARCHIVE_COLUMNS})
+                                      SELECT {ROW_COLUMNS}, {NOW} FROM tasks WHERE {target}''')
+                self.conn.execute(f'DELETE FROM tasks WHERE {target}')
+                # 父任务已归档、尚未归档的子任务改为顶层任务
+                self.conn.execute('UPDATE tasks SET parent_id = NULL WHERE parent_id IN (SELECT id FROM temp.selected_ids)')
+            count += len(ids)
+            if progress:
+                progress(count)
+            if cancelled and cancelled():
+                break
+        if count:
+            self.prune_tombstones()
+            self.reclaim_space()
+        self.set_setting('archive_last_run', int(time.time()))
+        return count
+
+    def reclaim_space(self):
+        """归还空闲页；旧数据库首次执行时做一次完整 VACUUM 以启用增量回收"""
+        if self.conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:  # 2 = INCREMENTAL
+            self.conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self.conn.execute('VACUUM')
+        else:
+            self.conn.execute('PRAGMA incremental_vacuum')
+
+    def restore_tasks(self, task_ids):
+        """把归档中的任务放回任务列表（保留原id），返回恢复的任务数"""
+        self.attach_archive()
+        with self.transaction():
+            target = self._select_ids(task_ids)
+            # 修改时间记为恢复时间，避免下次自动归档时立即又被移走；完成时间保持不变
+            restored_columns = ROW_COLUMNS.replace('updated_time', NOW)
+            count = self.conn.execute(f'''INSERT OR IGNORE INTO tasks ({ROW_COLUMNS})
+                                           SELECT {restored_columns} FROM archive.archived_tasks WHERE {target}''').rowcount
+            self.conn.execute(f'DELETE FROM archive.archived_tasks WHERE {target}')
+            # 父任务不在任务列表中（仍在归档或已删除）时作为顶层任务恢复
+            self.conn.execute(f'''UPDATE tasks SET parent_id = NULL
+                                  WHERE {target} AND parent_id IS NOT NULL AND parent_id NOT IN (SELECT id FROM tasks)''')
+        return count
+
+    # ---- 撤销日志 ----
+
+    def undo(self):
+        """撤销最近一次操作，返回其显示文字；没有可撤销的操作时返回None"""
+        return self._step_journal(0)
+
+    def redo(self):
+        """重做最近一次撤销的操作，返回其显示文字；没有可重做的操作时返回None"""
+        return self._step_journal(1)
+
+    def journal_labels(self):
+        """(可撤销的操作, 可重做的操作) 的显示文字，没有时为None"""
+        undo = self.conn.execute('SELECT label FROM undo_journal WHERE undone = 0 ORDER BY id DESC LIMIT 1').fetchone()
+        redo = self.conn.execute('SELECT label FROM undo_journal WHERE undone = 1 ORDER BY id LIMIT 1').fetchone()
+        return undo and undo[0], redo and redo[0]
+
+    def journal_insert(self, ranges, count):
+        """记录一次批量添加（各批次 insert_rows 返回的 id 范围），撤销时按范围删除"""
+        with self.transaction():
+            self._record_journal(f'批量添加{count}个任务', 'remove', merge_ranges(sorted(ranges)), count)
+
+    def _step_journal(self, undone):
+        """执行一个条目中保存的逆操作，并改为保存再次逆转所需的操作"""
+        order = 'DESC' if not undone else ''
+        with self.transaction():
+            row = self.conn.execute(f'SELECT id, label, op, payload FROM undo_journal WHERE undone = ? '
+                                    f'ORDER BY id {order} LIMIT 1', (undone,)).fetchone()
+            if row is None:
+                return None
+            entry_id, label, op, payload = row
+            apply = {'restore': self._restore_rows, 'remove': self._remove_rows, 'revert': self._revert_edits}[op]
+            op, payload, size = apply(entry_id, json.loads(payload))
+            self.conn.execute('UPDATE undo_journal SET op = ?, payload = ?, size = ?, undone = ? WHERE id = ?',
+                              (op, json.dumps(payload), size, 1 - undone, entry_id))
+        return label
+
+    def _record_journal(self, label, op, payload=None, size=0):
+        """新增一个条目，返回其id；size 为0时需在保存任务行之后调用 _finish_journal"""
+        entry_id = self.conn.execute('INSERT INTO undo_journal (label, op, payload) VALUES (?, ?, ?)',
+                                     (label, op, json.dumps(payload))).lastrowid
+        if size:
+            self._finish_journal(entry_id, label, size)
+        return entry_id
+
+    def _finish_journal(self, entry_id, label, size):
+        """写入显示文字与大小；没有修改任何任务时不留下条目
+
+        新的操作使已撤销的操作不能再重做；之后按条目数与保存的任务行数清理最早的条目。
+        """
+        if not size:
+            self._discard_journal('id = ?', (entry_id,))
+            return
+        self.conn.execute('UPDATE undo_journal SET label = ?, size = ? WHERE id = ?', (label, size, entry_id))
+        self._discard_journal('undone = 1')
+        self._compact_journal()
+
+    def _discard_journal(self, where, params=()):
+        self.conn.execute(f'DELETE FROM undo_rows WHERE entry_id IN (SELECT id FROM undo_journal WHERE {where})',
+                          params)
+        self.conn.execute(f'DELETE FROM undo_journal WHERE {where}', params)
+
+    def _compact_journal(self, max_entries=JOURNAL_LIMIT, max_rows=JOURNAL_ROW_LIMIT):
+        """只保留最近 max_entries 个条目，且 undo_rows 中的任务行总数不超过 max_rows（最近一个条目总是保留）"""
+        rows = 0
+        entries = self.conn.execute('SELECT id, op, size FROM undo_journal ORDER BY id DESC').fetchall()
+        for count, (entry_id, op, size) in enumerate(entries):
+            if op == 'restore':
+                rows += size
+            if count and (count >= max_entries or rows > max_rows):
+                self._discard_journal('id <= ?', (entry_id,))
+                return
+
+    def _move_to_journal(self, entry_id, seed, params=()):
+        """把 seed 选出的任务及其全部子孙任务移入该条目的 undo_rows，返回删除的任务数"""
+        self.conn.execute(SUBTREE_CTE.format(seed=seed) +
+                          f' INSERT INTO undo_rows (entry_id, {ROW_COLUMNS})'
+                          f' SELECT ?, {ROW_COLUMNS} FROM tasks WHERE id IN subtree', [*params, entry_id])
+        return self.conn.execute('DELETE FROM tasks WHERE id IN (SELECT id FROM undo_rows WHERE entry_id = ?)',
+                                 (entry_id,)).rowcount
+
+    def _restore_rows(self, entry_id, payload):
+        """把条目中保存的任务行按原id一条语句插回，返回逆操作（按id范围删除）"""
+        ids = [row[0] for row in self.conn.execute('SELECT id FROM undo_rows WHERE entry_id = ?', (entry_id,))]
+        # 父任务已不在任务列表中（例如之后又被删除）时作为顶层任务恢复
+        columns = ROW_COLUMNS.replace('parent_id', '''CASE WHEN parent_id IN (SELECT id FROM tasks)
+                                                             OR parent_id IN (SELECT id FROM undo_rows WHERE entry_id = ?1)
+                                                        THEN parent_id END''')
+        self._insert_bulk(lambda: self.conn.execute(
+            f'''INSERT OR IGNORE INTO tasks ({ROW_COLUMNS}, rev)
+                SELECT {columns}, {CURRENT_REV} FROM undo_rows WHERE entry_id = ?1''', (entry_id,)))
+        # 恢复的任务不再算作已删除，其他窗口按普通修改读到
+        self.conn.execute('DELETE FROM task_tombstones WHERE id IN (SELECT id FROM undo_rows WHERE entry_id = ?)',
+                          (entry_id,))
+        pending = [row[0] for row in self.conn.execute(
+            f'SELECT id FROM tasks WHERE rev = {CURRENT_REV} AND rule_id IS NOT NULL AND completed = 0')]
+        self.conn.execute('DELETE FROM undo_rows WHERE entry_id = ?', (entry_id,))
+        # 恢复重复任务的待办实例时，撤销删除后为其生成的下一次实例
+        for task_id in pending:
+            self._reopen_occurrence(task_id)
+        return 'remove', merge_ranges((task_id, task_id) for task_id in ids), len(ids)
+
+    def _remove_rows(self, entry_id, ranges):
+        """按id范围删除任务（连同子孙任务），任务行移入该条目，返回逆操作（插回这些行）"""
+        count = self._move_to_journal(entry_id, RANGE_IDS, (json.dumps(ranges),))
+        self.materialize_rules()
+        return 'restore', None, count
+
+    def _revert_edits(self, entry_id, edits):
+        """把各任务被编辑的列改回条目中的值，返回逆操作（改回执行前的值）"""
+        inverse = {}
+        for task_id, changed in edits.items():
+            task_id = int(task_id)  # JSON 对象的键为字符串
+            row = self.conn.execute(f"SELECT {', '.join(EDIT_COLUMNS)} FROM tasks WHERE id=?", (task_id,)).fetchone()
+            if row is None:
+                continue  # 任务之后已被删除
+            values = dict(zip(EDIT_COLUMNS, row))
+            inverse[task_id] = {column: values[column] for column in changed}
+            values.update(changed)
+            self._write_edit(task_id, tuple(values[column] for column in EDIT_COLUMNS))
+        return 'revert', inverse, len(inverse)
@@ -0,0 +1,107 @@
+from PyQt5.QtWidgets import QApplication, QStyle
+from PyQt5.QtCore import Qt, QRect, QSize
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen, QPixmap
+
+from task import (PRIORITY_TEXTS, PRIORITY_COLORS, URGENCY_TEXTS, URGENCY_COLORS,
+                  DURATION_TEXTS, DURATION_COLOR, TAG_COLOR)
+
+# 标签文字左右留白之和
+TAG_PADDING = 8
+# 标签之间的间距
+TAG_SPACING = 5
+
+
+class Theme:
+    """任务行绘制用到的字体、颜色、行高与标签图片
+
+    标签只有少量固定的 (文字, 颜色) 组合，第一次用到时渲染成图片缓存起来，
+    之后每行直接贴图，不再逐行测量文字、绘制圆角边框。
+    """
+
+    def __init__(self):
+        base_font = QApplication.font()
+        self.title_fonts = {}
+        self.desc_fonts = {}
+        for completed in (False, True):
+            title_font = QFont(base_font)
+            title_font.setBold(True)
+            title_font.setStrikeOut(completed)
+            self.title_fonts[completed] = title_font
+            desc_font = QFont(base_font)
+            desc_font.setPixelSize(12)
+            desc_font.setStrikeOut(completed)
+            self.desc_fonts[completed] = desc_font
+        self.small_font = QFont(base_font)
+        self.small_font.setPixelSize(10)
+
+        self.title_metrics = {key: QFontMetrics(font) for key, font in self.title_fonts.items()}
+        self.desc_metrics = {key: QFontMetrics(font) for key, font in self.desc_fonts.items()}
+        self.small_metrics = QFontMetrics(self.small_font)
+
+        self.muted_color = QColor('gray')
+        self.overdue_color = QColor('red')
+
+        style = QApplication.style()
+        self.check_size = QSize(style.pixelMetric(QStyle.PM_IndicatorWidth),
+                                style.pixelMetric(QStyle.PM_IndicatorHeight))
+        self.tag_height = self.small_metrics.height() + 2
+        self.top_height = max(self.check_size.height(), self.title_metrics[False].height(),
+                              self.small_metrics.height() + 4)
+        self.desc_height = self.desc_metrics[False].height()
+        self.time_height = self.small_metrics.height()
+
+        self._device_ratio = QApplication.instance().devicePixelRatio()
+        self._tag_pixmaps = {}
+        self._tag_rows = {}
+
+    def tag_pixmap(self, text, color):
+        """(文字, 颜色) 对应的标签图片"""
+        key = (text, color)
+        pixmap = self._tag_pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self._render_tag(text, color)
+            self._tag_pixmaps[key] = pixmap
+        return pixmap
+
+    def _render_tag(self, text, color):
+        rect = QRect(0, 0, self.small_metrics.horizontalAdvance(text) + TAG_PADDING, self.tag_height)
+        pixmap = QPixmap(rect.size() * self._device_ratio)
+        pixmap.setDevicePixelRatio(self._device_ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setFont(self.small_font)
+        painter.setPen(QPen(QColor(color)))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRoundedRect(rect.adjusted(0, 0, -1, -1), 3, 3)
+        painter.drawText(rect, Qt.AlignCenter, text)
+        painter.end()
+        return pixmap
+
+    def task_tags(self, task):
+        """任务的一行标签：([(图片, 宽度), ...], 总宽度)，按属性组合缓存"""
+        key = (task.tags, task.priority, task.urgency, task.duration)
+        row = self._tag_rows.get(key)
+        if row is None:
+            tags = [(f"[{tag}]", TAG_COLOR) for tag in task.tags] + [
+                (PRIORITY_TEXTS[task.priority - 1], PRIORITY_COLORS[task.priority - 1]),
+                (URGENCY_TEXTS[task.urgency - 1], URGENCY_COLORS[task.urgency - 1]),
+                (DURATION_TEXTS[task.duration - 1], DURATION_COLOR),
+            ]
+            pixmaps = []
+            for text, color in tags:
+                pixmap = self.tag_pixmap(text, color)
+                pixmaps.append((pixmap, round(pixmap.width() / pixmap.devicePixelRatio())))
+            width = sum(w for _, w in pixmaps) + TAG_SPACING * len(pixmaps)
+            row = self._tag_rows[key] = (pixmaps, width)
+        return row
+
+
+_theme = None
+
+
+def theme():
+    """全局共用的 Theme（需在创建 QApplication 之后调用）"""
+    global _theme
+    if _theme is None:
+        _theme = Theme()
+    return _theme
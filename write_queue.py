@@ -0,0 +1,136 @@
+import itertools
+import queue
+import threading
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from diagnostics import instrumentation, REPOSITORY_METHODS
+from task_repository import TaskRepository
+
+
+class TaskWriteQueue(QThread):
+    """后台写入线程
+
+    GUI线程只提交写命令后立即返回；后台线程在一个收集周期内合并命令
+    （同一任务的多次勾选只保留最后一次），每个周期用一个事务提交，
+    结果通过 committed / failed 信号通知GUI线程。
+    """
+
+    committed = pyqtSignal(int)   # 本次事务执行的命令数
+    failed = pyqtSignal(str)      # 错误信息，本批命令已整体回滚
+
+    TICK = 0.05  # 收集命令的时间窗口（秒）
+
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self._queue = queue.Queue()
+        self._actions = itertools.count()  # 删除命令所属的用户操作，同一操作的删除合并写入
+
+    # ---- 以下方法在GUI线程调用 ----
+
+    def set_completed(self, task_id, completed):
+        self._queue.put(('set_completed', task_id, int(completed)))
+
+    def update_task(self, task_id, data):
+        self._queue.put(('update', task_id, dict(data)))
+
+    def set_rank(self, task_id, rank):
+        self._queue.put(('set_rank', task_id, rank))
+
+    def delete_task(self, task_id):
+        self._queue.put(('delete', task_id, next(self._actions)))
+
+    def delete_tasks(self, task_ids):
+        action = next(self._actions)
+        for task_id in task_ids:
+            self._queue.put(('delete', task_id, action))
+
+    def flush(self):
+        """阻塞直到此前提交的命令全部写入数据库"""
+        if not self.isRunning():
+            return
+        done = threading.Event()
+        self._queue.put(('flush', None, done))
+        done.wait()
+
+    def stop(self):
+        """写完剩余命令后结束线程；线程尚未启动（数据库就绪前退出）而仍有命令时，启动线程写完"""
+        if not self.isRunning():
+            if self._queue.empty():
+                return
+            self.start()
+        self._queue.put(('stop', None, None))
+        self.wait()
+
+    # ---- 以下方法在后台线程执行 ----
+
+    def run(self):
+        repository = TaskRepository(self.db_path)
+        instrumentation.attach(repository, 'write_queue.db', REPOSITORY_METHODS)
+        try:
+            running = True
+            while running:
+                commands = [self._queue.get()]
+                deadline = time.monotonic() + self.TICK
+                while commands[-1][0] not in ('flush', 'stop'):
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        commands.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                with instrumentation.timed('write_queue.batch'):
+                    self._apply(repository, commands)
+                for name, _, arg in commands:
+                    if name == 'flush':
+                        arg.set()
+                    elif name == 'stop':
+                        running = False
+        finally:
+            instrumentation.detach(repository)
+            repository.close()
+
+    def _coalesce(self, commands):
+        """合并同一任务的重复命令，删除会覆盖此前的修改（删除保留所属的用户操作）"""
+        pending = {}
+        for name, task_id, arg in commands:
+            if name in ('set_completed', 'set_rank'):
+                if ('delete', task_id) not in pending:
+                    pending[(name, task_id)] = arg
+            elif name == 'update':
+                if ('delete', task_id) not in pending:
+                    previous = pending.get((name, task_id), {})
+                    pending[(name, task_id)] = {**previous, **arg}
+            elif name == 'delete':
+                pending.pop(('set_completed', task_id), None)
+                pending.pop(('set_rank', task_id), None)
+                pending.pop(('update', task_id), None)
+                pending[(name, task_id)] = arg
+        return pending
+
+    def _apply(self, repository, commands):
+        pending = self._coalesce(commands)
+        if not pending:
+            return
+        try:
+            with repository.transaction():
+                deletes = {}
+                for (name, task_id), arg in pending.items():
+                    if name == 'set_completed':
+                        repository.set_completed(task_id, arg)
+                    elif name == 'update':
+                        repository.update_task(task_id, arg)
+                    elif name == 'set_rank':
+                        repository.set_rank(task_id, arg)
+                    elif name == 'delete':
+                        deletes.setdefault(arg, []).append(task_id)
+                # 每个用户操作各删除一次，在撤销日志中各占一步
+                for task_ids in deletes.values():
+                    repository.delete_tasks(task_ids)
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.committed.emit(len(pending))